@@ -44,6 +44,7 @@ setup(
         'metrics': ['numpy'],
         'graphing': ['matplotlib'],
         'testing': ['pytest'],
+        'async': ['trollius'],
     },
     classifiers=[
         'Development Status :: 3 - Alpha',
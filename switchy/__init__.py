@@ -13,12 +13,13 @@ The `EventListener` was inspired from Moises Silva's
 import apps
 from os import path
 from utils import get_logger, ESLError
-from observe import EventListener, Client, get_listener
+from observe import EventListener, EventLoop, Client, get_listener
 from apps.call_gen import get_originator
 from distribute import SlavePool, MultiEval
 from marks import event_callback, handler
 from connection import Connection, ConnectionError
 from sync import sync_caller
+from aio import AsyncClient
 
 __package__ = 'switchy'
 __version__ = '0.1.alpha'
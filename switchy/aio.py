@@ -0,0 +1,258 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+Non-blocking `Client` commands for `asyncio` (or `trollius` on python 2).
+
+An `AsyncClient` wraps a connected `Client` (and its started listener) and
+exposes the same command set with each call returning a future on an
+`asyncio` event loop instead of blocking. With the pure python connection
+backend the loop itself reads command replies off of the client's sockets
+so thousands of call flows can be driven from a single thread; other
+backends fall back to running the blocking call in the loop's default
+executor.
+"""
+import utils
+import futures
+from futures import asyncio
+from utils import ConfigurationError, CommandError
+from connection import ConnectionError
+from observe import EventListener
+
+
+class AsyncClient(object):
+    '''Asynchronous command interface to a slave built on a `Client`.
+
+    Every command method returns a future (on `loop`) which may be awaited
+    (or yielded with `trollius.From`). Background jobs are registered with
+    the client's listener just like for `Client.bgapi` and can be awaited
+    through `Job.asyncio_future`.
+
+    Parameters
+    ----------
+    client : Client
+        connected client with a started listener
+    loop : event loop
+        the `asyncio` loop to use; defaults to the current event loop
+    '''
+    def __init__(self, client, loop=None):
+        if asyncio is None:
+            raise ConfigurationError(
+                "'asyncio' or 'trollius' must be installed")
+        self.client = client
+        self.server = client.server
+        self.loop = loop or asyncio.get_event_loop()
+        self.log = utils.get_logger(utils.pstr(self))
+        self._readers = {}  # fd -> protocol connection read by the loop
+
+    def __repr__(self):
+        return "<{} for {!r}>".format(type(self).__name__, self.client)
+
+    @property
+    def listener(self):
+        return self.client.listener
+
+    def close(self):
+        '''Stop reading the client's connections from the loop
+        '''
+        for fd in self._readers:
+            self.loop.remove_reader(fd)
+        self._readers.clear()
+
+    def _future(self):
+        loop = self.loop
+        return loop.create_future() if hasattr(
+            loop, 'create_future') else asyncio.Future(loop=loop)
+
+    def _then(self, future, func, timeout=None):
+        '''Return a future resolved with ``func(future.result())``. If that
+        returns a future then its outcome is used instead. The returned
+        future fails with `futures.TimeoutError` if not resolved within
+        `timeout` seconds.
+        '''
+        target = self._future()
+
+        def done(f):
+            if target.done():
+                return
+            if f.cancelled():
+                target.cancel()
+                return
+            exc = f.exception()
+            if exc is not None:
+                target.set_exception(exc)
+                return
+            try:
+                value = func(f.result())
+            except Exception as err:
+                target.set_exception(err)
+                return
+            if isinstance(value, asyncio.Future):
+                value.add_done_callback(
+                    lambda f: target.done() or _copy(f, target))
+            else:
+                target.set_result(value)
+
+        future.add_done_callback(done)
+        if timeout is not None:
+            def expire():
+                if not target.done():
+                    target.set_exception(futures.TimeoutError(
+                        "not complete after '{}' seconds".format(timeout)))
+
+            handle = self.loop.call_later(timeout, expire)
+            target.add_done_callback(lambda f: handle.cancel())
+        return target
+
+    def _watch(self, proto):
+        '''Have the loop read replies off of the protocol connection `proto`
+        '''
+        readers = self._readers
+        fd = proto.fileno()
+        if readers.get(fd) is proto:
+            return
+        for old in [fd] + [
+                key for key, con in readers.items() if not con.connected()]:
+            if old in readers:  # closed or replaced by a reconnected member
+                del readers[old]
+                self.loop.remove_reader(old)
+        if fd >= 0:
+            readers[fd] = proto
+            self.loop.add_reader(fd, proto.drain)
+
+    def _send(self, meth, cmd):
+        '''Return a future for the reply to `cmd` sent with `meth` (one of
+        'api' or 'bgapi')
+        '''
+        pool = self.client._con
+        if pool.backend != 'python':
+            # the blocking backends are driven from the default executor
+            return self.loop.run_in_executor(None, getattr(pool, meth), cmd)
+        con = pool.get(repair=False)  # never reconnect on the loop
+        reply = getattr(con, meth + '_async')(cmd)
+        self._watch(con._con)
+        return futures.to_asyncio(reply, self.loop)
+
+    def api(self, cmd, exc=True):
+        '''Invoke an esl api command with error checking returning a future
+        for the "SOCKET_DATA" reply event (see `Client.api`)
+        '''
+        def check(event):
+            if not event:
+                raise ConnectionError("no reply to '{}' from '{}'".format(
+                                      cmd, self.server))
+            try:
+                EventListener._handle_socket_data(event)
+            except CommandError:
+                if exc:
+                    raise
+            return event
+
+        return self._then(self._send('api', cmd), check)
+
+    def cmd(self, cmd):
+        '''Return a future for the string-body output of a command
+        '''
+        return self._then(
+            self.api(cmd), lambda event: event.getBody().strip())
+
+    def bgapi(self, cmd, listener=None, callback=None, client_id=None,
+              **jobkwargs):
+        '''Execute a non blocking api call returning a future for its
+        registered `Job` (see `Client.bgapi`)
+        '''
+        client = self.client
+        listener = client._assert_alive(listener)
+
+        def register(event):
+            if not event:
+                if not client._con.connected():
+                    raise ConnectionError("local connection down on '{}'!?"
+                                          .format(self.server))
+                raise CommandError("bgapi cmd failed?!\n{}".format(cmd))
+            return listener.register_job(
+                event, callback=callback,
+                client_id=client_id or client._id,
+                **jobkwargs
+            )
+
+        return self._then(self._send('bgapi', cmd), register)
+
+    def originate(self, dest_url=None,
+                  uuid_func=utils.uuid,
+                  app_id=None,
+                  listener=None,
+                  bgapi_kwargs={},
+                  rep_fields={},
+                  **orig_kwargs):
+        '''Originate a call returning a future for its background `Job`
+        (see `Client.originate`)
+        '''
+        client = self.client
+        listener = client._assert_alive(listener)
+        uuid_str = uuid_func()
+        cmd_str = client._build_originate(
+            uuid_str, dest_url, app_id, rep_fields, orig_kwargs)
+        return self.bgapi(
+            cmd_str, listener,
+            sess_uuid=uuid_str,
+            client_id=app_id,
+            **bgapi_kwargs
+        )
+
+    def hupall(self, group_id=None):
+        '''Hangup all calls associated with this client (or only those for
+        app `group_id`) returning a future for the list of replies
+        '''
+        client = self.client
+        group_ids = [group_id] if group_id else list(client._apps)
+        return asyncio.gather(*[
+            self.api('hupall NORMAL_CLEARING {} {}'.format(
+                     client.id_var, gid)) for gid in group_ids])
+
+    def waitfor(self, sess, varname, timeout=None):
+        '''Return a future resolved once ``sess.vars[varname]`` is set to a
+        true value (see `EventListener.waitfor`) or cancelled if the session
+        is recycled first
+        '''
+        future = self.listener.var_future(sess, varname)
+        target = self._then(
+            futures.to_asyncio(future, self.loop), lambda value: value,
+            timeout)
+        # stop watching on timeout
+        target.add_done_callback(
+            lambda _: sess.vars.unwatch(varname, future))
+        return target
+
+    def call(self, dest_url, app_name, timeout=30, waitfor=None,
+             **orig_kwargs):
+        '''Originate a call and return a future for its originating
+        `Session` once the originate job has completed and, if `waitfor` is
+        a (varname, timeout) pair, the session variable has been set. The
+        asynchronous counterpart of the `sync_caller` caller.
+        '''
+        sessions = self.listener.sessions
+
+        def originated(job):
+            def session(result):
+                sess = sessions[job.sess_uuid].call.first
+                if waitfor:
+                    var, secs = waitfor
+                    return self._then(
+                        self.waitfor(sess, var, secs), lambda value: sess)
+                return sess
+
+            return self._then(job.asyncio_future(self.loop), session, timeout)
+
+        return self._then(
+            self.originate(dest_url, app_id=app_name, **orig_kwargs),
+            originated)
+
+
+def _copy(future, target):
+    if future.cancelled():
+        target.cancel()
+    elif future.exception() is not None:
+        target.set_exception(future.exception())
+    else:
+        target.set_result(future.result())
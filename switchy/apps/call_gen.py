@@ -14,16 +14,28 @@ from threading import Thread
 import multiprocessing as mp
 from .. import utils
 from .. import marks
-from ..observe import EventListener, Client
+from .. import tracepoints
+from ..observe import EventListener, EventLoop, Client
 from ..distribute import SlavePool
 
 
-def get_pool(contacts, **kwargs):
+_tp_burst = tracepoints.tracepoint(
+    'originator.burst', ('requested', 'i'), ('originated', 'i'),
+    ('active', 'i'))
+_tp_originate = tracepoints.tracepoint(
+    'originator.originate', ('uuid', '36s'), ('active', 'i'))
+
+
+def get_pool(contacts, multiplex=False, **kwargs):
     """Construct and return a slave pool from a sequence of
-    contact information
+    contact information. If `multiplex` is set all listeners are serviced
+    by a single `EventLoop` thread instead of one thread each.
     """
     SlavePair = namedtuple("SlavePair", "client listener")
     pairs = deque()
+    if multiplex:
+        kwargs.setdefault('backend', 'python')
+        kwargs['loop'] = EventLoop()
 
     # instantiate all pairs
     for contact in contacts:
@@ -106,6 +118,93 @@ class WeightedIterator(object):
                 self.counts = self.weights.copy()
 
 
+PaceStats = namedtuple(
+    'PaceStats', 'second requested achieved jitter_avg jitter_max')
+
+
+class Pacer(object):
+    """Token bucket pacing of sends against an absolute timeline.
+
+    Send ``n`` is due at ``start + n / rate`` so time spent between calls to
+    `wait` is absorbed rather than accumulating as drift. Sends which fall
+    behind schedule go out back to back until caught up, but never more
+    than `catchup` seconds worth of them; beyond that the timeline is
+    re-anchored. Sleep overshoot is absorbed the same way; a non-zero `spin`
+    busy waits the final stretch before each deadline for tighter spacing
+    at the cost of CPU time (and GIL contention).
+    """
+    def __init__(self, rate, catchup=0.05, spin=0, history=60,
+                 clock=time.time, sleep=time.sleep):
+        self.catchup = catchup
+        self.spin = spin  # busy wait this close to a deadline
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = deque(maxlen=history)
+        self.rate = rate
+
+    def __repr__(self):
+        return '<{}: rate={}>'.format(type(self).__name__, self._rate)
+
+    def _get_rate(self):
+        return self._rate
+
+    def _set_rate(self, value):
+        self._rate = float(value)
+        self._interval = 1 / self._rate
+        self._depth = max(1, int(self.catchup * self._rate))
+        self.reset()
+
+    rate = property(_get_rate, _set_rate, "Send rate (per second)")
+
+    def reset(self):
+        """Start a new timeline at the next call to `wait`
+        """
+        self._next = None
+        self._second = None
+
+    def wait(self):
+        """Block until the next send is due and return how late (in
+        seconds) it is relative to its scheduled time
+        """
+        clock = self.clock
+        now = clock()
+        deadline = self._next
+        if deadline is None:
+            deadline = self._start = now
+        elif now - deadline > self._depth * self._interval:
+            # too far behind to catch up; drop the backlog
+            deadline = now - (self._depth - 1) * self._interval
+        remaining = deadline - now
+        if remaining > 0:
+            spin = self.spin
+            if remaining > spin:
+                self.sleep(remaining - spin)
+            if spin:
+                while clock() < deadline:
+                    pass
+            now = clock()
+        self._next = deadline + self._interval
+        jitter = max(now - deadline, 0)
+        self._record(now, jitter)
+        return jitter
+
+    def _record(self, now, jitter):
+        # bucket by whole seconds since the start of the timeline
+        second = self._start + int(now - self._start)
+        if second != self._second:
+            if self._second is not None and self._sent:
+                self.stats.append(PaceStats(
+                    self._second, self._rate, self._sent,
+                    self._jitter_sum / self._sent, self._jitter_max))
+            self._second = second
+            self._sent = 0
+            self._jitter_sum = self._jitter_max = 0
+        self._sent += 1
+        self._jitter_sum += jitter
+        if jitter > self._jitter_max:
+            self._jitter_max = jitter
+
+
 class State(object):
     """Enumeration to represent the originator state machine
     """
@@ -134,8 +233,10 @@ class Originator(object):
         'max_offered': float('inf'),  # max offered calls
         'duration': 0,
         'period': 1,
+        'max_lag': float('inf'),  # event processing lag (secs) threshold
         'uuid_gen': utils.uuid,
         'rep_fields_func': lambda: {},
+        'batch': False,  # originate each burst with one write per slave
     }
 
     def __init__(self, slavepool, debug=False, auto_duration=True,
@@ -169,7 +270,10 @@ class Originator(object):
         self._rate = None
         self._limit = None
         self._duration = None
-        self._max_rate = 250  # a realistic hard cps limit
+        # matches the 'fsctl sps' limit applied in `setup`
+        self._max_rate = 10000
+        # paces individual originates within each burst
+        self.pacer = Pacer(self.default_settings['rate'])
         self.duration_offset = 5  # calls must be at least 5 secs
 
         # attempt measurement capture setup
@@ -211,6 +315,8 @@ class Originator(object):
         self.setup()
         # counters
         self._total_originated_sessions = 0
+        self._throttled_bursts = 0
+        self._throttling = False
 
     # XXX: instead make this a `prepost` hook?
     def setup(self):
@@ -282,10 +388,7 @@ class Originator(object):
         return self._rate
 
     def _set_rate(self, value):
-        burst_rate = float(min(self.max_rate, value))
-        # set the 'inter-burst-period' accounting for surrounding processing
-        # latencies by a small %
-        self.ibp = 1 / burst_rate * 0.90
+        self.pacer.rate = min(self.max_rate, value)
         self._rate = value
 
         # update any sub-apps
@@ -396,27 +499,87 @@ class Originator(object):
     def total_originated_sessions(self):
         return self._total_originated_sessions
 
+    def count_sessions(self, **filters):
+        '''Count active sessions across the pool which match `filters`
+        (see `switchy.table.SessionTable.mask`); e.g. ``answered=False,
+        older_than=10`` counts sessions stuck in call setup. Requires
+        listeners created with a `session_table`.
+        '''
+        return self.pool.count_sessions_where(**filters)
+
+    @property
+    def pacing(self):
+        '''Per second `PaceStats` (requested versus achieved rate and send
+        jitter) for the most recent seconds of originating
+        '''
+        return list(self.pacer.stats)
+
+    @property
+    def throttled_bursts(self):
+        '''Number of bursts skipped due to listener lag exceeding `max_lag`
+        '''
+        return self._throttled_bursts
+
+    def _check_lag(self):
+        '''Return bool indicating if the (worst) listener is lagging more
+        than `max_lag` seconds behind its slave
+        '''
+        if self.max_lag == float('inf'):
+            return False
+        lag = self.pool.lag()
+        if lag > self.max_lag:
+            if not self._throttling:
+                self.log.warning(
+                    "event processing lag of '{}' seconds exceeds max_lag "
+                    "'{}'; throttling call bursts...".format(
+                        lag, self.max_lag))
+                self._throttling = True
+            self._throttled_bursts += 1
+            return True
+        if self._throttling:
+            self.log.info("event processing lag has recovered; resuming...")
+            self._throttling = False
+        return False
+
     def _burst(self):
         '''Originate calls via a bgapi/originate call in a loop
         '''
         originated = 0
         count_calls = self.count_calls
         iterappids = self.iterappids
-        num = min((self.limit - count_calls(), self.rate))
-        self.log.debug("bursting num originates = {}".format(num))
-        if num <= 0:
-            self.log.debug(
-                "maximum simultaneous sessions limit '{}' reached..."
-                .format(self.limit))
-
-        # TODO: need a proper traffic scheduling algo here!
-        # try to launch 'rate' calls in a loop
+        # an overloaded listener would otherwise inflate measured call
+        # setup latencies
+        if self._check_lag():
+            return
+        active = count_calls()
+        num = min((self.limit - active, self.rate))
+
+        if self.batch:
+            # no inter-call spacing; the whole burst goes out at once
+            if num > 0 and self.check_state("ORIGINATING"):
+                jobs = self.pool.originate_many(
+                    num,
+                    app_ids=iterappids,
+                    uuid_func=self.uuid_gen,
+                    rep_fields_func=self.rep_fields_func
+                )
+                originated = len(jobs)
+                if _tp_originate.enabled:
+                    for job in jobs:
+                        _tp_originate(job.sess_uuid, active)
+            if _tp_burst.enabled:
+                _tp_burst(num, originated, active)
+            return
+
+        # try to launch 'rate' calls each on its slot in the pacer timeline
+        wait = self.pacer.wait
         for _, slave in zip(range(num), self.iterslaves):
             if not self.check_state("ORIGINATING"):
                 break
-            if count_calls() >= self.limit:
+            active = count_calls()
+            if active >= self.limit:
                 break
-            self.log.debug("count calls = {}".format(count_calls()))
+            wait()
             # originate a call
             job = slave.client.originate(
                 app_id=next(iterappids),
@@ -424,12 +587,11 @@ class Originator(object):
                 rep_fields=self.rep_fields_func()
             )
             originated += 1
-            # limit the max transmission rate
-            time.sleep(self.ibp)
+            if _tp_originate.enabled:
+                _tp_originate(job.sess_uuid, active)
 
-        if originated > 0:
-            self.log.debug('Requested {} new sessions'
-                           .format(originated))
+        if _tp_burst.enabled:
+            _tp_burst(num, originated, active)
 
     def _serve_forever(self):
         """Asynchronous mode process entry point and
@@ -453,6 +615,7 @@ class Originator(object):
                     self.sched.enter(0, 1, self._burst, [])
 
                 # task loop
+                self.pacer.reset()
                 self._change_state("ORIGINATING")
                 try:
                     while not self.check_state('STOPPED'):
@@ -464,8 +627,6 @@ class Originator(object):
                         self.sched.run()
                         # schedule the next re-entry
                         if self.check_state("ORIGINATING"):
-                            self.log.debug('next burst loop re-entry is in {} '
-                                           'seconds'.format(self.period))
                             self.sched.enterabs(prerun + self.period, 1,
                                                 self._burst, ())
                 except Exception:
@@ -29,6 +29,22 @@ class Metrics(object):
     def array(self):
         return self._array
 
+    def count_sessions(self, **filters):
+        '''Count the listener's active sessions matching `filters` (see
+        `switchy.table.SessionTable.mask`)
+        '''
+        return self.listener.count_sessions(**filters)
+
+    def session_ages(self, since='create', **filters):
+        '''Return an array of the ages (in seconds since the `since` time
+        stamp) of the listener's active sessions matching `filters`
+        '''
+        table = self.listener.session_table
+        if table is None:
+            raise utils.ConfigurationError(
+                "session ages require a listener `session_table`")
+        return table.ages(since, **filters)
+
     @event_callback('CHANNEL_ORIGINATE')
     def on_originate(self, sess):
         # store local time stamp for originate
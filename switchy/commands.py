@@ -4,6 +4,23 @@
 """
 Command wrappers and helpers
 """
+import re
+import string
+from operator import itemgetter
+from utils import ConfigurationError
+
+
+def _getter(keys):
+    """Return a callable which looks up all `keys` in its argument and
+    returns the values as a tuple (even for fewer than two keys unlike
+    `operator.itemgetter`)
+    """
+    if len(keys) > 1:
+        return itemgetter(*keys)
+    if keys:
+        get = itemgetter(*keys)
+        return lambda obj: (get(obj),)
+    return lambda obj: ()
 
 
 def build_originate_cmd(dest_url, uuid_str=None, profile='external',
@@ -87,3 +104,105 @@ def build_originate_cmd(dest_url, uuid_str=None, profile='external',
 
     return 'originate {pv}{call_url} {app_part}'.format(
         pv=prefix_vars, call_url=call_url, app_part=app_part)
+
+
+class OriginateTemplate(object):
+    """A command string with ``{name}`` replacement fields compiled once
+    into literal fragments and named slots.
+
+    Rendering gathers the fragments and slot values with precomputed
+    lookups and joins them which avoids re-parsing the source with
+    `str.format` on every call. Only plain field names are supported;
+    conversions, format specs and attribute or index lookups are rejected
+    at compile time.
+
+    Parameters
+    ----------
+    source : str
+        format string as produced by :func:`build_originate_cmd` when no
+        `uuid_str` is provided
+    args : sequence of str
+        field names whose values are passed positionally to `render`
+        (by default those filled in by `Client.originate`); all other
+        fields are looked up in the `fields` mapping
+
+    Raises
+    ------
+    ConfigurationError
+        if `source` is malformed or contains an unsupported field
+    """
+    _ident = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+    def __init__(self, source, args=('uuid_str', 'app_id')):
+        self.source = source
+        self.args = tuple(args)
+        fragments, slots, literal = [], [], []
+        try:
+            parsed = list(string.Formatter().parse(source))
+        except ValueError as err:
+            raise ConfigurationError(
+                "invalid originate template '{}': {}".format(source, err))
+        for text, name, spec, conversion in parsed:
+            literal.append(text)
+            if name is None:
+                continue
+            if not self._ident.match(name) or spec or conversion:
+                raise ConfigurationError(
+                    "unsupported replacement field '{{{}}}' in originate "
+                    "template '{}'".format(name, source))
+            fragments.append(''.join(literal))
+            slots.append(name)
+            literal = []
+        fragments.append(''.join(literal))
+        self.fragments = tuple(fragments)
+        self.slots = tuple(slots)
+        self.fields = frozenset(slots)
+        # names looked up in the `fields` mapping passed to `render`
+        names = tuple(sorted(self.fields.difference(self.args)))
+        self._lookup = _getter(names)
+        # the position of each piece of the output in the sequence
+        # ``fragments + args + lookup(fields)`` built by `render`
+        first_arg = len(self.fragments)
+        first_name = first_arg + len(self.args)
+        pieces = []
+        for i, name in enumerate(slots):
+            pieces.append(i)
+            pieces.append(first_arg + self.args.index(name)
+                          if name in self.args
+                          else first_name + names.index(name))
+        pieces.append(len(slots))
+        self._gather = _getter(pieces)
+
+    def render(self, fields, *args):
+        """Render the full command string.
+
+        `args` are the values for the template's positional `args` names
+        and `fields` is a mapping of values for the remaining slots. As
+        with `str.format` a missing name raises `KeyError`, unused names
+        are ignored and non-string values are coerced with `str`.
+        """
+        if len(args) != len(self.args):
+            raise TypeError("expected {} positional value(s), got {}".format(
+                len(self.args), len(args)))
+        pieces = self._gather(self.fragments + args + self._lookup(fields))
+        try:
+            return ''.join(pieces)
+        except TypeError:
+            return ''.join(map(str, pieces))
+
+    def check(self, fields):
+        """Raise a `ConfigurationError` if any slot is not provided either
+        positionally or by the names in `fields`
+        """
+        missing = self.fields.difference(fields, self.args)
+        if missing:
+            raise ConfigurationError(
+                "no value provided for originate template field(s) {}"
+                .format(', '.join(sorted(missing))))
+
+    def __str__(self):
+        return self.source
+
+    def __repr__(self):
+        return "<{}: slots={}>".format(
+            type(self).__name__, ', '.join(self.slots))
@@ -5,17 +5,36 @@
 ESL connection wrapper
 """
 import time
-from ESL import ESLconnection
 import functools
-from utils import ESLError
+import threading
+from collections import namedtuple
+from utils import ESLError, ConfigurationError
 import utils
+import protocol
+import futures
+import tracepoints
 import multiprocessing as mp
+try:
+    from ESL import ESLconnection
+except ImportError:
+    ESLconnection = None
+
+
+# available connection implementations
+backends = {
+    'swig': ESLconnection,
+    'python': protocol.ESLConnection,
+}
 
 
 class ConnectionError(ESLError):
     pass
 
 
+_tp_api = tracepoints.tracepoint('connection.api', ('cmd', '54s'))
+_tp_bgapi = tracepoints.tracepoint('connection.bgapi', ('cmd', '54s'))
+
+
 def check_con(con):
     '''Raise a connection error if this connection is down
     '''
@@ -27,6 +46,25 @@ def check_con(con):
     return bool(con.connected()) and bool(event)
 
 
+def get_backend(name=None):
+    """Return the connection type registered under `name`.
+    By default the ESL SWIG package is used if it is installed otherwise
+    the pure python implementation is returned.
+    """
+    if name is None:
+        name = 'swig' if ESLconnection else 'python'
+    try:
+        backend = backends[name]
+    except KeyError:
+        raise ConfigurationError(
+            "No connection backend '{}', choose from {}"
+            .format(name, backends.keys()))
+    if backend is None:
+        raise ConfigurationError(
+            "The '{}' connection backend is not installed".format(name))
+    return name, backend
+
+
 class Connection(object):
     '''
     Connection wrapper which can provide mutex attr access making the
@@ -37,7 +75,7 @@ class Connection(object):
     This class must be explicitly connected before use.
     '''
     def __init__(self, host, port='8021', auth='ClueCon',
-                 locked=True, lock=None):
+                 locked=True, lock=None, backend=None):
         """
         Parameters
         -----------
@@ -53,16 +91,28 @@ class Connection(object):
         lock : instance of mp.Lock
             a lock implementation which the connection will utilize when
             serializing accesses from multiple threads (requires locked=True)
+        backend : string
+            name of the underlying connection implementation; one of 'swig'
+            (the ESL package distributed with FreeSWITCH) or 'python' (see
+            `switchy.protocol`). Defaults to 'swig' when it is installed.
         """
         self.host = host
         self.port = port
         self.auth = auth
+        self.backend, self._backend = get_backend(backend)
+        self._threadsafe = getattr(self._backend, 'threadsafe', False)
         self.log = utils.get_logger(utils.pstr(self))
         self._sub = ()  # events subscription
-        if locked:
+        self._filters = ()  # event filters as (header, value) pairs
+        if self._threadsafe:
+            # pure python connections do their own locking
+            self._mutex = utils.NullLock()
+        elif locked:
             self._mutex = lock or mp.Lock()
         # don't connect by default
         self._con = False
+        self.sent = 0  # commands issued over this connection
+        self._sent_lock = threading.Lock()
 
     def __enter__(self, **kwargs):
         self.connect(**kwargs)
@@ -71,8 +121,23 @@ class Connection(object):
     def __exit__(self, exception_type, exception_val, trace):
         self.disconnect()
 
+    @property
+    def outstanding(self):
+        """Number of commands awaiting a reply (always 0 for non-pipelined
+        backends since those block for each reply)
+        """
+        if self._threadsafe and self._con:
+            return self._con.outstanding
+        return 0
+
+    def _count(self, num=1):
+        with self._sent_lock:
+            self.sent += num
+
     def api(self, cmd):
-        self.log.debug("api cmd '{}'".format(cmd))
+        if _tp_api.enabled:
+            _tp_api(cmd)
+        self._count()
         with self._mutex:
             try:
                 return self._con.api(cmd)
@@ -80,13 +145,63 @@ class Connection(object):
                 raise ConnectionError("call `connect` first")
 
     def bgapi(self, cmd):
-        self.log.debug("bgapi cmd '{}'".format(cmd))
+        if _tp_bgapi.enabled:
+            _tp_bgapi(cmd)
+        self._count()
         with self._mutex:
             try:
                 return self._con.bgapi(cmd)
             except AttributeError:
                 raise ConnectionError("call `connect` first")
 
+    def api_async(self, cmd):
+        """Send an api command without waiting for the reply.
+        Returns a future which resolves to the reply event. Pipelined backends
+        allow many commands to be in flight at once; for others the command
+        completes synchronously.
+        """
+        if not self._threadsafe:
+            return futures.completed(self.api(cmd))
+        if _tp_api.enabled:
+            _tp_api(cmd)
+        self._count()
+        if not self._con:
+            raise ConnectionError("call `connect` first")
+        return self._con.api_async(cmd)
+
+    def bgapi_async(self, cmd):
+        """Same as `api_async` but for `bgapi` commands
+        """
+        if not self._threadsafe:
+            return futures.completed(self.bgapi(cmd))
+        if _tp_bgapi.enabled:
+            _tp_bgapi(cmd)
+        self._count()
+        if not self._con:
+            raise ConnectionError("call `connect` first")
+        return self._con.bgapi_async(cmd)
+
+    def bgapi_many(self, cmds):
+        """Send many `bgapi` commands at once returning a list of futures
+        which resolve to the reply events in command order. Pipelined
+        backends write the whole batch with a single send; for others the
+        commands are issued back to back under one lock acquisition.
+        """
+        if _tp_bgapi.enabled:
+            for cmd in cmds:
+                _tp_bgapi(cmd)
+        self._count(len(cmds))
+        if self._threadsafe:
+            if not self._con:
+                raise ConnectionError("call `connect` first")
+            return self._con.bgapi_many(cmds)
+        with self._mutex:
+            try:
+                return [futures.completed(self._con.bgapi(cmd))
+                        for cmd in cmds]
+            except AttributeError:
+                raise ConnectionError("call `connect` first")
+
     def __getattr__(self, name):
         if name == '_con':
             return object.__getattribute__(self, name)
@@ -102,7 +217,7 @@ class Connection(object):
                         return attr(*args, **kwargs)
                 return method
         except AttributeError:
-            if name in dir(ESLconnection):
+            if name in dir(self._backend):
                 raise AttributeError(
                     "Call `connect()` before before accessing the '{}' "
                     "attribute".format(name))
@@ -119,6 +234,7 @@ class Connection(object):
         if self.connected():
             ret = self._con.disconnect()
             self._sub = ()  # reset subscription
+            self._filters = ()
             return not bool(ret)
         return False
 
@@ -128,17 +244,23 @@ class Connection(object):
         host = host or self.host
         port = port or self.port
         auth = auth or self.auth
-        if not self.connected():
-            # XXX: try a few times since connections seem to be flaky
-            # We should probably try to fix this in the _ESL.so
-            for _ in range(5):
-                self._con = ESLconnection(*map(str, (host, port, auth)))
-                time.sleep(0.05)  # I wouldn't tweak this if I were you.
-                if self.connected() and check_con(self._con):
+        with self._mutex:
+            # a connection torn down by the server may not know it yet
+            alive = self.connected() and check_con(self._con)
+            if not alive:
+                # XXX: try a few times since connections seem to be flaky
+                # We should probably try to fix this in the _ESL.so
+                self._sub, self._filters = (), ()  # a new socket starts clean
+                for _ in range(5):
+                    self._con = self._backend(*map(str, (host, port, auth)))
+                    if not self._threadsafe:
+                        # I wouldn't tweak this if I were you.
+                        time.sleep(0.05)
+                    alive = self.connected() and check_con(self._con)
+                    if alive:
                         break
-                else:
                     self._con = False
-        if not check_con(self._con):
+        if not alive:
             raise ConnectionError(
                 "Failed to connect to server at '{}:{}'\n"
                 "Please check that FreeSWITCH is running and "
@@ -166,3 +288,214 @@ class Connection(object):
             prefix = 'CUSTOM ' if "::" in name else ''
             self._con.events(fmt, "{}{}".format(prefix, name))
             self._sub += (name,)
+
+    def add_filter(self, header, value):
+        """Only receive events where `header` equals `value`.
+        Note that the server delivers events matching *any* filter.
+        """
+        if not self.connected():
+            raise ConnectionError(
+                "connection must be active before adding event filters")
+        self._con.filter(header, value)
+        self._filters += ((header, value),)
+
+    def del_filter(self, header, value):
+        """Remove a filter previously added with `add_filter`
+        """
+        if not self.connected():
+            raise ConnectionError(
+                "connection must be active before removing event filters")
+        self._con.sendRecv('filter delete {} {}'.format(header, value))
+        self._filters = tuple(
+            pair for pair in self._filters if pair != (header, value))
+
+
+MemberStats = namedtuple(
+    'MemberStats', 'index connected outstanding peak sent share replaced')
+
+
+class ConnectionPool(object):
+    '''A fixed size pool of `Connection`s to a single slave used for
+    sending commands.
+
+    Each command is issued over the least loaded member as measured by its
+    number of outstanding requests (ties go to the member which has sent the
+    fewest commands). Members found to be disconnected are reconnected in
+    place such that callers holding a reference to a member (e.g. a
+    `Session`) keep working; callers which must not block (such as an
+    event loop) can have this done in the background instead. The pool
+    quacks enough like a `Connection` to be used in its place.
+    '''
+    # called with the member's index after it has been reconnected
+    on_repair = None
+
+    def __init__(self, host, port='8021', auth='ClueCon', size=1,
+                 backend=None, **kwargs):
+        """
+        Parameters
+        -----------
+        size : int
+            number of connections in the pool
+        kwargs : same as for `Connection`
+        """
+        if size < 1:
+            raise ConfigurationError(
+                "pool size must be at least 1 not '{}'".format(size))
+        self.host = host
+        self.port = port
+        self.auth = auth
+        self.size = size
+        self.log = utils.get_logger(utils.pstr(self))
+        self._members = [
+            Connection(host, port, auth, backend=backend, **kwargs)
+            for _ in range(size)]
+        self.backend = self._members[0].backend
+        self._peaks = [0] * size
+        self._replaced = [0] * size
+        self._active = False  # `connect` has been called
+        self._repair_lock = threading.Lock()
+        self._repairing = set()  # indices being repaired in the background
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exception_type, exception_val, trace):
+        self.disconnect()
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def _repair(self, index):
+        '''Reconnect the dead member at `index`.
+        Return bool indicating success.
+        '''
+        con = self._members[index]
+        with self._repair_lock:
+            if con.connected():  # another thread beat us to it
+                return True
+            if not self._active:  # the pool was disconnected meanwhile
+                return False
+            self.log.warning("replacing dead connection '{}' to '{}'"
+                             .format(index, self.host))
+            try:
+                con.connect()
+            except ConnectionError:
+                return False
+            self._replaced[index] += 1
+        if self.on_repair:
+            self.on_repair(index)
+        return True
+
+    def _repair_soon(self, index):
+        '''Reconnect the dead member at `index` from a background thread
+        '''
+        if index in self._repairing:
+            return
+        self._repairing.add(index)
+
+        def repair():
+            try:
+                self._repair(index)
+            finally:
+                self._repairing.discard(index)
+
+        thread = threading.Thread(
+            target=repair, name='repair-{}-{}'.format(self.host, index))
+        thread.daemon = True
+        thread.start()
+
+    def get(self, repair=True):
+        '''Return the least loaded connected member. If `repair` is false
+        dead members are reconnected in the background instead of by the
+        caller and, when none are connected, a (dead) member is returned
+        without blocking.
+        '''
+        if not self._active:
+            raise ConnectionError("call `connect` first")
+        best = bestkey = None
+        for index, con in enumerate(self._members):
+            if not con.connected():
+                if not repair:
+                    self._repair_soon(index)
+                    continue
+                if not self._repair(index):
+                    continue
+            load = con.outstanding
+            if load > self._peaks[index]:
+                self._peaks[index] = load
+            key = (load, con.sent)
+            if best is None or key < bestkey:
+                best, bestkey = con, key
+        if best is None and not repair:
+            # restored in place once a repair succeeds
+            return min(self._members, key=lambda con: con.sent)
+        if best is None:
+            raise ConnectionError(
+                "no connection in the pool to '{}:{}' could be restored"
+                .format(self.host, self.port))
+        return best
+
+    def _call(self, meth, cmd):
+        for _ in range(self.size + 1):
+            con = self.get()
+            event = getattr(con, meth)(cmd)
+            # retry if the member was found dead mid-request
+            if event is not None or con.connected():
+                break
+        return event
+
+    def api(self, cmd):
+        return self._call('api', cmd)
+
+    def bgapi(self, cmd):
+        return self._call('bgapi', cmd)
+
+    def api_async(self, cmd):
+        return self.get().api_async(cmd)
+
+    def bgapi_async(self, cmd):
+        return self.get().bgapi_async(cmd)
+
+    def bgapi_many(self, cmds):
+        return self.get().bgapi_many(cmds)
+
+    @property
+    def outstanding(self):
+        '''Total number of commands awaiting a reply
+        '''
+        return sum(con.outstanding for con in self._members)
+
+    def utilization(self):
+        '''Return a `MemberStats` record for each member in the pool where
+        `share` is the member's fraction of all commands sent and `peak` is
+        the largest number of outstanding requests seen when selecting it.
+        '''
+        total = sum(con.sent for con in self._members) or 1
+        return [
+            MemberStats(index, con.connected(), con.outstanding,
+                        self._peaks[index], con.sent,
+                        con.sent / float(total), self._replaced[index])
+            for index, con in enumerate(self._members)
+        ]
+
+    def connect(self):
+        '''Connect all members
+        '''
+        for con in self._members:
+            con.connect()
+        self._active = True
+
+    def disconnect(self):
+        '''Disconnect all members
+        '''
+        self._active = False
+        return all([con.disconnect() for con in self._members])
+
+    def connected(self):
+        '''Return bool indicating if all members are connected
+        '''
+        return all(con.connected() for con in self._members)
@@ -4,12 +4,77 @@
 """
 Manage pools of freeswitch slaves
 """
+import time
+import threading
 from itertools import cycle
 from operator import add
 from functools import partial
+from collections import Counter
 from utils import compose
 
 
+# placeholder for "no hangup cause" since `None` is a valid cause
+_NOCAUSE = object()
+
+
+class PoolCounters(object):
+    """Pool wide running totals which member listeners update in place as
+    they track state (see `EventListener.share_counters`) such that reads
+    take constant time regardless of the number of slaves or causes.
+
+    Updates from separate listener threads are serialized by a lock. Scalar
+    totals are read without it while counters should be read through
+    `snapshot`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions = self.calls = self.jobs = self.failed = 0
+        self.hangup_causes = Counter()
+        self.sessions_per_app = Counter()
+
+    def __repr__(self):
+        return "<{}: sessions={} calls={} jobs={} failed={}>".format(
+            type(self).__name__, self.sessions, self.calls, self.jobs,
+            self.failed)
+
+    def update(self, sessions=0, calls=0, jobs=0, failed=0, app=None,
+               cause=_NOCAUSE):
+        '''Apply deltas. A session delta is also applied to the count for
+        `app` and a `cause` is counted as one hangup.
+        '''
+        with self._lock:
+            self.sessions += sessions
+            self.calls += calls
+            self.jobs += jobs
+            self.failed += failed
+            if sessions:
+                self.sessions_per_app[app] += sessions
+            if cause is not _NOCAUSE:
+                self.hangup_causes[cause] += 1
+
+    def merge(self, listener, sign=1):
+        '''Add (or with ``sign=-1`` remove) a listener's current state
+        '''
+        with self._lock:
+            self.sessions += sign * listener.count_sessions()
+            self.calls += sign * listener.count_calls()
+            self.jobs += sign * listener.count_jobs()
+            self.failed += sign * listener.count_failed()
+            for name in ('hangup_causes', 'sessions_per_app'):
+                counts = getattr(listener, name)
+                if sign < 0:
+                    getattr(self, name).subtract(counts)
+                else:
+                    getattr(self, name).update(counts)
+
+    def snapshot(self, name):
+        '''Return a copy of the `name` counter (dropping non-positive
+        counts) taken under the update lock
+        '''
+        with self._lock:
+            return Counter() + getattr(self, name)
+
+
 class MultiEval(object):
     """Invoke arbitrary python expressions on a collection of objects
     """
@@ -110,12 +175,57 @@ def SlavePool(slaves):
     """A slave pool for controlling multiple (`Client`, `EventListener`)
     pairs with ease
     """
-    # turns out to be slightly faster (x2) then the reducer call below
+    counters = PoolCounters()
+
     def fast_count(self):
-        return sum(i.listener.count_calls() for i in self._slaves)
+        return counters.calls
+
+    def lag(self, percentile=0.9):
+        '''Worst event processing lag (in seconds) at `percentile` across
+        all listeners
+        '''
+        return max(i.listener.lag.percentile(percentile)
+                   for i in self._slaves)
+
+    def count_sessions_where(self, **filters):
+        '''Count active sessions matching `filters` across all listeners
+        (see `SessionTable.mask`)
+        '''
+        return sum(i.listener.count_sessions(**filters)
+                   for i in self._slaves)
+
+    def session_ages(self, since='create', **filters):
+        '''Concatenated array of the ages of active sessions matching
+        `filters` across all listeners (see `SessionTable.ages`)
+        '''
+        import numpy as np
+        now = time.time()
+        return np.concatenate([
+            i.listener.session_table.ages(since, now, **filters)
+            for i in self._slaves if i.listener.session_table is not None
+        ] or [np.empty(0)])
+
+    def originate_many(self, count, **kwargs):
+        '''Originate `count` calls spread evenly over all slaves issuing one
+        batch of bgapi commands per slave (see `Client.originate_many`).
+        Returns the list of all jobs.
+        '''
+        slaves = self._slaves
+        share, extra = divmod(count, len(slaves))
+        jobs = []
+        for index, slave in enumerate(slaves):
+            num = share + (index < extra)
+            if num:
+                jobs.extend(slave.client.originate_many(num, **kwargs))
+        return jobs
 
     attrs = {
+        'counters': counters,
+        'originate_many': originate_many,
         'fast_count': fast_count,
+        'lag': lag,
+        'count_sessions_where': count_sessions_where,
+        'session_ages': session_ages,
     }
     # make a specialized instance
     sp = type('SlavePool', (MultiEval,), attrs)(slaves)
@@ -125,22 +235,18 @@ def SlavePool(slaves):
         setattr(sp, 'iter_{}s'.format(name), sp.partial(name))
         setattr(sp, '{}s'.format(name), sp.evals(name))
 
+    # pool wide totals are kept up to date by the listeners themselves
+    sp.evals('listener.share_counters(counters)', counters=counters)
+
     sp.hangup_causes_per_slave = sp.evals('listener.hangup_causes')
-    sp.hangup_causes = partial(reduce, add, sp.hangup_causes_per_slave)
+    sp.hangup_causes = partial(counters.snapshot, 'hangup_causes')
     sp.sessions_per_app_per_slave = sp.evals('listener.sessions_per_app')
-    sp.sessions_per_app = partial(reduce, add, sp.sessions_per_app_per_slave)
+    sp.sessions_per_app = partial(counters.snapshot, 'sessions_per_app')
+    sp.lag_per_slave = sp.evals('listener.lag')
 
-    # small reduction protocol for 'multi-actions'
     for attr in ('calls', 'jobs', 'sessions', 'failed'):
-        setattr(
-            sp,
-            'count_{}'.format(attr),
-            sp.reducer(
-                sum,
-                'listener.count_{}()'.format(attr),
-                itertype=list
-            )
-        )
+        setattr(sp, 'count_{}'.format(attr),
+                partial(getattr, counters, attr))
 
     # figures it's slower then `causes` above...
     sp.aggr_causes = sp.folder(
@@ -0,0 +1,248 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+Light weight futures which quack like `concurrent.futures.Future`.
+
+Completion state is guarded by a single module level lock which is only
+held for the state change itself. A future allocates an event to block on
+only once some thread waits on it, so creating and resolving (hundreds of)
+thousands of futures stays cheap and resolving one wakes only its own
+waiters.
+
+Helpers are provided for waiting on many futures (or objects exposing one
+as a `future` attribute such as `models.Job`) and for adapting them to
+`concurrent.futures` and `asyncio` (or `trollius`) when those are installed.
+"""
+import time
+import Queue
+import threading
+import traceback
+import utils
+try:
+    import concurrent.futures as cf
+except ImportError:  # the `futures` backport is not installed
+    cf = None
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+
+_lock = threading.Lock()
+
+PENDING = 'PENDING'
+CANCELLED = 'CANCELLED'
+FINISHED = 'FINISHED'
+
+
+class TimeoutError(utils.ESLError):
+    pass
+
+
+class CancelledError(utils.ESLError):
+    pass
+
+
+class Future(object):
+    '''The result of an asynchronous operation.
+    '''
+    __slots__ = ('_state', '_result', '_exc', '_callbacks', '_waiter')
+
+    def __init__(self):
+        self._state = PENDING
+        self._result = None
+        self._exc = None
+        self._callbacks = None
+        self._waiter = None  # `threading.Event` created by `wait`
+
+    def __repr__(self):
+        return "<{} at {} state={}>".format(
+            type(self).__name__, hex(id(self)), self._state.lower())
+
+    def done(self):
+        return self._state is not PENDING
+
+    def cancelled(self):
+        return self._state is CANCELLED
+
+    def running(self):
+        return False
+
+    def cancel(self):
+        '''Cancel the future if it is still pending
+        '''
+        return self._finish(None, None, CANCELLED)
+
+    def set_result(self, result):
+        return self._finish(result, None)
+
+    def set_exception(self, exc):
+        return self._finish(None, exc)
+
+    def _finish(self, result, exc, state=FINISHED):
+        '''Complete this future and run any done callbacks.
+        Returns `False` if the future was already complete.
+        '''
+        with _lock:
+            if self._state is not PENDING:
+                return False
+            self._result, self._exc = result, exc
+            self._state = state
+            callbacks, self._callbacks = self._callbacks, None
+            waiter = self._waiter
+        if waiter is not None:
+            waiter.set()
+        if callbacks:
+            for callback in callbacks:
+                self._invoke(callback)
+        return True
+
+    def _invoke(self, callback):
+        try:
+            callback(self)
+        except Exception:
+            utils.get_logger().error(
+                "done callback '{}' for {} failed:\n{}"
+                .format(callback, self, traceback.format_exc()))
+
+    def add_done_callback(self, callback):
+        '''Register `callback(future)` to be invoked on completion or
+        immediately if the future is already done.
+        '''
+        with _lock:
+            if self._state is PENDING:
+                if self._callbacks is None:
+                    self._callbacks = []
+                self._callbacks.append(callback)
+                return
+        self._invoke(callback)
+
+    def wait(self, timeout=None):
+        '''Block until complete or `timeout` expires.
+        Return bool indicating completion.
+        '''
+        if self._state is not PENDING:
+            return True
+        with _lock:
+            if self._state is not PENDING:
+                return True
+            waiter = self._waiter
+            if waiter is None:
+                waiter = self._waiter = threading.Event()
+        waiter.wait(timeout)
+        return self._state is not PENDING
+
+    def result(self, timeout=None):
+        if not self.wait(timeout):
+            raise TimeoutError("Future not complete after '{}' seconds"
+                               .format(timeout))
+        if self._state is CANCELLED:
+            raise CancelledError()
+        if self._exc is not None:
+            raise self._exc
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self.wait(timeout):
+            raise TimeoutError("Future not complete after '{}' seconds"
+                               .format(timeout))
+        if self._state is CANCELLED:
+            raise CancelledError()
+        return self._exc
+
+
+def completed(result=None):
+    '''Return a future which is already resolved with `result`
+    '''
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _future(obj):
+    return getattr(obj, 'future', obj)
+
+
+def as_completed(fs, timeout=None):
+    '''Iterate the futures (or objects exposing a `future`) in `fs`
+    yielding each as it completes. Raises `TimeoutError` if they are not
+    all complete after `timeout` seconds.
+    '''
+    fs = list(fs)
+    done = Queue.Queue()
+    for obj in fs:
+        _future(obj).add_done_callback(lambda f, obj=obj: done.put(obj))
+    deadline = None if timeout is None else time.time() + timeout
+    for _ in range(len(fs)):
+        if deadline is None:
+            obj = done.get()
+        else:
+            try:
+                obj = done.get(timeout=max(deadline - time.time(), 0))
+            except Queue.Empty:
+                raise TimeoutError("Not all futures complete after '{}' "
+                                   "seconds".format(timeout))
+        yield obj
+
+
+def wait_all(fs, timeout=None):
+    '''Block until all futures (or objects exposing a `future`) in `fs`
+    complete or `timeout` expires. Return a (done, pending) pair of lists.
+    '''
+    fs = list(fs)
+    done = []
+    try:
+        for obj in as_completed(fs, timeout):
+            done.append(obj)
+    except TimeoutError:
+        pass
+    finished = set(map(id, done))
+    return done, [obj for obj in fs if id(obj) not in finished]
+
+
+def _chain(future, target):
+    '''Copy the outcome of `future` into `target` (a `concurrent.futures`
+    or `asyncio` future)
+    '''
+    if future.cancelled():
+        target.cancel()
+    elif future._exc is not None:
+        target.set_exception(future._exc)
+    else:
+        target.set_result(future._result)
+
+
+def to_concurrent(future):
+    '''Return a `concurrent.futures.Future` resolved along with `future`
+    '''
+    if cf is None:
+        raise utils.ConfigurationError(
+            "the 'futures' package must be installed on python 2")
+    target = cf.Future()
+    target.set_running_or_notify_cancel()
+    _future(future).add_done_callback(lambda f: _chain(f, target))
+    return target
+
+
+def to_asyncio(future, loop=None):
+    '''Return an `asyncio` (or `trollius`) future on `loop` resolved
+    (thread safely) along with `future`
+    '''
+    if asyncio is None:
+        raise utils.ConfigurationError(
+            "'asyncio' or 'trollius' must be installed")
+    loop = loop or asyncio.get_event_loop()
+    target = loop.create_future() if hasattr(
+        loop, 'create_future') else asyncio.Future(loop=loop)
+
+    def resolve(f):
+        if not target.done():
+            _chain(f, target)
+
+    _future(future).add_done_callback(
+        lambda f: loop.call_soon_threadsafe(resolve, f))
+    return target
@@ -6,84 +6,319 @@ Models representing freeSWITCH entities
 """
 import time
 import utils
+import futures
 from collections import deque
-from multiproc import mp
 
 
 class JobError(utils.ESLError):
     pass
 
 
+class FreeList(object):
+    '''A bounded stack of released model instances kept for reuse.
+
+    Instances are put here by their owner (see `EventListener._release`)
+    at the end of their life; nothing may use them afterwards.
+    '''
+    def __init__(self, size=1000):
+        self.size = size
+        self._items = []
+        # stats
+        self.reused = self.released = self.rejected = 0
+
+    def __repr__(self):
+        return "<{}: {}/{} reused={} released={} rejected={}>".format(
+            type(self).__name__, len(self), self.size, self.reused,
+            self.released, self.rejected)
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, obj):
+        '''Keep `obj` for reuse unless the list is full. Returns bool
+        indicating if `obj` was kept.
+        '''
+        if len(self._items) >= self.size:
+            self.rejected += 1
+            return False
+        self._items.append(obj)
+        self.released += 1
+        return True
+
+    def get(self):
+        '''Return a released instance or `None` if there are none
+        '''
+        items = self._items
+        if items:
+            self.reused += 1
+            return items.pop()
+        return None
+
+
+def header_pairs(event):
+    '''Return a list of the (name, value) header pairs of an event
+    '''
+    pairs = getattr(event, 'header_pairs', None)
+    if pairs is not None:  # `protocol.LazyEvent`
+        return pairs()
+    headers = getattr(event, 'headers', None)
+    if headers is not None:  # `protocol.Event`
+        return headers.items()
+    # ESL.ESLevent
+    pairs = []
+    name = event.firstHeader()
+    while name:
+        pairs.append((name, event.getHeader(name)))
+        name = event.nextHeader()
+    return pairs
+
+
+def get_retention(retain):
+    '''Validate an event retention policy returning a (first, last) pair of
+    event counts or `None` for unbounded retention. Accepted policies are:
+
+    - ``'all'`` (or `None`): keep every event
+    - ``(first, last)``: keep the first N plus the last M events
+    - ``'snapshot'``: keep no events, only the merged header snapshot
+    '''
+    if retain is None or retain == 'all':
+        return None
+    if retain == 'snapshot':
+        return 0, 0
+    try:
+        first, last = map(int, retain)
+    except (TypeError, ValueError):
+        first = last = -1
+    if first < 0 or last < 0:
+        raise utils.ConfigurationError(
+            "invalid event retention policy '{}'".format(retain))
+    return first, last
+
+
 class Events(object):
     """Event collection which for most intents and purposes should quack like
-    a collections.deque. Data lookups are delegated to the internal
-    deque of events in lilo order.
+    a collections.deque. Data lookups return the most recent (non-empty)
+    value of a header across all events.
+
+    Every header which has been looked up is kept in a latest-value-wins
+    map which is updated incrementally as events are added; only the first
+    lookup of a header scans the event history such that repeated lookups
+    take constant time no matter how many events have been received.
+    Headers are only ever fetched by name (rather than by enumerating each
+    event) which keeps lazily decoded and swig events cheap to add.
+
+    The `retain` policy (see `get_retention`) bounds the number of events
+    kept. Headers of discarded events are merged into a snapshot so that
+    lookups return the same values as if all events had been kept.
     """
-    def __init__(self, event=None):
-        self._events = deque()
+    __slots__ = ('_events', '_index', '_first', '_last', '_head',
+                 '_dropped', 'received')
+
+    def __init__(self, event=None, retain=None):
+        self._events = deque()  # most recent first
+        self._index = {}  # header name -> latest value (or None)
+        self._head = []  # first N events in chronological order
+        self.clear(retain)
         if event is not None:
             # add initial event to our queue
             self.update(event)
 
+    def clear(self, retain=None):
+        '''Drop all events and apply a (new) retention policy
+        '''
+        self._events.clear()
+        self._index.clear()
+        del self._head[:]
+        self._first, self._last = get_retention(retain) or (None, None)
+        self._dropped = None  # merged headers of dropped events
+        self.received = 0  # total events received
+
     def __repr__(self):
         return repr(self._events)
 
     def update(self, event):
         '''Append an ESL.ESLEvent
         '''
-        self._events.appendleft(event)
+        self.received += 1
+        index = self._index
+        if index:
+            for key in index:
+                value = event.getHeader(key)
+                if value:
+                    index[key] = value
+        if self._last is None:
+            self._events.appendleft(event)
+        elif len(self._head) < self._first:
+            self._head.append(event)
+        else:
+            events = self._events
+            events.appendleft(event)
+            if len(events) > self._last:
+                self._drop(events.pop())
+
+    def _drop(self, event):
+        dropped = self._dropped
+        if dropped is None:
+            dropped = self._dropped = {}
+        # empty values never override
+        dropped.update([pair for pair in header_pairs(event) if pair[1]])
 
     def __len__(self):
-        return len(self._events)
+        return len(self._events) + len(self._head)
 
     def __iter__(self):
         for ev in self._events:
             yield ev
+        for ev in reversed(self._head):
+            yield ev
 
     def get(self, key, default=None):
         """Return default if not found
         Should be faster then handling the key error?
         """
-        # XXX would a map() be faster here?
-        # iterate from most recent event
-        for ev in self._events:
-            value = ev.getHeader(str(key))
-            if value:
-                return value
-        return default
+        try:
+            value = self._index[key]
+        except KeyError:
+            key = str(key)
+            value = None
+            # first lookup of this header; iterate from most recent event
+            for ev in self._events:
+                value = ev.getHeader(key)
+                if value:
+                    break
+            else:
+                if self._dropped:
+                    value = self._dropped.get(key)
+                if not value:
+                    for ev in reversed(self._head):
+                        value = ev.getHeader(key)
+                        if value:
+                            break
+            self._index[key] = value or None
+        return value or default
 
     def __getitem__(self, key):
         '''Return either the value corresponding to variable 'key'
         or if type(key) == (int or slice) then return the corresponding
         event from the internal deque
         '''
+        if isinstance(key, (int, slice)):
+            if self._head:
+                return list(self)[key]
+            return self._events[key]
         value = self.get(key)
         if value:
             return value
-        else:
-            if isinstance(key, (int, slice)):
-                return self._events[key]
-            raise KeyError(key)
+        raise KeyError(key)
 
     def pprint(self, index=0):
         """Print serialized event data in chronological order to stdout
         """
-        for ev in reversed(self._events):
+        for ev in reversed(list(self)):
             print(ev.serialize())
 
 
+class Vars(dict):
+    '''The `Session.vars` namespace. Futures returned by `watch` are
+    resolved as soon as their variable is set to a true value (usually by
+    an app callback) such that waiting costs nothing per event. Pending
+    futures are cancelled when the vars are cleared (i.e. the session is
+    recycled).
+    '''
+    __slots__ = ('_waiters',)
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._waiters = None  # varname -> [futures]
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        if value and self._waiters:
+            self._notify(key, value)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        if self._waiters:
+            for key in self._waiters.keys():
+                value = self.get(key)
+                if value:
+                    self._notify(key, value)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def clear(self):
+        dict.clear(self)
+        waiters, self._waiters = self._waiters, None
+        if waiters:
+            for fs in waiters.values():
+                for future in fs:
+                    future.cancel()
+
+    def _notify(self, key, value):
+        fs = self._waiters.pop(key, None)
+        if fs:
+            for future in fs:
+                future.set_result(value)
+
+    def watch(self, key):
+        '''Return a future resolved with the value of `key` once it is set
+        to a true value
+        '''
+        future = futures.Future()
+        waiters = self._waiters
+        if waiters is None:
+            waiters = self._waiters = {}
+        waiters.setdefault(key, []).append(future)
+        # the value may have been set by another thread in the meantime
+        value = self.get(key)
+        if value:
+            future.set_result(value)
+        return future
+
+    def unwatch(self, key, future):
+        '''Discard a future returned by `watch` which is no longer waited on
+        '''
+        fs = self._waiters.get(key) if self._waiters else None
+        if fs:
+            try:
+                fs.remove(future)
+            except ValueError:  # already resolved
+                pass
+
+
+# pre-sized time stamp storage copied for each session
+_TIMES = dict.fromkeys(
+    ('create', 'answer', 'req_originate', 'originate', 'hangup'))
+
+
 class Session(object):
     '''Type to represent FS Session state
     '''
+    # apps may still set their own attributes (held in a `__dict__` which
+    # is only allocated once they do)
+    __slots__ = ('events', 'uuid', 'con', 'vars', 'duration', 'bg_job',
+                 'answered', 'call', 'hungup', 'times', 'cid', '__weakref__',
+                 '__dict__')
+
     create_ev = 'CHANNEL_CREATE'
 
     # TODO: eventually uuid should be removed
-    def __init__(self, event, uuid=None, con=None):
-        self.events = Events(event)
+    def __init__(self, event, uuid=None, con=None, retain=None):
+        self.events = Events(retain=retain)
+        # sub-namespace for apps to set/get state
+        self.vars = Vars()
+        # time stamps
+        self.times = _TIMES.copy()
+        self._setup(event, uuid, con)
+
+    def _setup(self, event, uuid, con):
+        self.events.update(event)
         self.uuid = uuid or self.events['Unique-ID']
         self.con = con
-        # sub-namespace for apps to set/get state
-        self.vars = {}
+        self.cid = None
 
         # external attributes
         self.duration = 0
@@ -91,12 +326,18 @@ class Session(object):
         self.answered = False
         self.call = None
         self.hungup = False
-
-        # time stamps
-        self.times = {}.fromkeys(
-            ('create', 'answer', 'req_originate', 'originate', 'hangup'))
         self.times['create'] = utils.get_event_time(event)
 
+    def recycle(self, event, uuid=None, con=None, retain=None):
+        '''Re-initialize a released session (see `FreeList`) for a new
+        channel reusing its containers
+        '''
+        self.events.clear(retain)
+        self.vars.clear()
+        self.times.update(_TIMES)
+        self._setup(event, uuid, con)
+        return self
+
     def __str__(self):
         return str(self.uuid)
 
@@ -153,9 +394,11 @@ class Session(object):
 
     @property
     def time(self):
-        """Time stamp for the most recent received event
+        """Time stamp for the most recent received event (or the creation
+        time if no event carried one)
         """
-        return utils.get_event_time(self.events[0])
+        value = self.events.get('Event-Date-Timestamp')
+        return float(value) / 1e6 if value else self.times['create']
 
     @property
     def uptime(self):
@@ -167,6 +410,20 @@ class Session(object):
     # TODO: dynamically add @decorated functions to this class
     # and wrap them using functools.update_wrapper ...?
 
+    def _api(self, cmd):
+        """Send an api command for this session without blocking on the
+        reply. Error replies are logged once they arrive.
+        """
+        self.con.api_async(cmd).add_done_callback(self._check_reply)
+
+    def _check_reply(self, future):
+        event = future.result()
+        body = event.getBody() if event else None
+        if body and body.startswith('-ERR'):
+            utils.get_logger().warning(
+                "Command for session '{}' failed with: {}"
+                .format(self.uuid, body.strip()))
+
     def setvar(self, var, value):
         """Set variable to value
         """
@@ -176,7 +433,7 @@ class Session(object):
         """Set all variables in map `params` with a single command
         """
         pairs = ('='.join(map(str, pair)) for pair in params.iteritems())
-        self.con.api("uuid_setvar_multi {} {}".format(
+        self._api("uuid_setvar_multi {} {}".format(
             self.uuid, ';'.join(pairs)))
 
     def unsetvar(self, var):
@@ -195,7 +452,7 @@ class Session(object):
         cause : string
             hangup type keyword
         '''
-        self.con.api(str('uuid_kill %s %s' % (self.uuid, cause)))
+        self._api(str('uuid_kill %s %s' % (self.uuid, cause)))
 
     def sched_hangup(self, timeout, cause='NORMAL_CLEARING'):
         '''Schedule this session to hangup after timeout seconds
@@ -207,13 +464,13 @@ class Session(object):
         cause : string
             hangup cause code
         '''
-        self.con.api('sched_hangup +{} {} {}'.format(timeout,
-                     self.uuid, cause))
+        self._api('sched_hangup +{} {} {}'.format(timeout,
+                  self.uuid, cause))
 
     def clear_tasks(self):
         '''Clear all scheduled tasks for this session
         '''
-        self.con.api('sched_del {}'.format(self.uuid))
+        self._api('sched_del {}'.format(self.uuid))
 
     def sched_dtmf(self, delay, sequence, tone_duration=None):
         '''Schedule dtmf sequence to be played on this channel
@@ -229,13 +486,13 @@ class Session(object):
             delay, self.uuid, sequence)
         if tone_duration is not None:
             cmd += ' @{}'.format(tone_duration)
-        self.con.api(cmd)
+        self._api(cmd)
 
     def send_dtmf(self, sequence, duration='w'):
         '''Send a dtmf sequence with constant tone durations
         '''
-        self.con.api('uuid_send_dtmf {} {} @{}'.format(
-                     self.uuid, sequence, duration))
+        self._api('uuid_send_dtmf {} {} @{}'.format(
+                  self.uuid, sequence, duration))
 
     def playback(self, args, start_sample=None, endless=False,
                  leg='aleg', params=None):
@@ -292,7 +549,7 @@ class Session(object):
             https://freeswitch.org/confluence/display/FREESWITCH/mod_dptools%3A+stop_record_session
         '''
         if delay:
-            self.con.api(
+            self._api(
                 "sched_api +{delay} none uuid_broadcast {sessid} "
                 "stop_record_session::{path}".
                 format(sessid=self.uuid, delay=delay, path=path)
@@ -308,7 +565,7 @@ class Session(object):
         .. _uuid_record:
             https://freeswitch.org/confluence/display/FREESWITCH/mod_commands#mod_commands-uuid_record
         '''
-        self.con.api('uuid_record {} {} {}'.format(self.uuid, action, path))
+        self._api('uuid_record {} {} {}'.format(self.uuid, action, path))
 
     def echo(self):
         '''Echo back all audio recieved
@@ -319,23 +576,23 @@ class Session(object):
         '''Re-invite a bridged node out of the media path for this session
         '''
         if state:
-            self.con.api('uuid_media off {}'.format(self.uuid))
+            self._api('uuid_media off {}'.format(self.uuid))
         else:
-            self.con.api('uuid_media {}'.format(self.uuid))
+            self._api('uuid_media {}'.format(self.uuid))
 
     def start_amd(self, delay=None):
-        self.con.api('avmd {} start'.format(self.uuid))
+        self._api('avmd {} start'.format(self.uuid))
         if delay is not None:
-            self.con.api('sched_api +{} none avmd {} stop'.format(
-                         int(delay), self.uuid))
+            self._api('sched_api +{} none avmd {} stop'.format(
+                      int(delay), self.uuid))
 
     def stop_amd(self):
-        self.con.api('avmd {} stop'.format(self.uuid))
+        self._api('avmd {} stop'.format(self.uuid))
 
     def park(self):
         '''Park this session
         '''
-        self.con.api('uuid_park {}'.format(self.uuid))
+        self._api('uuid_park {}'.format(self.uuid))
 
     def broadcast(self, path, leg=''):
         """Usage:
@@ -346,9 +603,7 @@ class Session(object):
         Usage:
             uuid_broadcast <uuid> app[![hangup_cause]]::args [aleg|bleg|both]
         """
-        # FIXME: this should use the EventListener SOCKET_DATA handler!!
-        #       so that we are actually alerted of cmd errors!
-        self.con.api('uuid_broadcast {} {} {}'.format(self.uuid, path, leg))
+        self._api('uuid_broadcast {} {} {}'.format(self.uuid, path, leg))
 
     def bridge(self, dest_url="${sip_req_uri}",
                profile="${sofia_profile_name}",
@@ -370,13 +625,13 @@ class Session(object):
     def breakmedia(self):
         '''Stop playback of media on this session and move on in the dialplan
         '''
-        self.con.api('uuid_break {}'.format(self.uuid))
+        self._api('uuid_break {}'.format(self.uuid))
 
     def mute(self, direction='write', level=1):
         """Mute the current session. `level` determines the degree of comfort
         noise to generate if > 1.
         """
-        self.con.api(
+        self._api(
             'uuid_audio {uuid} {cmd} {direction} mute {level}'
             .format(
                 uuid=self.uuid,
@@ -402,17 +657,86 @@ class Session(object):
         return self['Call-Direction'] == 'outbound'
 
 
+class FailureRecord(object):
+    '''A compact record of a failed session kept in place of the `Session`
+    (and its event history) itself.
+
+    Only the `headers` named at creation are copied from the session's
+    events; lookups of these behave like `Session` lookups.
+    '''
+    __slots__ = ('uuid', 'cause', 'cid', 'answered', 'times', 'headers')
+
+    def __init__(self, uuid, cause, cid=None, answered=False, times=None,
+                 headers=None):
+        self.uuid = uuid
+        self.cause = cause
+        self.cid = cid
+        self.answered = answered
+        self.times = times or {}
+        self.headers = headers or {}
+
+    @classmethod
+    def from_session(cls, sess, cause, headers=()):
+        '''Build a record for a hung up `Session` copying its time stamps
+        and the value of each header named in `headers`
+        '''
+        get = sess.events.get
+        return cls(
+            sess.uuid, cause, sess.cid, sess.answered, sess.times.copy(),
+            {name: get(name) for name in headers},
+        )
+
+    def __repr__(self):
+        return "<{}: {} {}>".format(type(self).__name__, self.uuid,
+                                    self.cause)
+
+    def __getitem__(self, key):
+        try:
+            return self.headers[key]
+        except KeyError:
+            raise KeyError("'{}' not recorded for failed session '{}'"
+                           .format(key, self.uuid))
+
+    def get(self, key, default=None):
+        value = self.headers.get(key)
+        return default if value is None else value
+
+
 class Call(object):
     '''A collection of sessions which a compose a call
     '''
+    __slots__ = ('uuid', 'sessions', '_firstref', '_lastref', 'vars',
+                 '__weakref__')
+
     def __init__(self, uuid, session):
-        self.uuid = uuid
         self.sessions = deque()
+        # sub-namespace for apps to set/get state
+        self.vars = {}
+        self.recycle(uuid, session)
+
+    def recycle(self, uuid, session):
+        '''Re-initialize a released call (see `FreeList`) reusing its
+        containers
+        '''
+        self.uuid = uuid
+        self.sessions.clear()
         self.sessions.append(session)
         self._firstref = session
         self._lastref = None
-        # sub-namespace for apps to set/get state
-        self.vars = {}
+        self.vars.clear()
+        return self
+
+    def release(self):
+        '''Unlink this ended call from its sessions and return them
+        '''
+        sessions = set(self.sessions)
+        sessions.update((self._firstref, self._lastref))
+        sessions.discard(None)
+        self.sessions.clear()
+        self._firstref = self._lastref = None
+        for sess in sessions:
+            sess.call = sess.bg_job = sess.con = None
+        return sessions
 
     def __repr__(self):
         return "<{}({}, {} sessions)>".format(
@@ -460,6 +784,11 @@ class Job(object):
     '''Type to hold data and deferred execution for a background job.
     The interface closely matches `multiprocessing.pool.AsyncResult`.
 
+    Completion is signalled through a light weight `futures.Future` (see
+    `future`) which can be waited on in bulk (`futures.wait_all`,
+    `futures.as_completed`) or adapted for `concurrent.futures` and
+    `asyncio` code.
+
     Parameters
     ----------
     uuid : string
@@ -468,12 +797,22 @@ class Job(object):
         optional session uuid if job is associated with an active
         FS session
     '''
-    class TimeoutError(Exception):
-        pass
+    __slots__ = ('events', 'uuid', 'sess_uuid', 'launch_time', 'cid', '_cb',
+                 'kwargs', '_result', '_failed', 'future', '__weakref__')
+
+    TimeoutError = futures.TimeoutError
 
     def __init__(self, event, sess_uuid=None, callback=None, client_id=None,
                  kwargs={}):
-        self.events = Events(event)
+        self.events = Events()
+        self.recycle(event, sess_uuid, callback, client_id, kwargs)
+
+    def recycle(self, event, sess_uuid=None, callback=None, client_id=None,
+                kwargs={}):
+        '''Re-initialize a released job (see `FreeList`)
+        '''
+        self.events.clear()
+        self.events.update(event)
         self.uuid = self.events['Job-UUID']  # event.getHeader('Job-UUID')
         self.sess_uuid = sess_uuid
         self.launch_time = time.time()
@@ -484,7 +823,9 @@ class Job(object):
         self.kwargs = kwargs
         self._result = None
         self._failed = False
-        self._ev = None  # signal/sync job completion
+        # resolved with the job's result or a `JobError` on failure
+        self.future = futures.Future()
+        return self
 
     @property
     def result(self):
@@ -492,50 +833,49 @@ class Job(object):
         '''
         return self.get()
 
-    @property
-    def _sig(self):
-        if not self._ev:
-            self._ev = mp.Event()  # signal/sync job completion
-            if self._result:
-                self._ev.set()
-        return self._ev
-
-    def __call__(self, resp, *args, **kwargs):
+    def _run_callback(self, resp, args, kwargs):
         if self._cb:
             self.kwargs.update(kwargs)
-            self._result = self._cb(resp, *args, **self.kwargs)
-        else:
-            self._result = resp
-        if self._ev:  # don't allocate an event if unused
-            self._ev.set()  # signal job completion
+            return self._cb(resp, *args, **self.kwargs)
+        return resp
+
+    def __call__(self, resp, *args, **kwargs):
+        try:
+            self._result = self._run_callback(resp, args, kwargs)
+        except Exception as err:
+            self.future.set_exception(err)
+            raise
+        self.future.set_result(self._result)
         return self._result
 
     def fail(self, resp, *args, **kwargs):
         '''Fail this job optionally adding an exception for its result
         '''
         self._failed = True
-        self._result = JobError(self(resp, *args, **kwargs))
+        self._result = JobError(self._run_callback(resp, args, kwargs))
+        self.future.set_exception(self._result)
 
     def get(self, timeout=None):
         '''Get the result for this job waiting up to `timeout` seconds.
         Raises `TimeoutError` on if job does complete within alotted time.
         '''
-        ready = self._sig.wait(timeout)
-        if ready:
+        if self.future.wait(timeout):
             return self._result
         elif timeout:
-            raise TimeoutError("Job not complete after '{}' seconds"
-                               .format(timeout))
+            raise self.TimeoutError("Job not complete after '{}' seconds"
+                                    .format(timeout))
 
     def ready(self):
         '''Return bool indicating whether job has completed
         '''
-        return self._sig.is_set()
+        return self.future.done()
+
+    done = ready
 
     def wait(self, timeout=None):
         '''Wait until job has completed or `timeout` has expired
         '''
-        self._sig.wait(timeout)
+        return self.future.wait(timeout)
 
     def successful(self):
         '''Return bool determining whether job completed without error
@@ -543,6 +883,26 @@ class Job(object):
         assert self.ready(), 'Job has not completed yet'
         return not self._failed
 
+    def add_done_callback(self, callback):
+        '''Register `callback(job)` to be invoked once this job completes
+        (usually from the listener's event loop thread) or immediately if
+        it already has.
+        '''
+        self.future.add_done_callback(lambda future: callback(self))
+
+    def concurrent_future(self):
+        '''Return a `concurrent.futures.Future` for this job's result
+        '''
+        return futures.to_concurrent(self.future)
+
+    def asyncio_future(self, loop=None):
+        '''Return an `asyncio` future (on `loop`) for this job's result
+        '''
+        return futures.to_asyncio(self.future, loop)
+
+    def __await__(self):
+        return self.asyncio_future().__await__()
+
     def update(self, event):
         '''Update job state/data using an event
         '''
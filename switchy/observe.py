@@ -10,28 +10,50 @@ through event processing and command invocation.
 The EventListener component was inspired by Moises Silva's
 'fs_test' project: https://github.com/moises-silva/fs_test
 """
+import os
 import time
+import errno
+import fcntl
+import select
+import Queue
 import traceback
 import inspect
+import json
 # import operator
-import itertools
 import functools
 import weakref
 from contextlib import contextmanager
 from threading import Thread, current_thread
+from threading import Event as ThreadEvent
 from collections import deque, OrderedDict, defaultdict, Counter, namedtuple
 
 # NOTE: the import order matters here!
 import utils
 from utils import ConfigurationError, ESLError, CommandError, get_event_time
-from models import Session, Job, Call
-from commands import build_originate_cmd
+from models import (
+    Session, Job, Call, FreeList, FailureRecord, get_retention)
+from commands import build_originate_cmd, OriginateTemplate
 import multiproc
 import marks
 from marks import handler
 import multiprocessing as mp
-from multiprocessing.synchronize import Event
-from connection import Connection, ConnectionError
+from connection import Connection, ConnectionPool, ConnectionError
+from protocol import Event, ChannelRow, CHANNEL_COLUMNS
+import tracepoints
+import futures
+try:
+    from table import SessionTable
+except ImportError:  # numpy is not installed
+    SessionTable = None
+
+
+_tp_job = tracepoints.tracepoint(
+    'listener.job', ('job', '36s'), ('failed', '?'))
+_tp_create = tracepoints.tracepoint(
+    'listener.create', ('uuid', '36s'), ('bridged', '?'))
+_tp_answer = tracepoints.tracepoint('listener.answer', ('uuid', '36s'))
+_tp_hangup = tracepoints.tracepoint(
+    'listener.hangup', ('uuid', '36s'), ('cause', '17s'), ('ended', '?'))
 
 
 def con_repr(self):
@@ -52,6 +74,15 @@ class EventListener(object):
     HOST = '127.0.0.1'
     PORT = '8021'
     AUTH = 'ClueCon'
+    # max seconds an idle event loop thread waits before running queued ops
+    # (the pure python backend is woken as soon as work is queued)
+    IDLE_INTERVAL = 0.1
+    # headers copied into the `FailureRecord` of each failed session
+    FAILURE_HEADERS = (
+        'Caller-Direction', 'Caller-Destination-Number',
+        'variable_sip_term_status', 'variable_sip_hangup_disposition',
+        'variable_call_uuid',
+    )
 
     def __init__(self, host=HOST, port=PORT, auth=AUTH,
                  session_map=None,
@@ -60,6 +91,24 @@ class EventListener(object):
                  call_id_var='variable_call_uuid',
                  autorecon=30,
                  max_limit=float('inf'),
+                 backend=None,
+                 tx_pool_size=1,
+                 app_filter=False,
+                 loop=None,
+                 callback_workers=0,
+                 event_retention=None,
+                 recycle=0,
+                 session_table=False,
+                 failure_ring=1000,
+                 failure_headers=FAILURE_HEADERS,
+                 failure_dump=None,
+                 session_ttl=None,
+                 job_ttl=None,
+                 reap_interval=10,
+                 reap_confirm=True,
+                 bootstrap=False,
+                 reconcile=False,
+                 park_ttl=10,
                  # proxy_mng=None,
                  _tx_lock=None):
         '''
@@ -87,6 +136,79 @@ class EventListener(object):
             value specifies the of number seconds to spend re-trying the
             connection before bailing. A bool of 'True' will poll
             indefinitely and 'False' will not poll at all.
+        backend : string
+            Name of the connection implementation to use for all esl
+            sockets (see `switchy.connection.get_backend`).
+        tx_pool_size : int
+            Number of connections used for sending session commands. Each
+            new session is bound to the least loaded connection in the pool.
+            With the 'python' backend replies to these commands are read
+            off of the pool's sockets by the event loop.
+        app_filter : bool
+            Install server side event filters such that only events for
+            sessions tagged with the id of a loaded app (or of an assigned
+            `Client`) are delivered. Callbacks registered under the
+            'default' id will then no longer see untagged sessions.
+        loop : EventLoop
+            Process events from a (shared) `EventLoop` thread instead of
+            from a dedicated thread. Requires the 'python' backend.
+        callback_workers : int
+            Run app callback chains on a `CallbackPool` with this many
+            worker threads instead of inline on the event loop thread.
+            Events for the same call are always processed in order by the
+            same worker. Note that callbacks then see session state as of
+            when they run which may include data from later events.
+            The default of 0 runs callbacks inline.
+        event_retention : string or tuple
+            Default policy for how many events each `Session` keeps (see
+            `models.get_retention`): 'all', (first, last) or 'snapshot'.
+            Policies can also be set per app id with `set_event_retention`.
+        recycle : int
+            Keep up to this many hung up `Session`, `Call` and `Job`
+            instances (each) on free lists for reuse by new channels. A
+            call's instances are released once the event which ended it
+            has been processed (including its callbacks) after which apps
+            must not use them. Requires inline callbacks
+            (`callback_workers=0`).
+        session_table : bool
+            Mirror all active sessions in a numpy backed `SessionTable`
+            (see `switchy.table`) which supports vectorized queries such
+            as counts by answer state and age distributions.
+        failure_ring : int
+            Number of `FailureRecord`s kept per hangup cause in
+            `failed_sessions`.
+        failure_headers : sequence
+            Names of the headers copied into each `FailureRecord`.
+        failure_dump : string
+            Path of a file to which the full event history of each failed
+            session is appended.
+        session_ttl : float
+            Expire (reap) sessions which have not received an event for this
+            many seconds (as per the slave's clock) such as those whose
+            hangup event was lost (see `Reaper`). Expired sessions are not
+            counted as failed. Unless `reap_confirm` is set, healthy calls
+            which are quiet for longer than this are evicted too (lowering
+            `count_calls` and letting an `Originator` exceed its `limit`)
+            so pick a ttl longer than any expected call.
+        job_ttl : float
+            Expire background jobs which have not completed this many
+            seconds after launch or which are complete but not associated
+            with a tracked session.
+        reap_interval : float
+            Seconds between reaper passes.
+        reap_confirm : bool
+            Spare sessions (and their jobs) which the slave still reports
+            through ``show channels`` before evicting (the default).
+        bootstrap : bool
+            Load the channels already active on the slave (see `reconcile`)
+            whenever this listener (re)connects.
+        reconcile : bool
+            Reconcile local state with the slave's channels (see
+            `reconcile`) every `reap_interval` seconds.
+        park_ttl : float
+            Seconds to hold a ``BACKGROUND_JOB`` event which arrives before
+            its job has been registered (see `register_job`) after which it
+            is recorded as unconsumed.
         '''
         self.server = host
         self.port = port
@@ -95,15 +217,33 @@ class EventListener(object):
         self._bg_jobs = bg_jobs or OrderedDict()
         self._calls = OrderedDict()  # maps aleg uuids to Sessions instances
         self.hangup_causes = Counter()  # record of causes by category
-        self.failed_sessions = OrderedDict()
+        self.failed_sessions = OrderedDict()  # cause -> FailureRecords
+        self.failure_ring = failure_ring
+        self.failure_headers = tuple(failure_headers)
+        self.failure_dump = failure_dump
+        self._dump_file = None
+        self._counters = None  # shared pool wide totals
+        self._ops = deque()  # (func, args, future) to run on the loop thread
+        self._wake_fds = None  # self-pipe for waking a dedicated loop thread
+        # job uuid -> (event, time) for BACKGROUND_JOBs which beat their
+        # registration
+        self._parked = OrderedDict()
+        self.park_ttl = park_ttl
+        self.bootstrap = bootstrap
+        self._gone = None  # sessions hungup during a reconcile
+        self.reconciled = Counter()  # 'added', 'evicted' -> counts
+        self.consumers = {}  # callback chains, one for each event type
         self._handlers = self.default_handlers  # active handler set
         self._unsub = ()
-        self.consumers = {}  # callback chains, one for each event type
-        self._waiters = {}  # holds events being waited on
-        self._blockers = []  # holds cached events for reuse
         # store up to the last 1k of each event type
         self.events = defaultdict(functools.partial(deque, maxlen=1e3))
         self.sessions_per_app = Counter()
+        self.app_filter = app_filter
+        self._app_ids = Counter()  # app ids to filter for -> ref counts
+        get_retention(event_retention)  # validate
+        self.event_retention = event_retention
+        self._retention = {}  # app id -> event retention policy
+        self._filters_stale = False
 
         # constants
         self.autorecon = autorecon
@@ -123,14 +263,52 @@ class EventListener(object):
 
         # sync
         self._exit = mp.Event()  # indicate when event loop should terminate
-        self._lookup_blocker = mp.Event()  # used block event loop temporarily
-        self._lookup_blocker.set()
         self.log = utils.get_logger(utils.pstr(self))
         self._epoch = self._fs_time = 0.0
+        # slave minus local clock as of the last time stamped event
+        self._fs_skew = 0.0
+        # rolling histogram of event processing lag (seconds)
+        self.lag = utils.LagHistogram()
 
         # set up contained connections
-        self._rx_con = rx_con or Connection(self.server, self.port, self.auth)
-        self._tx_con = Connection(self.server, self.port, self.auth)
+        self._rx_con = rx_con or Connection(
+            self.server, self.port, self.auth, backend=backend)
+        self._tx_con = ConnectionPool(
+            self.server, self.port, self.auth, size=tx_pool_size,
+            backend=self._rx_con.backend)
+        # the set of sockets read by the event loop must be refreshed
+        self._tx_stale = False
+        self._tx_con.on_repair = self._tx_repaired
+
+        self._loop = loop
+        if loop is not None and not hasattr(self._rx_con._backend, 'drain'):
+            raise ConfigurationError(
+                "the '{}' backend can not be serviced by an `EventLoop`"
+                .format(self.backend))
+
+        self._cb_pool = CallbackPool(
+            callback_workers, name='{}-callbacks'.format(self._id)
+        ) if callback_workers else None
+
+        # model instance free lists
+        if recycle and callback_workers:
+            raise ConfigurationError(
+                "`recycle` requires callbacks to be run inline")
+        self._recycle = bool(recycle)
+        self.free_lists = OrderedDict(
+            (cls.__name__, FreeList(recycle)) for cls in (Session, Call, Job)
+        ) if recycle else None
+        self._released = []  # ended calls and jobs to be recycled
+
+        if session_table and SessionTable is None:
+            raise ConfigurationError(
+                "numpy must be installed to use a `session_table`")
+        self.session_table = SessionTable() if session_table else None
+
+        self.reaper = Reaper(
+            self, session_ttl, job_ttl, interval=reap_interval,
+            confirm=reap_confirm, reconcile=reconcile,
+        ) if session_ttl or job_ttl or reconcile else None
 
         # mockup thread
         self._thread = None
@@ -150,17 +328,54 @@ class EventListener(object):
 
     ident = utils.pstr
 
+    def _get_handlers(self):
+        return self._handler_map
+
+    def _set_handlers(self, handlers):
+        self._handler_map = handlers
+        self._compile_plans()
+
+    _handlers = property(_get_handlers, _set_handlers,
+                         doc="Map of event names to handlers")
+
+    def _compile_plans(self):
+        '''Build the dispatch plan for each handled event type: the handler
+        plus a map of consumer ids to their callback chains. The new plans
+        are swapped in with a single assignment such that the event loop
+        always sees a consistent set.
+        '''
+        plans = {}
+        for evname, handler in self._handler_map.items():
+            chains = {}
+            for cid, ev_map in self.consumers.items():
+                cbs = ev_map.get(evname)
+                if cbs:
+                    chains[cid] = tuple(cbs)
+            plans[evname] = (handler, chains)
+        self._id_vars = tuple(
+            'variable_{}'.format(var) for var in (Client.id_var, Client.id_xh))
+        self._plans = plans
+
     @property
     def sessions(self):
         return self._sessions
 
-    def count_sessions(self):
-        return len(self.sessions)
+    def count_sessions(self, **filters):
+        '''Count active sessions. If `filters` are provided they are
+        applied (vectorized) by the `session_table` (see
+        `SessionTable.mask`).
+        '''
+        if not filters:
+            return len(self.sessions)
+        if self.session_table is None:
+            raise ConfigurationError(
+                "session filters require a `session_table`")
+        return self.session_table.count(**filters)
 
     def count_failed(self):
         '''Return the failed session count
         '''
-        return sum(map(len, self.failed_sessions.values()))
+        return self.total_failed_sessions
 
     @property
     def bg_jobs(self):
@@ -185,9 +400,21 @@ class EventListener(object):
         '''
         # TODO: maybe use a collection here instead?
         for name, attr in vars(self).items():
-            if isinstance(attr, Connection):
+            if isinstance(attr, (Connection, ConnectionPool)):
                 yield name, attr
 
+    @property
+    def tx_pool(self):
+        """The pool of connections used for session commands
+        """
+        return self._tx_con
+
+    @property
+    def backend(self):
+        """Name of the connection implementation in use
+        """
+        return self._rx_con.backend
+
     @property
     def call_id_var(self):
         """Channel variable used for associating sip legs into a 'call'
@@ -211,23 +438,13 @@ class EventListener(object):
         return (self._fs_time - self._epoch) / 60.0
 
     def block_jobs(self):
-        '''Block the event loop from processing
-        background job events (useful for registering for
-        job events - see `self.register_job`)
-
-        WARNING
-        -------
-        This will block the event loop thread permanently starting on the next
-        received background job event. Be sure to run 'unblock_jobs'
-        immediately after registering your job.
+        '''No-op kept for backwards compatibility; the event loop no longer
+        needs to be blocked while registering jobs (see `register_job`)
         '''
-        self._lookup_blocker.clear()
 
     def unblock_jobs(self):
-        '''Unblock the event loop from processing
-        background job events
+        '''No-op kept for backwards compatibility (see `block_jobs`)
         '''
-        self._lookup_blocker.set()
 
     def status(self):
         '''Return the status of ESL connections in a dict
@@ -241,15 +458,42 @@ class EventListener(object):
         Return bool indicating if listener is running
         (i.e. the background event consumer loop is executing)
         '''
+        if self._loop is not None:
+            return self._loop.serves(self)
         return self._thread.is_alive() if self._thread else False
 
     def reset(self):
         '''Clear all internal stats and counters
         '''
         self.log.debug('resetting all stats...')
+        counters = self._counters
+        if counters is not None:
+            counters.merge(self, sign=-1)
+        self.lag.clear()
         self.hangup_causes.clear()
         self.failed_jobs = Counter()
+        self.failed_sessions.clear()
         self.total_answered_sessions = 0
+        self.total_failed_sessions = 0
+        if counters is not None:
+            counters.merge(self)
+
+    def share_counters(self, counters):
+        '''Keep the running totals of a `distribute.PoolCounters` up to
+        date with this listener's state
+        '''
+        if self._counters is not None:
+            self._counters.merge(self, sign=-1)
+        if counters is not None:
+            counters.merge(self)
+        self._counters = counters
+
+    @property
+    def callback_pool(self):
+        '''The `CallbackPool` running app callbacks or `None` if callbacks
+        are run inline by the event loop
+        '''
+        return self._cb_pool
 
     def start(self):
         '''Start this listener's event loop in a thread to start tracking
@@ -258,7 +502,16 @@ class EventListener(object):
         if not self._rx_con.connected():
             raise ConfigurationError("you must call 'connect' first")
 
-        if self._thread is None or not self._thread.is_alive():
+        if self._cb_pool is not None:
+            self._cb_pool.start()
+        if self.reaper is not None:
+            self.reaper.start()
+
+        if self._loop is not None:
+            if not self.is_alive():
+                self.log.debug("registering with shared event loop...")
+                self._loop.add(self)
+        elif self._thread is None or not self._thread.is_alive():
             self.log.debug("starting event loop thread...")
             self._thread = Thread(target=self._listen_forever, args=(),
                                   name='event_loop')
@@ -284,7 +537,15 @@ class EventListener(object):
             # 2) this is the bg thread which is obviously alive
             # it's one of the above so just kill con
             self._rx_con.disconnect()
+        if self._cb_pool is not None:
+            # let callbacks for already processed events complete
+            self._cb_pool.stop()
+        if self.reaper is not None:
+            self.reaper.stop()
         self._tx_con.disconnect()
+        if self._dump_file is not None:
+            self._dump_file.close()
+            self._dump_file = None
         self.log.info("Disconnected listener '{}' from '{}'".format(self._id,
                       self.server))
 
@@ -294,7 +555,11 @@ class EventListener(object):
         '''
         self._exit.set()
         # crucial check to avoid deadlock
-        if current_thread() is not self._thread:
+        if self._loop is not None and current_thread() is not self._thread:
+            self._loop.remove(self)
+            self._rx_con.disconnect()
+            self._exit.clear()
+        elif current_thread() is not self._thread:
             # NOTE: if _rx_con is disconnected the bg thread should be looping
             # just collecting server discon events
             if self._rx_con.connected():  # might be waiting on recvEvent
@@ -317,8 +582,15 @@ class EventListener(object):
         # subscribe rx for all events dictated by current handler set
         self._rx_con.subscribe(
             (ev for ev in self._handlers if ev not in self._unsub))
+        self._update_filters()
         self.log.info("Connected listener '{}' to '{}'".format(self._id,
                       self.server))
+        if self.bootstrap:
+            try:
+                self.reconcile()
+            except Exception:
+                self.log.error("failed to load active channels from '{}':\n{}"
+                               .format(self.server, traceback.format_exc()))
 
     def get_new_con(self, server=None, port=None, auth=None,
                     register_events=False,
@@ -345,6 +617,7 @@ class EventListener(object):
         -------
         con : Connection
         '''
+        kwargs.setdefault('backend', self.backend)
         con = Connection(server or self.server, port or self.port,
                          auth or self.auth, **kwargs)
         if register_events:
@@ -373,6 +646,7 @@ class EventListener(object):
             self._rx_con.subscribe((evname,))
         # add handler to active map
         self._handlers[evname] = handler
+        self._compile_plans()
 
     def add_callback(self, evname, ident, callback, *args, **kwargs):
         '''Register a callback for events of type `evname` to be called
@@ -398,6 +672,7 @@ class EventListener(object):
             ident, {}).setdefault(
                 evname, deque()
             ).append(callback)
+        self._compile_plans()
         return True
 
     def remove_callback(self, evname, ident, callback):
@@ -412,6 +687,70 @@ class EventListener(object):
             ev_map.pop(evname)
         if len(ev_map) == 0:
             self.consumers.pop(ident)
+        self._compile_plans()
+
+    def set_event_retention(self, policy, ident=None):
+        '''Set the event retention `policy` for sessions tagged with app id
+        `ident` or the default policy if no id is provided. A `None` policy
+        removes a previously set per app policy.
+        '''
+        get_retention(policy)  # validate
+        if ident is None:
+            self.event_retention = policy
+        elif policy is None:
+            self._retention.pop(ident, None)
+        else:
+            self._retention[ident] = policy
+
+    def add_app_filter(self, ident):
+        '''Have the server deliver events for sessions tagged with app
+        id `ident` (only takes effect when `app_filter` is enabled).
+        '''
+        self._app_ids[ident] += 1
+        if self._app_ids[ident] == 1:
+            if ident == 'default' and self.app_filter:
+                self.log.warning(
+                    "untagged sessions are filtered out so callbacks "
+                    "registered under the 'default' id will not be invoked")
+            self._update_filters()
+
+    def remove_app_filter(self, ident):
+        '''Stop receiving events for app id `ident`
+        '''
+        self._app_ids[ident] -= 1
+        if self._app_ids[ident] <= 0:
+            del self._app_ids[ident]
+            self._update_filters()
+
+    def iter_filters(self):
+        '''Iterate the (header, value) event filters for all app ids
+        '''
+        # job results carry no channel variables
+        yield 'Event-Name', 'BACKGROUND_JOB'
+        for ident in self._app_ids:
+            for var in (Client.id_var, Client.id_xh):
+                yield 'variable_{}'.format(var), ident
+
+    def _update_filters(self):
+        '''Sync the rx connection's filters with the current app ids
+        '''
+        rx = self._rx_con
+        if not self.app_filter or not rx.connected():
+            return
+        if (self.is_alive() and current_thread() is not self._thread and
+                not rx._threadsafe):
+            # the event loop holds the connection while waiting so let it
+            # apply the change after the next received event
+            self._filters_stale = True
+            return
+        self._filters_stale = False
+        wanted = list(self.iter_filters())
+        for pair in wanted:
+            if pair not in rx._filters:
+                rx.add_filter(*pair)
+        for pair in rx._filters:
+            if pair not in wanted:
+                rx.del_filter(*pair)
 
     def unsubscribe(self, events):
         '''Unsubscribe this listener from an events of a cetain type
@@ -437,6 +776,7 @@ class EventListener(object):
                 popped = True
             except KeyError:
                 failed.append(ev_name)
+        self._compile_plans()
         if failed:
             self.log.warning("no handler(s) registered for events of type "
                              "'{}'".format("', '".join(failed)))
@@ -453,7 +793,9 @@ class EventListener(object):
     def register_job(self, event, **kwargs):
         '''Register for a job to be handled when the appropriate event arrives.
         Once an event corresponding to the job is received, the bgjob event
-        handler will 'consume' it and invoke its callback.
+        handler will 'consume' it and invoke its callback. If that event
+        arrived before registration it was parked by the event loop and is
+        handed back to the loop thread to be processed now.
 
         Parameters
         ----------
@@ -466,38 +808,407 @@ class EventListener(object):
         -------
         bj : an instance of Job (a background job)
         '''
-        bj = Job(event, **kwargs)
+        bj = self.free_lists['Job'].get() if self._recycle else None
+        if bj is None:
+            bj = Job(event, **kwargs)
+        else:
+            bj.recycle(event, **kwargs)
         self.bg_jobs[bj.uuid] = bj
+        if self._counters is not None:
+            self._counters.update(jobs=1)
+        # the loop thread checks `bg_jobs` again after parking an event so
+        # one of us is guaranteed to see the other's insertion
+        if bj.uuid in self._parked:
+            self.call_soon(self._unpark, bj.uuid)
         return bj
 
+    def _park(self, job_uuid, e):
+        '''Hold a BACKGROUND_JOB event for a job which is not (yet)
+        registered, discarding those held for longer than `park_ttl`
+        '''
+        now = time.time()
+        self._parked[job_uuid] = (e, now)
+        self._expire_parked(now)
+
+    def _expire_parked(self, now=None):
+        '''Discard BACKGROUND_JOB events parked for longer than `park_ttl`
+        recording them as unconsumed (they belong to jobs we don't track)
+        '''
+        parked = self._parked
+        expiry = (now or time.time()) - self.park_ttl
+        events = self.events['BACKGROUND_JOB']
+        while parked:
+            uuid, (e, stamp) = next(parked.iteritems())
+            if stamp > expiry:
+                break
+            del parked[uuid]
+            events.append((e, stamp))
+
+    def _unpark(self, job_uuid):
+        '''Process a parked BACKGROUND_JOB event now that its job has been
+        registered
+        '''
+        entry = self._parked.pop(job_uuid, None)
+        if entry is not None:
+            self._dispatch(entry[0], 'BACKGROUND_JOB')
+
+    def _watched(self):
+        '''Return a map of socket descriptors to the pure python protocol
+        connections read by the event loop: the rx connection plus each tx
+        pool member (whose command replies no one else may wait on)
+        '''
+        cons = [self._rx_con._con]
+        cons.extend(member._con for member in self._tx_con)
+        watched = {}
+        for con in cons:
+            if con and con.connected() and hasattr(con, 'drain'):
+                watched[con.fileno()] = con
+        return watched
+
+    def _tx_repaired(self, index):
+        '''Have the event loop read the socket of a reconnected tx pool
+        member
+        '''
+        self._tx_stale = True
+        self._wake()
+
+    def _wake(self):
+        '''Have the event loop run any pending work
+        '''
+        if self._loop is not None:
+            self._loop._notify(self)
+        elif self._wake_fds is not None:
+            try:
+                os.write(self._wake_fds[1], 'x')
+            except OSError:  # pipe is full so a wakeup is already pending
+                pass
+
     def _listen_forever(self):
         '''Process events until stopped
         '''
+        if hasattr(self._rx_con._backend, 'drain'):
+            return self._poll_forever()
+        recv = self._rx_con.recvEventTimed
+        idle_ms = int(self.IDLE_INTERVAL * 1000)
         while not self._exit.is_set():
             # block waiting for next event
-            e = self._rx_con.recvEvent()
-            # self.log.warning(get_event_time(e) - self._fs_time)
-            if not e:
-                self.log.error("Received empty event!?")
-            else:
-                evname = e.getHeader('Event-Name')
-                if evname:
-                    consumed = self._process_event(e, evname)
-                else:
-                    self.log.warn("received unamed event '{}'?".format(e))
-                # append events which are not consumed
-                if not consumed:
-                    self.events[evname].append((e, time.time()))
+            e = recv(idle_ms)
+            if not e:  # timed out
+                if self._ops:
+                    self._run_ops()
+                if self._parked:
+                    self._expire_parked()
+                continue
+            self._handle_event(e)
+        self.log.debug("exiting listener event loop")
+        self._rx_con.disconnect()
+        self._exit.clear()  # clear event loop for next re-entry
+
+    def _poll_forever(self):
+        '''Process events until stopped while also reading command replies
+        off of the tx pool's sockets (pure python backend)
+        '''
+        poller = select.poll()
+        mask = select.POLLIN
+        timeout = int(self.IDLE_INTERVAL * 1000)
+        if self._wake_fds is None:
+            self._wake_fds = wake_pipe()
+        wake_r = self._wake_fds[0]
+        poller.register(wake_r, mask)
+        watched = {}
+        rx = None
+        while not self._exit.is_set():
+            if rx is not self._rx_con._con or self._tx_stale:
+                # (re)connected so watch the current sockets
+                self._tx_stale = False
+                rx = self._rx_con._con
+                if rx:
+                    rx.on_events = self._wake
+                current = self._watched()
+                for fd, con in watched.items():
+                    if current.get(fd) is not con:
+                        poller.unregister(fd)
+                for fd, con in current.items():
+                    if watched.get(fd) is not con:
+                        poller.register(fd, mask)
+                watched = current
+            # events may have been queued by another thread's read
+            rx_ready = bool(rx and rx._events)
+            try:
+                ready = poller.poll(0 if rx_ready else timeout)
+            except (IOError, OSError, select.error) as err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                raise
+            for fd, _ in ready:
+                if fd == wake_r:
+                    try:
+                        os.read(wake_r, 4096)
+                    except OSError:
+                        pass
+                    continue
+                con = watched.get(fd)
+                if con is rx:
+                    rx_ready = True
+                elif con is not None:
+                    con.drain()  # resolves reply futures
+                if con is not None and not con.connected():
+                    del watched[fd]
+                    poller.unregister(fd)
+            if rx_ready:
+                for e in rx.drain():
+                    self._handle_event(e)
+            elif self._parked:
+                self._expire_parked()
+            if self._ops:
+                self._run_ops()
         self.log.debug("exiting listener event loop")
         self._rx_con.disconnect()
         self._exit.clear()  # clear event loop for next re-entry
 
+    def _handle_event(self, e):
+        '''Process a single received event
+        '''
+        # self.log.warning(get_event_time(e) - self._fs_time)
+        if not e:
+            self.log.error("Received empty event!?")
+        else:
+            evname = e.getHeader('Event-Name')
+            if evname:
+                consumed = self._process_event(e, evname)
+            else:
+                self.log.warn("received unamed event '{}'?".format(e))
+            # append events which are not consumed (parked job events are
+            # appended only if they expire)
+            if not consumed and not (
+                evname == 'BACKGROUND_JOB' and
+                e.getHeader('Job-UUID') in self._parked
+            ):
+                self.events[evname].append((e, time.time()))
+        if self._released:
+            self._release()
+        if self._filters_stale:
+            self._update_filters()
+        if self._ops:
+            self._run_ops()
+        if self._parked:
+            self._expire_parked()
+
+    def call_soon(self, func, *args):
+        '''Run `func(*args)` on the event loop thread after the event
+        currently being processed (or as soon as it is woken when idle; a
+        dedicated thread using the swig backend checks every
+        `IDLE_INTERVAL` seconds) and return a future for its result. If the
+        event loop is not running `func` is run immediately.
+        '''
+        future = futures.Future()
+        self._ops.append((func, args, future))
+        if not self.is_alive() or current_thread() is self._thread:
+            self._run_ops()
+        else:
+            self._wake()
+        return future
+
+    def _fetch_channels(self):
+        '''Return the rows of ``show channels as json`` from the slave
+        '''
+        body = self._tx_con.api('show channels as json').getBody()
+        return json.loads(body).get('rows', ())
+
+    def reconcile(self, evict=True, timeout=None):
+        '''Bring local state in line with the channels reported by the
+        slave in a single ``show channels as json`` request: sessions (and
+        calls) are built for channels which are not tracked and, if `evict`
+        is set, tracked sessions unknown to the slave are expired.
+
+        Return a counter of 'added' and 'evicted' sessions or `None` if the
+        event loop did not apply the changes within `timeout` seconds.
+        '''
+        since = self.call_soon(self._begin_reconcile)
+        if not since.wait(timeout):
+            self.call_soon(self._apply_channels, None, None, False)
+            return None
+        try:
+            rows = self._fetch_channels()
+        except Exception:
+            self.call_soon(self._apply_channels, None, None, False)
+            raise
+        applied = self.call_soon(
+            self._apply_channels, rows, since.result(), evict)
+        return applied.result() if applied.wait(timeout) else None
+
+    def _slave_time(self):
+        '''Estimate the slave's current time from the local clock (events
+        may not have been received for some time, e.g. across a reconnect)
+        '''
+        return time.time() + self._fs_skew
+
+    def _begin_reconcile(self):
+        # note hangups processed while the channel list is fetched
+        self._gone = set()
+        return self._slave_time()
+
+    def _apply_channels(self, rows, since, evict):
+        '''Track channels in `rows` and expire sessions created before
+        `since` which are missing from them (runs on the event loop thread)
+        '''
+        gone, self._gone = self._gone or (), None
+        counts = Counter()
+        if rows is None:
+            return counts
+        sessions = self.sessions
+        seen = set(row.get('uuid') for row in rows)
+        new = [row for row in rows
+               if row.get('uuid') not in sessions and
+               row.get('uuid') not in gone]
+        if new:
+            counts['added'] = self._track_channels(new)
+        # the slave's clock is at least as late as its newest channel
+        self._fs_time = max(self._fs_time, max(
+            int(row.get('created_epoch') or 0) for row in rows) if rows else 0)
+        if evict:
+            for uuid in [uuid for uuid, sess in sessions.items()
+                         if uuid not in seen and
+                         sess.times['create'] < since]:
+                self._expire_session(uuid, RECONCILED)
+                counts['evicted'] += 1
+        if counts:
+            self.log.info("reconciled with '{}': added {} and evicted {} "
+                          "sessions".format(self.server, counts['added'],
+                                            counts['evicted']))
+        self.reconciled.update(counts)
+        return counts
+
+    def _track_channels(self, rows):
+        '''Build sessions (and calls) for untracked channel `rows` in bulk
+        rather than one at a time through `_handle_initial_event` (runs on
+        the event loop thread). Return the number of sessions added.
+        '''
+        columns = CHANNEL_COLUMNS
+        if self.call_id_var not in columns:
+            columns = dict(columns)
+            columns[self.call_id_var] = 'call_uuid'
+        call_id_var = self.call_id_var
+        # channel listings rarely carry the app id variables
+        get_id = self.get_id if any(
+            var in columns for var in self._id_vars) else None
+        retention, retain = self._retention, self.event_retention
+        sessions, calls = self.sessions, self.calls
+        per_app = Counter()
+        table = self.session_table
+        free_sessions, free_calls = (
+            self.free_lists['Session'], self.free_lists['Call']
+        ) if self._recycle else (None, None)
+        # spread sessions over the tx pool members which are up (dead ones
+        # are reconnected in the background and restored in place)
+        cons = [None]
+        if not self._shared:
+            try:
+                cons = [con for con in self._tx_con if con.connected()] or [
+                    self._tx_con.get(repair=False)]
+            except ConnectionError:
+                self.log.warning("No tx connection available for sessions")
+        ncons = len(cons)
+        new_calls = 0
+        now = str(int(self._slave_time()))
+        for index, row in enumerate(rows):
+            # unbridged channels are their own call
+            if not row.get('call_uuid'):
+                row['call_uuid'] = row.get('uuid')
+            if not row.get('created_epoch'):
+                row['created_epoch'] = now
+            e = ChannelRow(row, columns)
+            uuid = str(row['uuid'])
+            cid = get_id(e, 'default') if get_id else 'default'
+            con = cons[index % ncons]
+            sess = free_sessions.get() if free_sessions else None
+            if sess is None:
+                sess = Session(e, uuid=uuid, con=con,
+                               retain=retention.get(cid, retain))
+            else:
+                sess.recycle(e, uuid=uuid, con=con,
+                             retain=retention.get(cid, retain))
+            sess.cid = cid
+            call_uuid = e.getHeader(call_id_var)
+            call = calls.get(call_uuid)
+            if call is None:
+                call = free_calls.get() if free_calls else None
+                if call is None:
+                    call = Call(call_uuid, sess)
+                else:
+                    call.recycle(call_uuid, sess)
+                calls[call_uuid] = call
+                new_calls += 1
+            else:
+                call.append(sess)
+            if row.get('callstate') in ('ACTIVE', 'HELD'):
+                sess.answered = True
+            if _tp_create.enabled:
+                _tp_create(uuid, call.first is not sess)
+            if table is not None:
+                table.add(uuid, sess.times['create'], cid,
+                          call.first is not sess)
+                if sess.answered:
+                    table.answer(uuid, float('nan'))
+            sess.call = call
+            sessions[uuid] = sess
+            per_app[cid] += 1
+        self.sessions_per_app.update(per_app)
+        if self._counters is not None:
+            for cid, count in per_app.items():
+                self._counters.update(sessions=count, app=cid)
+            self._counters.update(calls=new_calls)
+        return len(rows)
+
+    def _expire_session(self, uuid, cause):
+        '''Hangup a tracked session for which no hangup event will arrive
+        (runs on the event loop thread)
+        '''
+        sess = self.sessions[uuid]
+        headers = [
+            ('Event-Name', 'CHANNEL_HANGUP'),
+            ('Unique-ID', uuid),
+            ('Event-Date-Timestamp',
+             str(int((self._fs_time or self._slave_time()) * 1e6))),
+            ('Hangup-Cause', cause),
+        ]
+        if sess.call is not None:
+            headers.append((self.call_id_var, sess.call.uuid))
+        return self._handle_hangup(Event(headers))
+
+    def _run_ops(self):
+        ops = self._ops
+        while ops:
+            func, args, future = ops.popleft()
+            try:
+                future.set_result(func(*args))
+            except Exception as err:
+                self.log.error("'{}' failed on the event loop:\n{}".format(
+                               func, traceback.format_exc()))
+                future.set_exception(err)
+
+    def _release(self):
+        '''Put ended calls (plus their sessions) and jobs on their free
+        lists; runs once the event which ended them has been processed
+        '''
+        released = self._released
+        free_sessions, free_calls, free_jobs = self.free_lists.values()
+        while released:
+            obj = released.pop()
+            if type(obj) is Job:
+                free_jobs.put(obj)
+                continue
+            free_calls.put(obj)
+            for sess in obj.release():
+                free_sessions.put(sess)
+
     # (uncomment for profiling)
     # @profile.do_cprofile
     def _process_event(self, e, evname):
         '''Process an ESL event by delegating to the appropriate handler
         and any succeeding callback chain. This is the core handler lookup
-        routine and should be optimized for speed.
+        routine and should be optimized for speed; all lookups are resolved
+        ahead of time by `_compile_plans`.
 
         An event is considered consumed if:
         1) the handler + callback chain returns True
@@ -511,77 +1222,116 @@ class EventListener(object):
             event type/name string
         '''
         # epoch is the time when first event is received
-        if self._epoch:
-            self._fs_time = get_event_time(e)
-        else:
-            self._epoch = self._fs_time = get_event_time(e)
-
-        consumed = False  # is this event consumed by a handler/callback
+        fs_time = get_event_time(e)
+        if fs_time:  # not a synthetic event (e.g. SERVER_DISCONNECTED)
+            self._fs_time = fs_time
+            if not self._epoch:
+                self._epoch = fs_time
+            # how far behind the server we are
+            now = time.time()
+            self.lag.add(now - fs_time, now)
+            self._fs_skew = fs_time - now
+
+        return self._dispatch(e, evname)
+
+    def _dispatch(self, e, evname):
+        '''Run the handler and callback chain for an event
+        '''
         if 'CUSTOM' in evname:
             evname = e.getHeader('Event-Subclass')
-        self.log.debug("receive event '{}'".format(evname))
+        plan = self._plans.get(evname)
+        if plan is None:
+            self.log.error("Unknown event '{}'".format(evname))
+            return False
 
-        handler = self._handlers.get(evname, False)
-        if handler:
-            self.log.debug("handler is '{}'".format(handler))
-            try:
-                consumed, ret = utils.uncons(*handler(e))  # invoke handler
-                # attempt to lookup a consuming client app by id
+        handler, chains = plan
+        consumed = False  # is this event consumed by a handler/callback
+        try:
+            ret = handler(e)  # invoke handler
+            consumed = ret[0]
+            if consumed:
+                ret = ret[1:]
                 model = ret[0]
-                cid = model.cid if model else self.get_id(e, 'default')
-                self.log.debug("consumer id is '{}'".format(cid))
-                consumers = self.consumers.get(cid, False)
-                if consumers and consumed:
-                    cbs = consumers.get(evname, ())
-                    self.log.debug(
-                        "consumer '{}' has callback '{}' registered for ev {}"
-                        .format(cid, cbs, evname)
-                    )
-                    # look up the client's callback chain and run
-                    # e -> handler -> cb1, cb2, ... cbN
-                    # map(operator.methodcaller('__call__', *ret),
-                    #                           consumers.get(evname, ()))
-                    # XXX assign ret on each interation in an attempt to avoid
-                    # python's dynamic scope lookup
-                    for cb, ret in zip(cbs, itertools.repeat(ret)):
+                cbs = None
+                if chains:
+                    # look up the consuming client app's callback chain
+                    # and run e -> handler -> cb1, cb2, ... cbN
+                    cbs = chains.get(
+                        model.cid if model else self.get_id(e, 'default'))
+                if cbs and self._cb_pool is not None:
+                    # hand off to the worker for this call
+                    self._cb_pool.submit(
+                        self._callback_key(e, evname, model, ret),
+                        self._run_chain, evname, cbs, ret)
+                    return consumed
+                if cbs:
+                    for cb in cbs:
                         cb(*ret)
-                    # unblock `session.vars` waiters
-                    if model in self._waiters:
-                        for varname, events in self._waiters[model].items():
-                            if model.vars.get(varname):
-                                map(Event.set, events)
-
-            # exception raised by handler/chain on purpose?
-            except ESLError:
-                consumed = True
-                self.log.warning("Caught ESL error for event '{}':\n{}"
-                                 .format(evname, traceback.format_exc()))
-            except Exception:
-                self.log.error("Failed to process event '{}':\n{}"
-                               .format(evname, traceback.format_exc()))
-            return consumed
-        else:
-            self.log.error("Unknown event '{}'".format(evname))
+
+        # exception raised by handler/chain on purpose?
+        except ESLError:
+            consumed = True
+            self.log.warning("Caught ESL error for event '{}':\n{}"
+                             .format(evname, traceback.format_exc()))
+        except Exception:
+            self.log.error("Failed to process event '{}':\n{}"
+                           .format(evname, traceback.format_exc()))
+        return consumed
+
+    def _callback_key(self, e, evname, model, ret):
+        '''Return the key which orders the callbacks of a consumed event on
+        the callback pool: the uuid of the call its session belongs to,
+        falling back to the session's uuid. Jobs are keyed by the session
+        they were issued for.
+        '''
+        if model is None and evname == 'BACKGROUND_JOB':
+            sess_uuid = ret[-1].sess_uuid
+            model = self.sessions.get(sess_uuid)
+            if model is None and sess_uuid:
+                return sess_uuid
+        call = getattr(model, 'call', None)
+        if call is not None and call.uuid:
+            return call.uuid
+        return getattr(model, 'uuid', None) or e.getHeader(
+            'Unique-ID') or e.getHeader('Job-UUID')
+
+    def _run_chain(self, evname, cbs, ret):
+        '''Run a callback chain on a `CallbackPool` worker
+        '''
+        try:
+            for cb in cbs:
+                cb(*ret)
+        except ESLError:
+            self.log.warning("Caught ESL error for event '{}':\n{}"
+                             .format(evname, traceback.format_exc()))
+        except Exception:
+            self.log.error("Failed to process event '{}':\n{}"
+                           .format(evname, traceback.format_exc()))
 
     def get_id(self, e, default=None):
         """Acquire the client/consumer id for event :var:`e`
         """
-        var = 'variable_{}'
-        for var in map(var.format, (Client.id_var, Client.id_xh)):
+        for var in self._id_vars:
             ident = e.getHeader(var)
             if ident:
-                self.log.debug(
-                    "sess lookup for id '{}' successfully returned '{}'"
-                    .format(var, ident)
-                )
                 return ident
         return default
 
+    def var_future(self, sess, varname):
+        '''Return a future resolved with the value of `sess.vars[varname]`
+        as soon as it is set to a true value (most usually by a callback)
+        '''
+        value = sess.vars.get(varname)
+        if value:
+            return futures.completed(value)
+        return sess.vars.watch(varname)
+
     def waitfor(self, sess, varname, timeout=None):
         '''Wait on a boolen variable `varname` to be set to true for
         session `sess` as read from `sess.vars['varname']`.
         This call blocks until the attr is set to `True` most usually
-        by a callback.
+        by a callback. Returns False if the session was recycled (see the
+        `recycle` option) before the variable was set.
 
         WARNING
         -------
@@ -589,23 +1339,47 @@ class EventListener(object):
         '''
         if sess.vars.get(varname):
             return
-        # retrieve cached event/blocker if possible
-        event = mp.Event() if not self._blockers else self._blockers.pop()
-        waiters = self._waiters.setdefault(sess, {})  # sess -> {vars: ...}
-        events = waiters.setdefault(varname, [])  # var -> [events]
-        events.append(event)
-        res = event.wait(timeout=timeout)  # block
-        if timeout and not res:
+        future = self.var_future(sess, varname)
+        if not future.wait(timeout):
+            sess.vars.unwatch(varname, future)
             raise mp.TimeoutError("'{}' was not set within '{}' seconds"
                                   .format(varname, timeout))
-        event.clear()  # make it block for next cached use
-        events.remove(event)  # event lifetime expires with this call
-        self._blockers.append(event)  # cache for later use
-        if not events:  # event list is now empty so delete
-            waiters.pop(varname)
-        if not waiters:  # no vars being waited so delete
-            self._waiters.pop(sess)
-        return res
+        return not future.cancelled()
+
+    def waitfor_all(self, sessions, varname, timeout=None):
+        '''Wait for `varname` to be set to true for every session in
+        `sessions`. Only the calling thread blocks no matter how many
+        sessions are waited on. Returns False if any session was recycled
+        before its variable was set.
+        '''
+        sessions = list(sessions)
+        fs = [self.var_future(sess, varname) for sess in sessions]
+        done, pending = futures.wait_all(fs, timeout)
+        if pending:
+            for sess, future in zip(sessions, fs):
+                sess.vars.unwatch(varname, future)
+            raise mp.TimeoutError(
+                "'{}' was not set for {} of {} sessions within '{}' seconds"
+                .format(varname, len(pending), len(fs), timeout))
+        return not any(future.cancelled() for future in done)
+
+    def waitfor_any(self, sessions, varname, timeout=None):
+        '''Wait for `varname` to be set to true for any session in
+        `sessions` and return that session (or `None` if they were all
+        recycled first)
+        '''
+        fs = {self.var_future(sess, varname): sess for sess in sessions}
+        try:
+            for future in futures.as_completed(fs, timeout):
+                if not future.cancelled():
+                    return fs[future]
+        except futures.TimeoutError:
+            raise mp.TimeoutError(
+                "'{}' was not set for any session within '{}' seconds"
+                .format(varname, timeout))
+        finally:
+            for future, sess in fs.items():
+                sess.vars.unwatch(varname, future)
 
     def lookup_sess(self, e):
         """The most basic handler template which looks up the locally tracked
@@ -684,15 +1458,18 @@ class EventListener(object):
         if err in body:
             resp = body.strip(err).strip()
             error = True
-            self.log.debug("job '{}' failed with:\n{}".format(
-                           job_uuid, str(body)))
-
-        if job_uuid in self.bg_jobs:
-            job = self.bg_jobs.get(job_uuid, None)
-        else:
-            # might be in the middle of inserting a job
-            self._lookup_blocker.wait()
-            job = self.bg_jobs.get(job_uuid, None)
+        if _tp_job.enabled:
+            _tp_job(job_uuid, error)
+
+        job = self.bg_jobs.get(job_uuid)
+        if job is None:
+            # might be in the middle of inserting a job so park the event
+            # for `register_job` to hand back and check once more
+            self._park(job_uuid, e)
+            job = self.bg_jobs.get(job_uuid)
+            if job is None:
+                return consumed, sess, job
+            self._parked.pop(job_uuid, None)
 
         # if this job is registered, process it
         if job:
@@ -715,14 +1492,25 @@ class EventListener(object):
                     if not sess:
                         self.log.debug("No session corresponding to bj "
                                        "'{}'".format(job_uuid))
+                    else:
+                        self.sessions_per_app[sess.cid] -= 1
+                        if self.session_table is not None:
+                            self.session_table.remove(job.sess_uuid)
                     # remove any call repr by this sess
                     call = self.calls.pop(job.sess_uuid, None)
                     if not call:
                         self.log.debug("No call corresponding to uuid "
                                        "'{}'".format(call))
+                    if self._counters is not None:
+                        self._counters.update(
+                            sessions=-1 if sess else 0,
+                            calls=-1 if call else 0,
+                            app=sess.cid if sess else None)
                 job.fail(resp)  # fail the job
                 # always pop failed jobs
                 self.bg_jobs.pop(job_uuid)
+                if self._counters is not None:
+                    self._counters.update(jobs=-1)
                 # append the id for later lookup and discard?
                 self.failed_jobs[resp] += 1
 
@@ -742,8 +1530,6 @@ class EventListener(object):
                     # reference this job in the corresponding session
                     # self.sessions[resp].bg_job = job
                     sess.bg_job = job
-                    self.log.debug("Job '{}' was sucessful".format(
-                                   job_uuid))
                 # run the job's callback
                 job(resp)
             else:
@@ -756,21 +1542,39 @@ class EventListener(object):
         `Session` and `Call` objects for state tracking.
         '''
         uuid = e.getHeader('Unique-ID')
-        self.log.debug("channel created for session '{}'".format(uuid))
         # Record the newly activated session
         # TODO: pass con as weakref?
-        con = self._tx_con if not self._shared else None
-        uuid = e.getHeader('Unique-ID')
+        con = None
+        if not self._shared:
+            # bind to a single pool member to keep session commands in order
+            # (dead members are reconnected off of the event loop thread)
+            try:
+                con = self._tx_con.get(repair=False)
+            except ConnectionError:
+                self.log.warning("No tx connection available for session "
+                                 "'{}'".format(uuid))
+
+        table = self.session_table
+        originated = table is not None and (
+            e.getHeader('Event-Name') == 'CHANNEL_ORIGINATE')
 
         # short circuit if we have already allocated a session since FS is
         # indeterminate about which event create|originate will arrive first
         sess = self.sessions.get(uuid)
         if sess:
+            if originated:
+                table.set(uuid, 'originate', get_event_time(e))
             return True, sess
 
         # allocate a session model
-        sess = Session(e, uuid=uuid, con=con)
-        sess.cid = self.get_id(e, 'default')
+        cid = self.get_id(e, 'default')
+        retain = self._retention.get(cid, self.event_retention)
+        sess = self.free_lists['Session'].get() if self._recycle else None
+        if sess is None:
+            sess = Session(e, uuid=uuid, con=con, retain=retain)
+        else:
+            sess.recycle(e, uuid=uuid, con=con, retain=retain)
+        sess.cid = cid
         # note the start time and current load
         # TODO: move this to Session __init__??
         sess.times['create'] = get_event_time(e)
@@ -788,15 +1592,26 @@ class EventListener(object):
         # (i.e. set the relevant sessions to reference each other)
         if call_uuid in self.calls:
             call = self.calls[call_uuid]
-            self.log.debug("session '{}' is bridged to call '{}'".format(
-                           uuid, call.uuid))
             # append this session to the call's set
             call.append(sess)
 
         else:  # this sess is not yet tracked so use its id as the 'call' id
-            call = Call(call_uuid, sess)
+            call = self.free_lists['Call'].get() if self._recycle else None
+            if call is None:
+                call = Call(call_uuid, sess)
+            else:
+                call.recycle(call_uuid, sess)
             self.calls[call_uuid] = call
-            self.log.debug("call created for session '{}'".format(call_uuid))
+        if self._counters is not None:
+            self._counters.update(
+                sessions=1, calls=int(call.first is sess), app=sess.cid)
+        if _tp_create.enabled:
+            _tp_create(uuid, call.first is not sess)
+        if table is not None:
+            table.add(uuid, sess.times['create'], sess.cid,
+                      call.first is not sess)
+            if originated:
+                table.set(uuid, 'originate', sess.times['create'])
         sess.call = call
         self.sessions[uuid] = sess
         self.sessions_per_app[sess.cid] += 1
@@ -822,12 +1637,14 @@ class EventListener(object):
         uuid = e.getHeader('Unique-ID')
         sess = self.sessions.get(uuid, None)
         if sess:
-            self.log.debug('answered session {} with call direction {}'
-                           .format(uuid,  e.getHeader('Call-Direction')))
+            if _tp_answer.enabled:
+                _tp_answer(uuid)
             sess.answered = True
             self.total_answered_sessions += 1
             sess.times['answer'] = get_event_time(e)
             sess.update(e)
+            if self.session_table is not None:
+                self.session_table.answer(uuid, sess.times['answer'])
             return True, sess
         else:
             self.log.info('skipping answer of {}'.format(uuid))
@@ -846,6 +1663,10 @@ class EventListener(object):
         sess = self.sessions.pop(uuid, None)
         if not sess:
             return False, None
+        if self._gone is not None:
+            self._gone.add(uuid)
+        if self.session_table is not None:
+            self.session_table.remove(uuid)
         sess.update(e)
         sess.hungup = True
         sess.times['hangup'] = get_event_time(e)
@@ -854,6 +1675,7 @@ class EventListener(object):
         self.sessions_per_app[sess.cid] -= 1
 
         # if possible lookup the relevant call
+        ended = False
         call_uuid = e.getHeader(self.call_id_var)
         if not call_uuid:
             self.log.warn(
@@ -865,37 +1687,75 @@ class EventListener(object):
             call = self.calls.get(call_uuid, sess.call)
             if call:
                 if sess in call.sessions:
-                    self.log.debug("hungup session '{}' for call '{}'".format(
-                                   uuid, call.uuid))
                     call.sessions.remove(sess)
                 else:
                     self.log.warn("no call for session '{}'".format(sess.uuid))
 
                 # all sessions hungup
                 if len(call.sessions) == 0:
-                    self.log.debug("all sessions for call '{}' were hung up"
-                                   .format(call_uuid))
                     # remove call from our set
-                    self.calls.pop(call.uuid)
+                    ended = self.calls.pop(call.uuid, None) is not None
+                    if self._recycle:
+                        self._released.append(call)
             else:
                 self.log.warn("no call was found for '{}'".format(call_uuid))
-        self.log.debug("handling HANGUP for call_uuid: {}".format(call_uuid))
+        if _tp_hangup.enabled:
+            _tp_hangup(uuid, cause, call_uuid not in self.calls)
 
         # pop any corresponding job
         job = sess.bg_job
         # may have been popped by the partner
-        self.bg_jobs.pop(job.uuid if job else None, None)
+        popped = self.bg_jobs.pop(job.uuid if job else None, None)
         sess.bg_job = None  # deref job - avoid mem leaks
+        if popped is not None and self._recycle:
+            self._released.append(popped)
 
-        if not sess.answered or cause != 'NORMAL_CLEARING':
-            self.log.debug("'{}' was not successful??".format(sess.uuid))
-            self.failed_sessions.setdefault(
-                cause, deque(maxlen=1e3)).append(sess)
+        # sessions expired locally most likely ended normally
+        failed = cause not in EXPIRED and (
+            not sess.answered or cause != 'NORMAL_CLEARING')
+        if failed:
+            self._record_failure(sess, cause)
+        if self._counters is not None:
+            self._counters.update(
+                sessions=-1, calls=-ended, jobs=-(popped is not None),
+                failed=int(failed), app=sess.cid, cause=cause)
 
-        self.log.debug("hungup session '{}'".format(uuid))
         # hangups are always consumed
         return True, sess, job
 
+    def _record_failure(self, sess, cause):
+        '''Keep a `FailureRecord` for a failed session in the bounded ring
+        for its hangup `cause` and optionally dump its events to disk
+        '''
+        ring = self.failed_sessions.get(cause)
+        if ring is None:
+            ring = self.failed_sessions[cause] = deque(
+                maxlen=self.failure_ring)
+        ring.append(
+            FailureRecord.from_session(sess, cause, self.failure_headers))
+        self.total_failed_sessions += 1
+        if self.failure_dump:
+            self._dump_failure(sess, cause)
+
+    def _dump_failure(self, sess, cause):
+        '''Append the serialized events of a failed session to the
+        `failure_dump` file
+        '''
+        try:
+            if self._dump_file is None:
+                self._dump_file = open(self.failure_dump, 'a')
+            f = self._dump_file
+            f.write("# failed session '{}' cause '{}'\n\n".format(
+                sess.uuid, cause))
+            for ev in reversed(list(sess.events)):
+                f.write(ev.serialize())
+                f.write('\n')
+            f.flush()
+        except (IOError, OSError) as err:
+            self.log.error("failed to dump events for session '{}' to '{}': "
+                           "{}".format(sess.uuid, self.failure_dump, err))
+            self.failure_dump = None
+
     @classmethod
     def build_proxy(cls, mng):
         # register some attrs and methods to return proxies to shared objects
@@ -915,6 +1775,476 @@ class EventListener(object):
         return proxy
 
 
+ShardStats = namedtuple('ShardStats', 'index depth lag processed')
+
+# hangup causes recorded for sessions evicted by a `Reaper` or by
+# `EventListener.reconcile`
+REAPED = 'SWITCHY_REAPED'
+RECONCILED = 'SWITCHY_RECONCILED'
+# these are counted in `hangup_causes` but never as failures
+EXPIRED = frozenset((REAPED, RECONCILED))
+
+
+class Reaper(object):
+    '''Periodically evict sessions and jobs which have outlived their TTL,
+    most likely because their terminating event was lost (for example
+    across a server reconnect), from an `EventListener`.
+
+    Candidates are collected and evicted on the listener's event loop
+    thread (see `EventListener.call_soon`) such that no locking is needed.
+    Sessions are evicted by processing a synthetic hangup with cause
+    `REAPED` and pending jobs are failed. When `confirm` is set (the
+    default), candidates which are still reported by the slave (fetched in
+    bulk with ``show channels``) are spared.
+    '''
+    def __init__(self, listener, session_ttl=None, job_ttl=None,
+                 interval=10, confirm=True, reconcile=False):
+        self.listener = listener
+        self.session_ttl = session_ttl
+        self.job_ttl = job_ttl
+        self.interval = interval
+        self.confirm = confirm
+        self.reconcile = reconcile
+        self.log = utils.get_logger(utils.pstr(self))
+        self._thread = None
+        self._exit = ThreadEvent()
+        self._pending = None  # outstanding loop thread op
+        # stats
+        self.reaped = Counter()  # 'sessions', 'calls', 'jobs' -> counts
+        self.spared = 0  # candidates confirmed alive by the slave
+        self.passes = 0
+
+    def __repr__(self):
+        return "<{} sessions={} calls={} jobs={} spared={}>".format(
+            type(self).__name__, self.reaped['sessions'],
+            self.reaped['calls'], self.reaped['jobs'], self.spared)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.is_alive():
+            self._exit.clear()
+            self._thread = Thread(target=self._run, name='reaper')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self._exit.set()
+        if self.is_alive() and self._thread is not current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while not self._exit.wait(self.interval):
+            try:
+                self.reap(timeout=self.interval)
+                if self.reconcile:
+                    self.listener.reconcile(timeout=self.interval)
+            except Exception:
+                self.log.error("reaper pass failed:\n{}".format(
+                               traceback.format_exc()))
+
+    def _on_loop(self, timeout, func, *args):
+        # don't pile up ops while the loop is idle
+        if self._pending is not None and not self._pending.done():
+            return None
+        self._pending = future = self.listener.call_soon(func, *args)
+        return future.result(timeout) if future.wait(timeout) else None
+
+    def reap(self, timeout=None):
+        '''Run one pass evicting expired sessions and jobs. Return a counter
+        of evictions or `None` if the event loop did not get to the pass
+        within `timeout` seconds.
+        '''
+        candidates = self._on_loop(timeout, self._collect)
+        if candidates is None:
+            return None
+        sessions, jobs = candidates
+        if self.confirm and (sessions or jobs):
+            alive = self._alive()
+            if alive is None:
+                return None
+            spared = len(sessions) + len(jobs)
+            sessions = [uuid for uuid in sessions if uuid not in alive]
+            jobs = [uuid for uuid, sess_uuid in jobs
+                    if sess_uuid not in alive]
+            self.spared += spared - len(sessions) - len(jobs)
+        else:
+            jobs = [uuid for uuid, _ in jobs]
+        if not sessions and not jobs:
+            self.passes += 1
+            return Counter()
+        return self._on_loop(timeout, self._evict, sessions, jobs)
+
+    def _alive(self):
+        '''Return the set of channel uuids reported by the slave
+        '''
+        try:
+            rows = self.listener._fetch_channels()
+        except Exception:
+            self.log.warning("failed to list channels on '{}'; skipping "
+                             "reap:\n{}".format(self.listener.server,
+                                                traceback.format_exc()))
+            return None
+        return set(row['uuid'] for row in rows)
+
+    def _expired(self, sess):
+        ttl, now = self.session_ttl, self.listener._fs_time
+        if not ttl or not now:  # slave time unknown until an event arrives
+            return False
+        last = sess.time
+        return last is not None and now - last > ttl
+
+    def _collect(self):
+        '''Return uuids of expired sessions and (uuid, session uuid) pairs
+        of expired jobs (runs on the event loop thread)
+        '''
+        listener = self.listener
+        sessions = [uuid for uuid, sess in listener.sessions.items()
+                    if self._expired(sess)]
+        jobs = []
+        ttl = self.job_ttl
+        if ttl:
+            cutoff = time.time() - ttl
+            tracked = listener.sessions
+            jobs = [(uuid, job.sess_uuid)
+                    for uuid, job in listener.bg_jobs.items()
+                    if job.launch_time < cutoff and (
+                        not job.ready() or job.sess_uuid not in tracked)]
+        return sessions, jobs
+
+    def _evict(self, sessions, jobs):
+        '''Evict sessions and jobs which are still expired (runs on the
+        event loop thread)
+        '''
+        listener = self.listener
+        reaped = Counter()
+        calls = len(listener.calls)
+        for uuid in sessions:
+            sess = listener.sessions.get(uuid)
+            if sess is None or not self._expired(sess):
+                continue  # hungup or received an event since collection
+            listener._expire_session(uuid, REAPED)
+            reaped['sessions'] += 1
+        reaped['calls'] = calls - len(listener.calls)
+        for uuid in jobs:
+            job = listener.bg_jobs.pop(uuid, None)
+            if job is None:
+                continue
+            if not job.ready():
+                job.fail('reaped')
+            if listener._counters is not None:
+                listener._counters.update(jobs=-1)
+            reaped['jobs'] += 1
+        if any(reaped.values()):
+            self.log.warning("reaped {} sessions, {} calls and {} jobs"
+                             .format(reaped['sessions'], reaped['calls'],
+                                     reaped['jobs']))
+        self.reaped.update(reaped)
+        self.passes += 1
+        return reaped
+
+
+class CallbackPool(object):
+    '''Run callbacks on a fixed set of worker threads sharded by key.
+
+    All work submitted under the same key (a call uuid) is executed in
+    order by the same worker such that per-call event ordering is preserved
+    while separate calls are processed concurrently. A slow callback only
+    delays the calls hashed to its shard and never event intake.
+    '''
+    def __init__(self, workers=4, name='callbacks'):
+        if workers < 1:
+            raise ConfigurationError("at least one worker is required")
+        self.name = name
+        self._queues = [Queue.Queue() for _ in range(workers)]
+        self._threads = [None] * workers
+        self._processed = [0] * workers
+        self.log = utils.get_logger(utils.pstr(self))
+
+    def __repr__(self):
+        return "<{} '{}' workers={} depth={}>".format(
+            type(self).__name__, self.name, len(self), self.depth)
+
+    def __len__(self):
+        return len(self._queues)
+
+    def is_alive(self):
+        return any(t is not None and t.is_alive() for t in self._threads)
+
+    def start(self):
+        '''Start any worker threads which are not already running
+        '''
+        for index, thread in enumerate(self._threads):
+            if thread is None or not thread.is_alive():
+                thread = Thread(target=self._work, args=(index,),
+                                name='{}-{}'.format(self.name, index))
+                thread.daemon = True
+                thread.start()
+                self._threads[index] = thread
+
+    def stop(self, timeout=None):
+        '''Stop all workers once they have completed any queued work
+        '''
+        for queue, thread in zip(self._queues, self._threads):
+            if thread is not None and thread.is_alive():
+                queue.put(None)
+        for thread in self._threads:
+            if thread is not None and thread is not current_thread():
+                thread.join(timeout)
+
+    def submit(self, key, func, *args):
+        '''Queue `func(*args)` on the worker which owns `key`
+        '''
+        self._queues[hash(key) % len(self._queues)].put(
+            (time.time(), func, args))
+
+    def _work(self, index):
+        queue = self._queues[index]
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            _, func, args = item
+            try:
+                func(*args)
+            except Exception:
+                self.log.error("callback '{}' failed:\n{}".format(
+                               func, traceback.format_exc()))
+            self._processed[index] += 1
+
+    @property
+    def depth(self):
+        '''Total number of queued callback chains across all shards
+        '''
+        return sum(queue.qsize() for queue in self._queues)
+
+    def stats(self):
+        '''Return a `ShardStats` per worker where `lag` is the number of
+        seconds the oldest queued item has been waiting
+        '''
+        now = time.time()
+        stats = []
+        for index, queue in enumerate(self._queues):
+            with queue.mutex:
+                depth = len(queue.queue)
+                head = queue.queue[0] if depth else None
+            stats.append(ShardStats(
+                index, depth, now - head[0] if head else 0.,
+                self._processed[index]))
+        return stats
+
+
+def wake_pipe():
+    '''Return the (read, write) descriptors of a non-blocking pipe used to
+    wake a thread waiting in poll
+    '''
+    fds = os.pipe()
+    for fd in fds:
+        fcntl.fcntl(fd, fcntl.F_SETFL,
+                    fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+    return fds
+
+
+class EventLoop(object):
+    '''A single thread which services the rx connections of many
+    `EventListener`s by waiting on all their sockets with epoll (or poll)
+    and dispatching received events through each listener's usual
+    processing path.
+
+    This avoids a thread per listener (and the resulting GIL contention and
+    context switching) when tracking many slaves. Command replies on each
+    listener's tx pool connections are read by the loop as well. Note that
+    any blocking done by a handler or callback (including reconnection
+    attempts on server disconnect) stalls event processing for all
+    listeners.
+    '''
+    def __init__(self, timeout=1):
+        self.timeout = timeout  # max seconds to wait between exit checks
+        self.log = utils.get_logger(utils.pstr(self))
+        self._cons = {}  # listener -> serviced protocol connection
+        self._listeners = {}  # fd -> listener
+        self._fds = {}  # listener -> {fd: rx or tx protocol connection}
+        self._ready = deque()  # listeners with events queued elsewhere
+        self._changes = deque()  # pending (method, listener, done) calls
+        if hasattr(select, 'epoll'):
+            self._poller, self._scale = select.epoll(), 1
+            self._mask = select.EPOLLIN
+        else:
+            self._poller, self._scale = select.poll(), 1000
+            self._mask = select.POLLIN
+        self._wake_r, self._wake_w = wake_pipe()
+        self._poller.register(self._wake_r, self._mask)
+        self._exit = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self._cons)
+
+    def serves(self, listener):
+        '''Return bool indicating whether `listener` is being serviced
+        '''
+        return listener in self._cons and self.is_alive()
+
+    def is_alive(self):
+        return self._thread.is_alive() if self._thread else False
+
+    def start(self):
+        if not self.is_alive():
+            self._exit = False
+            self._thread = Thread(target=self._run, name='event_loop')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        '''Stop servicing all listeners and wait for the loop to exit
+        '''
+        self._exit = True
+        self._wake()
+        if self.is_alive() and current_thread() is not self._thread:
+            self._thread.join()
+
+    def add(self, listener):
+        '''Start servicing `listener`
+        '''
+        self.start()
+        self._call(self._add, listener)
+
+    def remove(self, listener):
+        '''Stop servicing `listener`
+        '''
+        self._call(self._remove, listener)
+
+    def _call(self, method, listener):
+        '''Run `method(listener)` in the loop thread and wait for it
+        '''
+        if current_thread() is self._thread or not self.is_alive():
+            return method(listener)
+        done = ThreadEvent()
+        self._changes.append((method, listener, done))
+        self._wake()
+        done.wait()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, 'x')
+        except OSError:  # pipe is full so a wakeup is already pending
+            pass
+
+    def _notify(self, listener):
+        '''Called by other threads which have queued events for `listener`
+        '''
+        self._ready.append(listener)
+        self._wake()
+
+    def _add(self, listener):
+        listener._thread = self._thread
+        self._register(listener)
+
+    def _remove(self, listener):
+        self._unregister(listener)
+        listener._thread = None
+
+    def _register(self, listener):
+        con = listener._rx_con._con
+        self._cons[listener] = con
+        if not con:
+            return
+        con.on_events = functools.partial(self._notify, listener)
+        listener._tx_stale = False
+        watched = self._fds[listener] = listener._watched()
+        for fd in watched:
+            self._listeners[fd] = listener
+            self._poller.register(fd, self._mask)
+        # events may have been queued before we started watching
+        self._ready.append(listener)
+
+    def _unregister(self, listener):
+        con = self._cons.pop(listener, None)
+        if con:
+            con.on_events = None
+        for fd in self._fds.pop(listener, ()):
+            self._forget(listener, fd)
+
+    def _forget(self, listener, fd):
+        if self._listeners.get(fd) is listener:
+            del self._listeners[fd]
+            try:
+                self._poller.unregister(fd)
+            except (IOError, OSError, KeyError, ValueError):
+                pass  # already closed
+
+    def _drain(self, listener, fd, con):
+        '''Read command replies off of one of `listener`'s tx connections
+        '''
+        con.drain()
+        if not con.connected():
+            # a repaired member is watched once the listener is serviced
+            del self._fds[listener][fd]
+            self._forget(listener, fd)
+
+    def _service(self, listener):
+        '''Process all events received for `listener`
+        '''
+        if listener not in self._cons:  # no longer serviced
+            return
+        con = self._cons[listener]
+        if con:
+            for event in con.drain():
+                listener._handle_event(event)
+        if listener._ops:
+            listener._run_ops()
+        if listener._exit.is_set():
+            # the listener gave up (e.g. failed to reconnect)
+            self._remove(listener)
+            listener._rx_con.disconnect()
+            listener._exit.clear()
+        elif listener._rx_con._con is not con or listener._tx_stale:
+            # the listener reconnected on a new socket
+            self._unregister(listener)
+            self._register(listener)
+
+    def _run(self):
+        wake_r, scale = self._wake_r, self._scale
+        listeners, ready, changes = self._listeners, self._ready, self._changes
+        while not self._exit:
+            try:
+                fds = self._poller.poll(self.timeout * scale)
+            except (IOError, OSError, select.error) as err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                raise
+            for fd, mask in fds:
+                if fd == wake_r:
+                    try:
+                        os.read(wake_r, 4096)
+                    except OSError:
+                        pass
+                    continue
+                listener = listeners.get(fd)
+                if listener:
+                    con = self._fds[listener].get(fd)
+                    if con is self._cons[listener]:
+                        self._service(listener)
+                    elif con is not None:
+                        self._drain(listener, fd, con)
+            if not fds:  # idle so expire any stale parked job events
+                for listener in self._cons:
+                    if listener._parked:
+                        listener._expire_parked()
+            while ready:
+                self._service(ready.popleft())
+            while changes:
+                method, listener, done = changes.popleft()
+                try:
+                    method(listener)
+                finally:
+                    done.set()
+        for listener in list(self._cons):
+            self._remove(listener)
+        self.log.debug("exiting shared event loop")
+
+
 class Client(object):
     '''Interface for synchronous server control using the esl "inbound method"
     as described here:
@@ -929,13 +2259,16 @@ class Client(object):
 
     def __init__(self, host='127.0.0.1', port='8021', auth='ClueCon',
                  listener=None,
-                 logger=None):
+                 logger=None,
+                 backend=None,
+                 pool_size=1):
 
         self.host = self.server = host
         self.port = port
         self.auth = auth
         self._id = utils.uuid()
         self._orig_cmd = None
+        self._orig_tmpl = None
         self.log = logger or utils.get_logger(utils.pstr(self))
         # clients can host multiple "composed" apps
         self._apps = {}
@@ -945,7 +2278,10 @@ class Client(object):
 
         # WARNING: order of these next steps matters!
         # create a local connection for sending commands
-        self._con = Connection(self.server, self.port, self.auth)
+        if backend is None and listener:
+            backend = listener.backend
+        self._con = ConnectionPool(self.server, self.port, self.auth,
+                                   size=pool_size, backend=backend)
         # if the listener is provided it is expected that the
         # user will run the set up methods (i.e. connect, start, etc..)
         self.listener = listener
@@ -968,10 +2304,18 @@ class Client(object):
             self.log.debug("set call lookup variable to '{}'".format(
                 self._listener.call_id_var))
             inst._client_con = weakref.proxy(self._con)
+            # receive events for calls we originate without an app id
+            inst.add_app_filter(self._id)
 
     listener = property(get_listener, set_listener,
                         'Reference to the underlying EventListener')
 
+    @property
+    def pool(self):
+        """The pool of connections used for sending commands
+        """
+        return self._con
+
     def get_loglevel(self):
         token, num = self.cmd(
             'fsctl loglevel').rpartition(':')[-1].split()
@@ -1057,6 +2401,11 @@ class Client(object):
             raise TypeError("app load failed since '{}' is not a valid"
                             "callback type".format(failed))
         # register locally
+        if not app_map:
+            listener.add_app_filter(group_id)
+        retention = getattr(app, 'event_retention', None)
+        if retention is not None:
+            listener.set_event_retention(retention, group_id)
         self._apps.setdefault(group_id, {})[name] = app
         app.cid, app.name = group_id, name
         return group_id
@@ -1085,6 +2434,8 @@ class Client(object):
 
         if not app_map:
             self._apps.pop(on_value)
+            self.listener.remove_app_filter(on_value)
+            self.listener.set_event_retention(None, on_value)
 
     def disconnect(self):
         """Disconnect the client's underlying connection
@@ -1167,26 +2518,81 @@ class Client(object):
             kwargs passed here.
         '''
         listener = self._assert_alive(listener)
-        # block the event loop while we insert our job
-        listener.block_jobs()
-        try:
-            ev = self._con.bgapi(cmd)
-            if ev:
-                bj = listener.register_job(
-                    ev, callback=callback,
-                    client_id=client_id or self._id,
-                    **jobkwargs
-                )
+        ev = self._con.bgapi(cmd)
+        if not ev:
+            if not self._con.connected():
+                raise ConnectionError("local connection down on '{}'!?"
+                                      .format(self._con.host))
             else:
-                if not self._con.connected():
-                    raise ConnectionError("local connection down on '{}'!?"
-                                          .format(self._con.host))
-                else:
-                    raise CommandError("bgapi cmd failed?!\n{}".format(cmd))
-        finally:
-            # wakeup the listener's event loop
-            listener.unblock_jobs()
-        return bj
+                raise CommandError("bgapi cmd failed?!\n{}".format(cmd))
+        # a job event which beats us here is parked by the listener
+        return listener.register_job(
+            ev, callback=callback,
+            client_id=client_id or self._id,
+            **jobkwargs
+        )
+
+    def bgapi_many(self, cmds, listener=None, callback=None, client_id=None,
+                   jobs_kwargs=None, **jobkwargs):
+        '''Execute many non blocking api calls at once; the commands are
+        written in a single batch and all returned jobs are registered
+        together.
+
+        Parameters
+        ----------
+        cmds : sequence of strings
+            commands to execute
+        jobs_kwargs : sequence of dicts
+            optional per command `Job` kwargs (e.g. `sess_uuid`) which
+            override those passed as `jobkwargs`
+        others : same as for `bgapi`
+
+        Returns
+        -------
+        list of `Job` instances in command order
+        '''
+        listener = self._assert_alive(listener)
+        jobkwargs['callback'] = callback
+        jobkwargs['client_id'] = client_id or self._id
+        jobs, failed = [], []
+        replies = self._con.bgapi_many(cmds)
+        for index, reply in enumerate(replies):
+            ev = reply.result()
+            if not ev:
+                failed.append(cmds[index])
+                continue
+            kwargs = jobkwargs
+            if jobs_kwargs:
+                kwargs = dict(jobkwargs, **jobs_kwargs[index])
+            jobs.append(listener.register_job(ev, **kwargs))
+        if failed:
+            # jobs which were accepted are still tracked by the listener
+            if not self._con.connected():
+                raise ConnectionError(
+                    "local connection down on '{}'!? ({} of {} commands "
+                    "failed)".format(self._con.host, len(failed), len(cmds)))
+            raise CommandError("{} bgapi cmds failed?!\n{}".format(
+                len(failed), '\n'.join(failed)))
+        return jobs
+
+    def _build_originate(self, uuid_str, dest_url, app_id, rep_fields,
+                         orig_kwargs):
+        '''Render an originate command for the session `uuid_str`
+        '''
+        if dest_url:  # generate the cmd now
+            origkwds = {self.id_var: app_id or self._id}
+            origkwds.update(orig_kwargs)
+            return build_originate_cmd(
+                dest_url,
+                uuid_str=uuid_str,
+                xheaders={self.call_id_var: uuid_str,
+                          self.id_xh: app_id or self._id},
+                # extra_params={self.id_var: app_id or self._id},
+                **origkwds
+            )
+        # accept late data insertion for the uuid_str and app_id
+        return self._orig_tmpl.render(
+            rep_fields, uuid_str, app_id or self._id)
 
     def originate(self, dest_url=None,
                   uuid_func=utils.uuid,
@@ -1213,24 +2619,8 @@ class Client(object):
         listener = self._assert_alive(listener)
         # gen originating session uuid for tracking call
         uuid_str = uuid_func()
-        if dest_url:  # generate the cmd now
-            origkwds = {self.id_var: app_id or self._id}
-            origkwds.update(orig_kwargs)
-            cmd_str = build_originate_cmd(
-                dest_url,
-                uuid_str=uuid_str,
-                xheaders={self.call_id_var: uuid_str,
-                          self.id_xh: app_id or self._id},
-                # extra_params={self.id_var: app_id or self._id},
-                **origkwds
-            )
-        else:  # accept late data insertion for the uuid_str and app_id
-            cmd_str = self.originate_cmd.format(
-                uuid_str=uuid_str,
-                app_id=app_id or self._id,
-                **rep_fields
-            )
-
+        cmd_str = self._build_originate(
+            uuid_str, dest_url, app_id, rep_fields, orig_kwargs)
         return self.bgapi(
             cmd_str, listener,
             sess_uuid=uuid_str,
@@ -1238,6 +2628,48 @@ class Client(object):
             **bgapi_kwargs
         )
 
+    def originate_many(self, count, dest_url=None,
+                       uuid_func=utils.uuid,
+                       app_id=None,
+                       listener=None,
+                       bgapi_kwargs={},
+                       rep_fields={},
+                       app_ids=None,
+                       rep_fields_func=None,
+                       **orig_kwargs):
+        '''Originate `count` calls with a single batch of bgapi commands
+        (see `bgapi_many`) instead of one round trip per call.
+
+        Parameters
+        ----------
+        app_ids : iterable
+            optional per call app ids (consumed `count` times) used in place
+            of `app_id`
+        rep_fields_func : callable
+            optional callable invoked once per call to deliver its
+            `rep_fields` mapping
+        others : same as for `originate`
+
+        Returns
+        -------
+        list of `Job` instances one per call
+        '''
+        listener = self._assert_alive(listener)
+        if app_ids is not None:
+            app_ids = iter(app_ids)
+        cmds, jobs_kwargs = [], []
+        for _ in xrange(count):
+            uuid_str = uuid_func()
+            call_app_id = next(app_ids) if app_ids is not None else app_id
+            cmds.append(self._build_originate(
+                uuid_str, dest_url, call_app_id,
+                rep_fields_func() if rep_fields_func else rep_fields,
+                orig_kwargs))
+            jobs_kwargs.append(
+                {'sess_uuid': uuid_str, 'client_id': call_app_id or self._id})
+        return self.bgapi_many(
+            cmds, listener, jobs_kwargs=jobs_kwargs, **bgapi_kwargs)
+
     @functools.wraps(build_originate_cmd)
     def set_orig_cmd(self, *args, **kwargs):
         '''Build and cache an originate cmd string for later use
@@ -1256,17 +2688,25 @@ class Client(object):
                 "passing 'uuid_str' here is improper usage")
         origparams.update(kwargs)
 
-        # build a reusable command string
+        # build a reusable command string and compile it for fast rendering
         self._orig_cmd = build_originate_cmd(
             *args,
             xheaders=xhs,
             **origparams
         )
+        self._orig_tmpl = OriginateTemplate(self._orig_cmd)
 
     @property
     def originate_cmd(self):
         return self._orig_cmd
 
+    @property
+    def originate_template(self):
+        '''The compiled :class:`~switchy.commands.OriginateTemplate` for the
+        current originate command
+        '''
+        return self._orig_tmpl
+
 
 def get_listener(host, port=EventListener.PORT, auth=EventListener.AUTH,
                  shared=False, mng=None, mng_init=None, **kwargs):
@@ -1325,13 +2765,17 @@ def active_client(host, port='8021', auth='ClueCon',
     client.disconnect()
 
 
-def get_pool(contacts, **kwargs):
+def get_pool(contacts, multiplex=False, **kwargs):
     """Construct and return a slave pool from a sequence of
-    contact information
+    contact information. If `multiplex` is set all listeners are serviced
+    by a single `EventLoop` thread instead of one thread each.
     """
     from .distribute import SlavePool
     SlavePair = namedtuple("SlavePair", "client listener")
     pairs = deque()
+    if multiplex:
+        kwargs.setdefault('backend', 'python')
+        kwargs['loop'] = EventLoop()
 
     # instantiate all pairs
     for contact in contacts:
@@ -0,0 +1,708 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+A pure python implementation of the ESL inbound wire protocol.
+
+`ESLConnection` and `Event` quack like the `ESL.ESLconnection` and
+`ESL.ESLevent` types from the SWIG package distributed with FreeSWITCH
+such that they can be used as a drop-in `Connection` backend. Received
+events are delivered as `LazyEvent`s which defer header parsing until
+a header is first looked up.
+Frames are decoded by an incremental `Parser` which can be fed from any
+socket read loop.
+"""
+import json
+import time
+import errno
+import select
+import socket
+import threading
+from urllib import quote, unquote
+from collections import deque, OrderedDict
+import utils
+import futures
+
+
+# frame content types
+AUTH_REQUEST = 'auth/request'
+COMMAND_REPLY = 'command/reply'
+API_RESPONSE = 'api/response'
+EVENT_PLAIN = 'text/event-plain'
+EVENT_JSON = 'text/event-json'
+DISCONNECT_NOTICE = 'text/disconnect-notice'
+RUDE_REJECTION = 'text/rude-rejection'
+
+
+class Event(object):
+    '''An `ESL.ESLevent` look-alike holding a header map and an
+    optional body.
+    '''
+    def __init__(self, headers=None, body=None):
+        self.headers = OrderedDict(headers or ())
+        self.body = body
+
+    def __repr__(self):
+        return "<{}({}) at {}>".format(
+            type(self).__name__, self.getType(), hex(id(self)))
+
+    def __nonzero__(self):
+        return True
+
+    def getHeader(self, name, idx=-1):
+        return self.headers.get(name)
+
+    def getBody(self):
+        return self.body
+
+    def getType(self):
+        return self.headers.get('Event-Name', 'SOCKET_DATA')
+
+    def addHeader(self, name, value):
+        self.headers[name] = value
+
+    def delHeader(self, name):
+        return self.headers.pop(name, None) is not None
+
+    def addBody(self, body):
+        self.body = body
+
+    def serialize(self, fmt='plain'):
+        '''Render this event in the 'plain' or 'json' ESL formats
+        '''
+        if fmt == 'json':
+            data = dict(self.headers)
+            if self.body:
+                data['_body'] = self.body
+            return json.dumps(data)
+        lines = ["{}: {}".format(name, quote(str(value), safe=''))
+                 for name, value in self.headers.iteritems()]
+        if self.body:
+            lines.append("Content-Length: {}".format(len(self.body)))
+            return "\n".join(lines) + "\n\n" + self.body
+        return "\n".join(lines) + "\n\n"
+
+
+# event headers and the `show channels` columns carrying the same data
+CHANNEL_COLUMNS = {
+    'Unique-ID': 'uuid',
+    'Call-Direction': 'direction',
+    'Channel-Name': 'name',
+    'Channel-State': 'state',
+    'Channel-Call-State': 'callstate',
+    'Caller-Caller-ID-Name': 'cid_name',
+    'Caller-Caller-ID-Number': 'cid_num',
+    'Caller-Network-Addr': 'ip_addr',
+    'Caller-Destination-Number': 'dest',
+    'Caller-Context': 'context',
+    'Channel-Read-Codec-Name': 'read_codec',
+    'Channel-Write-Codec-Name': 'write_codec',
+    'FreeSWITCH-Hostname': 'hostname',
+    'variable_call_uuid': 'call_uuid',
+    'variable_presence_id': 'presence_id',
+    'variable_accountcode': 'accountcode',
+}
+
+
+class ChannelRow(object):
+    '''A read-only `ESL.ESLevent` look-alike over one (decoded) row of
+    ``show channels as json`` output. Headers are looked up in the row
+    through `columns` (a header name -> column name map) without copying.
+    '''
+    __slots__ = ('_row', '_columns')
+
+    event_name = 'CHANNEL_DATA'
+
+    def __init__(self, row, columns=CHANNEL_COLUMNS):
+        self._row = row
+        self._columns = columns
+
+    def __repr__(self):
+        return "<{}({}) at {}>".format(
+            type(self).__name__, self._row.get('uuid'), hex(id(self)))
+
+    def __nonzero__(self):
+        return True
+
+    def getHeader(self, name, idx=-1):
+        column = self._columns.get(name)
+        if column is not None:
+            value = self._row.get(column)
+            if not value:
+                return None
+            # decoded json strings are unicode
+            return value.encode('utf-8') if isinstance(
+                value, unicode) else str(value)
+        if name == 'Event-Name':
+            return self.event_name
+        if name == 'Event-Date-Timestamp':
+            epoch = self._row.get('created_epoch')
+            return str(int(epoch) * 1000000) if epoch else None
+        return None
+
+    def getBody(self):
+        return None
+
+    def getType(self):
+        return self.event_name
+
+    def header_pairs(self):
+        pairs = [(name, self.getHeader(name)) for name in
+                 ('Event-Name', 'Event-Date-Timestamp')]
+        pairs.extend((name, self.getHeader(name)) for name in self._columns)
+        return [pair for pair in pairs if pair[1]]
+
+    def serialize(self, fmt='plain'):
+        return Event(self.header_pairs()).serialize(fmt)
+
+
+# url decoded header values; the same channel variable values are carried
+# by every event for a session so most decodes are repeats
+_decoded = {}
+_DECODED_MAX = 2**14
+
+
+def decode_value(value):
+    '''Url decode a header value
+    '''
+    try:
+        return _decoded[value]
+    except KeyError:
+        if '%' not in value:
+            return value
+    if len(_decoded) >= _DECODED_MAX:
+        _decoded.clear()
+    result = _decoded[value] = unquote(value)
+    return result
+
+
+def parse_headers(block, decode=False):
+    '''Parse a block of 'Name: value' lines into a list of pairs
+    '''
+    pairs = []
+    for line in block.split('\n'):
+        name, sep, value = line.partition(': ')
+        if sep:
+            pairs.append((name, decode_value(value) if decode else value))
+    return pairs
+
+
+def parse_event(content, content_type=EVENT_PLAIN):
+    '''Build an `Event` from the content of an event frame
+    '''
+    if content_type == EVENT_JSON:
+        data = json.loads(content)
+        body = data.pop('_body', None)
+        return Event(data.iteritems(), body)
+
+    head, sep, body = content.partition('\n\n')
+    event = Event(parse_headers(head, decode=True))
+    length = event.headers.pop('Content-Length', None)
+    if length is not None:
+        event.body = body[:int(length)]
+    return event
+
+
+class LazyEvent(object):
+    '''A read-only `ESL.ESLevent` look-alike built over the raw content
+    of a 'text/event-plain' frame.
+
+    Nothing is parsed on construction. Each header is located in the raw
+    string the first time it is asked for and the offsets of its value are
+    recorded in a small index such that repeat lookups are a dict hit and a
+    slice. Calling any of the mutating methods converts the event to an
+    ordinary header map.
+    '''
+    __slots__ = ('_raw', '_index', '_end', '_headers', '_body')
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._index = None  # header name -> value start << 32 | value end
+        self._end = None  # end of the header block
+        self._headers = None  # set once the event has been modified
+        self._body = None
+
+    def __repr__(self):
+        return "<{}({}) at {}>".format(
+            type(self).__name__, self.getType(), hex(id(self)))
+
+    def __nonzero__(self):
+        return True
+
+    def _span(self, name):
+        '''Return the packed value offsets for header `name` or 0
+        if there is no such header
+        '''
+        index = self._index
+        if index is None:
+            index = self._index = {}
+            end = self._end = self._raw.find('\n\n')
+            if end < 0:
+                self._end = len(self._raw)
+        else:
+            span = index.get(name)
+            if span is not None:
+                return span
+        raw, end = self._raw, self._end
+        key = name + ': '
+        if raw.startswith(key):
+            start = len(key)
+        else:
+            start = raw.find('\n' + key, 0, end)
+            start = start + len(key) + 1 if start >= 0 else 0
+        if start:
+            stop = raw.find('\n', start, end)
+            span = start << 32 | (end if stop < 0 else stop)
+        else:
+            span = 0
+        index[name] = span
+        return span
+
+    def _value(self, span):
+        return decode_value(self._raw[span >> 32:span & 0xffffffff])
+
+    def getHeader(self, name, idx=-1):
+        if self._headers is not None:
+            return self._headers.get(name)
+        if name == 'Content-Length':
+            return None
+        span = self._span(name)
+        return self._value(span) if span else None
+
+    def getBody(self):
+        if self._headers is not None:
+            return self._body
+        span = self._span('Content-Length')
+        if not span:
+            return None
+        start = self._end + 2
+        return self._raw[start:start + int(self._value(span))]
+
+    def getType(self):
+        return self.getHeader('Event-Name') or 'SOCKET_DATA'
+
+    @property
+    def headers(self):
+        '''An ordered map of all (decoded) headers
+        '''
+        if self._headers is not None:
+            return self._headers
+        headers = OrderedDict(self.header_pairs())
+        headers.pop('Content-Length', None)
+        return headers
+
+    def header_pairs(self):
+        '''Return a list of all (name, decoded value) header pairs
+        (cheaper than building `headers` when only iterating)
+        '''
+        if self._headers is not None:
+            return self._headers.items()
+        self._span('Event-Name')  # locates the end of the header block
+        return parse_headers(self._raw[:self._end], decode=True)
+
+    @property
+    def body(self):
+        return self.getBody()
+
+    def _thaw(self):
+        if self._headers is None:
+            self._headers, self._body = self.headers, self.getBody()
+            self._raw = self._index = None
+
+    def addHeader(self, name, value):
+        self._thaw()
+        self._headers[name] = value
+
+    def delHeader(self, name):
+        self._thaw()
+        return self._headers.pop(name, None) is not None
+
+    def addBody(self, body):
+        self._thaw()
+        self._body = body
+
+    def serialize(self, fmt='plain'):
+        if fmt == 'plain' and self._headers is None:
+            return self._raw
+        return Event(self.headers, self.getBody()).serialize(fmt)
+
+
+class Parser(object):
+    '''Incremental ESL frame parser.
+
+    Data read off the wire is passed to `feed` which returns any events
+    that could be completely decoded. Plain events are delivered as
+    `LazyEvent`s over the frame content. Reply frames are returned as events
+    whose headers are the frame headers and whose body is the frame content
+    (the same way `ESL.ESLconnection.api()` delivers them).
+    '''
+    def __init__(self):
+        self._buf = ''
+        self._head = None  # headers of a frame awaiting its content
+
+    def feed(self, data):
+        buf = self._buf + data if self._buf else data
+        frames = []
+        pos = 0
+        while True:
+            if self._head is None:
+                end = buf.find('\n\n', pos)
+                if end < 0:
+                    break
+                self._head = OrderedDict(parse_headers(buf[pos:end]))
+                pos = end + 2
+
+            head = self._head
+            length = int(head.get('Content-Length', 0))
+            if len(buf) - pos < length:
+                break
+            content = buf[pos:pos + length]
+            pos += length
+            self._head = None
+            frames.append(self._build(head, content))
+
+        self._buf = buf[pos:]
+        return frames
+
+    @staticmethod
+    def _build(head, content):
+        ctype = head.get('Content-Type')
+        if ctype == EVENT_PLAIN:
+            return LazyEvent(content)
+        if ctype == EVENT_JSON:
+            return parse_event(content, ctype)
+        return Event(head, content or None)
+
+
+def is_reply(frame):
+    '''Return bool indicating whether this frame is a reply to a command
+    (or the initial authentication request)
+    '''
+    return frame.headers.get('Content-Type') in (
+        COMMAND_REPLY, API_RESPONSE, AUTH_REQUEST)
+
+
+def is_disconnect(frame):
+    '''Return bool indicating whether this frame is a server disconnect notice
+    '''
+    return frame.headers.get('Content-Type') in (
+        DISCONNECT_NOTICE, RUDE_REJECTION)
+
+
+def disconnect_event():
+    '''Build the event delivered by `recvEvent` when the server hangs up
+    on us so that listeners can handle it like any other
+    'SERVER_DISCONNECTED' event.
+    '''
+    return Event((('Event-Name', 'SERVER_DISCONNECTED'),))
+
+
+class Reply(futures.Future):
+    '''A future for a command reply which, when waited on, drives reads on
+    its connection until it has been resolved.
+    '''
+    __slots__ = ('_con',)
+
+    def __init__(self, con):
+        futures.Future.__init__(self)
+        self._con = con
+
+    def wait(self, timeout=None):
+        if not self.done():
+            self._con._drive(self.done, timeout)
+        return self.done()
+
+
+class ESLConnection(object):
+    '''An ESL "inbound" connection implemented in pure python.
+
+    The constructor signature and method set mirror `ESL.ESLconnection`
+    such that instances can be used interchangeably.
+
+    Commands are pipelined: `send` writes a command and immediately returns
+    a `Reply` future; many commands can be in flight at once and replies are
+    matched to futures in FIFO order (the order in which the server answers
+    them). There is no lock held over a round trip. Instead whichever thread
+    is waiting (on a reply or in `recvEvent`) takes a turn reading the socket
+    and routes every decoded frame to its waiter, queueing events for later
+    delivery by `recvEvent`.
+    '''
+    threadsafe = True
+    bufsize = 2**16
+    # called by a thread which has queued events while waiting on a reply
+    # (used by `switchy.observe.EventLoop` to learn about them)
+    on_events = None
+
+    def __init__(self, host, port, password, timeout=5):
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+        self.log = utils.get_logger(utils.pstr(self))
+        self._parser = Parser()
+        self._pending = deque()  # reply futures in send order
+        self._events = deque()
+        self._wlock = threading.Lock()  # keeps sends and `_pending` in order
+        self._cond = threading.Condition(threading.Lock())
+        self._reading = False  # some thread has its turn reading the socket
+        self._sock = None
+        self._poller = None  # waits for timed reads
+        self._connected = False
+        try:
+            self._sock = socket.create_connection((host, self.port), timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # a socket timeout would apply to concurrent sends as well so
+            # keep the socket blocking and time reads out with poll
+            self._sock.settimeout(None)
+            self._poller = select.poll()
+            self._poller.register(self._sock.fileno(), select.POLLIN)
+            self._auth(password)
+        except (socket.error, ESLProtocolError) as err:
+            self.log.warning("Failed to connect to '{}:{}' - {}"
+                             .format(host, port, err))
+            self._close(notify=False)
+
+    def __repr__(self):
+        return "<{} {}:{} [{}]>".format(
+            type(self).__name__, self.host, self.port,
+            "connected" if self._connected else "disconnected")
+
+    def _auth(self, password):
+        self._connected = True
+        # the server speaks first so wait on its request like a reply
+        request = Reply(self)
+        self._pending.append(request)
+        try:
+            frame = request.result(self.timeout)
+        except futures.TimeoutError:
+            frame = None
+        if frame is None or frame.getHeader('Content-Type') != AUTH_REQUEST:
+            raise ESLProtocolError("server did not request authentication")
+        reply = self.sendRecv('auth {}'.format(password))
+        if not reply or '+OK' not in (reply.getHeader('Reply-Text') or ''):
+            raise ESLProtocolError("authentication failed")
+
+    def _close(self, notify=True):
+        '''Close the socket and resolve any outstanding replies. If `notify`
+        is set and the connection was active queue a disconnect event.
+        '''
+        was_connected, self._connected = self._connected, False
+        sock, self._sock = self._sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            sock.close()
+        # nothing more will be answered
+        while self._pending:
+            self._pending.popleft().set_result(None)
+        if was_connected and notify:
+            self._events.append(disconnect_event())
+        return was_connected
+
+    def _route(self, frame):
+        if type(frame) is LazyEvent:
+            self._events.append(frame)
+        elif is_reply(frame):
+            if self._pending:
+                self._pending.popleft().set_result(frame)
+            else:
+                self.log.warning("Dropping unsolicited reply:\n{}"
+                                 .format(frame.headers))
+        elif is_disconnect(frame):
+            self._close()
+        else:
+            self._events.append(frame)
+
+    def _read(self, timeout=None, flags=0):
+        '''Read the socket once and route any decoded frames.
+        Return `False` if the read timed out or the connection was lost.
+        '''
+        sock = self._sock
+        if sock is None:
+            return False
+        try:
+            if timeout is not None and not self._poller.poll(
+                    max(int(timeout * 1000), 1)):
+                return False
+            data = sock.recv(self.bufsize, flags)
+        except select.error as err:
+            if err.args[0] == errno.EINTR:
+                return False
+            data = ''
+        except socket.error as err:
+            if err.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return False
+            data = ''
+        if not data:
+            self._close()
+            return False
+        for frame in self._parser.feed(data):
+            self._route(frame)
+        return True
+
+    def _drive(self, done, timeout=None):
+        '''Take turns reading the socket with other waiting threads until
+        `done()` returns true, the connection is lost or `timeout` expires.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        remaining = timeout
+        cond = self._cond
+        with cond:
+            while not done():
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                if self._reading:
+                    # the reading thread wakes us after each read
+                    cond.wait(remaining)
+                    continue
+                if not self._connected:
+                    break
+                self._reading = True
+                cond.release()
+                try:
+                    alive = self._read(remaining)
+                finally:
+                    cond.acquire()
+                    self._reading = False
+                    cond.notify_all()
+                if self._events and self.on_events:
+                    self.on_events()
+                if not alive:
+                    break
+
+    def drain(self):
+        '''Route whatever can be read off the socket without blocking and
+        return all queued events. Meant to be called once a selector
+        reports the socket as readable.
+        '''
+        cond = self._cond
+        with cond:
+            if not self._reading and self._sock:
+                # no one else is reading so take a turn
+                self._reading = True
+                cond.release()
+                try:
+                    self._read(None, socket.MSG_DONTWAIT)
+                finally:
+                    cond.acquire()
+                    self._reading = False
+                    cond.notify_all()
+        events = self._events
+        drained = []
+        while events:
+            drained.append(events.popleft())
+        return drained
+
+    def _send(self, data):
+        try:
+            self._sock.sendall(data)
+        except (socket.error, AttributeError):
+            self._close()
+            return False
+        return True
+
+    def send(self, cmd):
+        '''Send a raw command without waiting for its reply.
+        Return a `Reply` future which resolves to the reply frame or `None`
+        if the connection is lost before it arrives.
+        '''
+        reply = Reply(self)
+        with self._wlock:
+            if not self._connected:
+                reply.set_result(None)
+                return reply
+            self._pending.append(reply)
+            self._send(cmd + '\n\n')
+        return reply
+
+    def send_many(self, cmds):
+        '''Send a batch of raw commands with a single write without waiting
+        for their replies. Return a list of `Reply` futures in command order.
+        '''
+        replies = [Reply(self) for _ in cmds]
+        with self._wlock:
+            if not self._connected:
+                for reply in replies:
+                    reply.set_result(None)
+                return replies
+            self._pending.extend(replies)
+            self._send(''.join(cmd + '\n\n' for cmd in cmds))
+        return replies
+
+    @property
+    def outstanding(self):
+        '''The number of commands awaiting a reply
+        '''
+        return len(self._pending)
+
+    def sendRecv(self, cmd):
+        '''Send a raw command and block for its reply
+        '''
+        return self.send(cmd).result()
+
+    def api_async(self, cmd, arg=None):
+        return self.send(
+            'api {} {}'.format(cmd, arg) if arg else 'api {}'.format(cmd))
+
+    def bgapi_async(self, cmd, arg=None, job_uuid=None):
+        line = 'bgapi {} {}'.format(cmd, arg) if arg else 'bgapi {}'.format(
+            cmd)
+        if job_uuid:
+            line += '\nJob-UUID: {}'.format(job_uuid)
+        return self.send(line)
+
+    def bgapi_many(self, cmds, job_uuids=None):
+        '''Send many `bgapi` commands in one write returning their reply
+        futures (see `send_many`)
+        '''
+        lines = ['bgapi {}'.format(cmd) for cmd in cmds]
+        if job_uuids:
+            lines = ['{}\nJob-UUID: {}'.format(line, job_uuid)
+                     for line, job_uuid in zip(lines, job_uuids)]
+        return self.send_many(lines)
+
+    def api(self, cmd, arg=None):
+        return self.api_async(cmd, arg).result()
+
+    def bgapi(self, cmd, arg=None, job_uuid=None):
+        return self.bgapi_async(cmd, arg, job_uuid).result()
+
+    def events(self, etype, value):
+        return self.sendRecv('event {} {}'.format(etype, value))
+
+    def filter(self, header, value):
+        return self.sendRecv('filter {} {}'.format(header, value))
+
+    def _recv_event(self, timeout=None):
+        events = self._events
+        if not events:
+            self._drive(events.__len__, timeout)
+        return events.popleft() if events else None
+
+    def recvEventTimed(self, ms):
+        return self._recv_event(ms / 1000.)
+
+    def recvEvent(self):
+        return self._recv_event()
+
+    def connected(self):
+        return int(self._connected)
+
+    def disconnect(self):
+        self._close(notify=False)
+        return 0
+
+    def socketDescriptor(self):
+        return self._sock.fileno() if self._sock else -1
+
+    fileno = socketDescriptor
+
+    def getInfo(self):
+        return None
+
+
+class ESLProtocolError(utils.ESLError):
+    pass
@@ -0,0 +1,182 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+A columnar (numpy structured array) mirror of a listener's active sessions.
+
+Each active session occupies one row (slot) of the array which is updated
+in place by the listener's event handlers and recycled when the session
+hangs up. Questions like "how many answered sessions are older than 30
+seconds" are then answered by a few vectorized operations instead of by
+walking every `Session` object.
+"""
+import time
+import numpy as np
+
+
+# numpy ndarray template
+session_dtype = np.dtype([
+    ('create', np.float64),
+    ('answer', np.float64),
+    ('originate', np.float64),
+    ('active', np.bool_),
+    ('answered', np.bool_),
+    ('bridged', np.bool_),  # not the first session of its call
+    ('app', np.int32),  # index into `SessionTable.app_ids`
+])
+
+
+class SessionTable(object):
+    """An array backed table of active sessions keyed by uuid.
+
+    Time stamp columns are `nan` until set. Freed slots are reused before
+    the array is grown (doubled) so that the region scanned by queries is
+    bounded by the peak number of concurrent sessions.
+    """
+    def __init__(self, size=1024):
+        self._array = np.zeros(size, dtype=session_dtype)
+        self._hwm = 0  # high water mark; rows past it have never been used
+        self._free = []  # freed slots below the high water mark
+        self._slots = {}  # uuid -> slot
+        self._uuids = [None] * size  # slot -> uuid
+        self._apps = {}  # app id -> index
+        self.app_ids = []  # index -> app id
+
+    def __repr__(self):
+        return "<{}: {} active sessions, {} slots>".format(
+            type(self).__name__, len(self), self._array.size)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, uuid):
+        return uuid in self._slots
+
+    @property
+    def array(self):
+        '''The (in use region of the) underlying structured array including
+        inactive (freed) rows
+        '''
+        return self._array[:self._hwm]
+
+    def _grow(self):
+        array = np.zeros(self._array.size * 2, dtype=session_dtype)
+        array[:self._array.size] = self._array
+        self._uuids.extend([None] * self._array.size)
+        self._array = array
+
+    def add(self, uuid, create, app=None, bridged=False):
+        '''Insert a row for a new session and return its slot
+        '''
+        slot = self._slots.get(uuid)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._hwm == self._array.size:
+                self._grow()
+            slot = self._hwm
+            self._hwm += 1
+        index = self._apps.get(app)
+        if index is None:
+            index = self._apps[app] = len(self.app_ids)
+            self.app_ids.append(app)
+        self._array[slot] = (
+            create, np.nan, np.nan, True, False, bridged, index)
+        self._slots[uuid] = slot
+        self._uuids[slot] = uuid
+        return slot
+
+    def set(self, uuid, column, value):
+        '''Set `column` of the row for `uuid` to `value`. Return bool
+        indicating whether the session is in the table.
+        '''
+        slot = self._slots.get(uuid)
+        if slot is None:
+            return False
+        self._array[column][slot] = value
+        return True
+
+    def answer(self, uuid, when):
+        '''Mark the session `uuid` as answered at time `when`
+        '''
+        slot = self._slots.get(uuid)
+        if slot is not None:
+            array = self._array
+            array['answer'][slot] = when
+            array['answered'][slot] = True
+
+    def remove(self, uuid):
+        '''Free the slot held by `uuid`
+        '''
+        slot = self._slots.pop(uuid, None)
+        if slot is not None:
+            self._array['active'][slot] = False
+            self._uuids[slot] = None
+            self._free.append(slot)
+
+    def clear(self):
+        self._array[:] = 0
+        self._hwm = 0
+        del self._free[:]
+        self._slots.clear()
+        self._uuids = [None] * self._array.size
+
+    def mask(self, answered=None, bridged=None, app=None, older_than=None,
+             since='create', now=None):
+        '''Return a boolean array selecting the active rows of `array`
+        which match all of the provided filters.
+
+        Parameters
+        ----------
+        answered, bridged : bool
+            Match the session's answer or bridge state
+        app : string
+            Match sessions tagged with this app id
+        older_than : float
+            Match sessions for which at least this many seconds have
+            passed since their `since` time stamp column ('create',
+            'answer' or 'originate')
+        '''
+        array = self._array[:self._hwm]
+        mask = array['active'].copy()
+        if answered is not None:
+            mask &= array['answered'] == answered
+        if bridged is not None:
+            mask &= array['bridged'] == bridged
+        if app is not None:
+            mask &= array['app'] == self._apps.get(app, -1)
+        if older_than is not None:
+            if now is None:
+                now = time.time()
+            with np.errstate(invalid='ignore'):  # nan compares as False
+                mask &= array[since] <= now - older_than
+        return mask
+
+    def count(self, **filters):
+        '''Count the active sessions matching `filters` (see `mask`)
+        '''
+        return int(np.count_nonzero(self.mask(**filters)))
+
+    def ages(self, since='create', now=None, **filters):
+        '''Return an array of seconds elapsed since the `since` time stamp
+        of each active session matching `filters`
+        '''
+        if now is None:
+            now = time.time()
+        mask = self.mask(since=since, now=now, **filters)
+        ages = now - self._array[since][:self._hwm][mask]
+        return ages[~np.isnan(ages)]
+
+    def histogram(self, bins=10, since='create', now=None, **filters):
+        '''Return the (counts, bin edges) of a histogram of session ages
+        (see `ages`)
+        '''
+        return np.histogram(self.ages(since, now, **filters), bins=bins)
+
+    def uuids(self, **filters):
+        '''Return the uuids of the active sessions matching `filters`
+        '''
+        uuids = self._uuids
+        return [uuids[slot] for slot in np.flatnonzero(self.mask(**filters))]
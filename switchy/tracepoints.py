@@ -0,0 +1,216 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+Structured tracepoints for hot paths.
+
+Trace sites are declared once at import time and guarded at each call site
+with a plain attribute check::
+
+    _tp_answer = tracepoints.tracepoint('listener.answer', ('uuid', '36s'))
+    ...
+    if _tp_answer.enabled:
+        _tp_answer(uuid)
+
+When disabled a site costs a single attribute lookup. When enabled each hit
+packs a fixed size binary record (timestamp, site id and fields) into a
+shared in-memory ring buffer; no strings are formatted and nothing is
+written to the log. The ring can be decoded in process with `records()` or
+dumped to a file and decoded later with `load()` or::
+
+    python -m switchy.tracepoints <dumpfile>
+"""
+import sys
+import json
+import struct
+import fnmatch
+import itertools
+from time import time
+from collections import OrderedDict
+import utils
+
+
+RECORD_SIZE = 64  # bytes per ring slot
+_HEAD = '<dH'  # timestamp, site id
+_HEAD_SIZE = struct.calcsize(_HEAD)
+PAYLOAD_SIZE = RECORD_SIZE - _HEAD_SIZE
+
+_sites = OrderedDict()  # name -> Tracepoint
+_capacity = 2**16
+_ring = None
+_slots = itertools.count()
+
+
+class Tracepoint(object):
+    '''A named trace site with a fixed record layout.
+
+    `fields` is a sequence of (name, struct format) pairs; string (`'s'`)
+    fields are truncated or null padded to their declared size.
+    '''
+    __slots__ = ('name', 'id', 'fields', 'enabled', '_struct', '_defaults')
+
+    def __init__(self, name, ident, fields):
+        self.name = name
+        self.id = ident
+        self.fields = tuple(fields)
+        self.enabled = False
+        self._struct = struct.Struct(
+            _HEAD + ''.join(fmt for _, fmt in self.fields))
+        size = self._struct.size
+        if size > RECORD_SIZE:
+            raise utils.ConfigurationError(
+                "trace site '{}' requires {} bytes but records are limited "
+                "to {}".format(name, size, RECORD_SIZE))
+        self._defaults = tuple(
+            '' if fmt.endswith('s') else 0 for _, fmt in self.fields)
+
+    def __repr__(self):
+        return "<{} '{}' enabled={}>".format(
+            type(self).__name__, self.name, self.enabled)
+
+    def __call__(self, *values):
+        offset = (next(_slots) % _capacity) * RECORD_SIZE
+        try:
+            self._struct.pack_into(_ring, offset, time(), self.id, *values)
+        except (struct.error, TypeError):
+            # coerce `None` and non-str values then retry
+            values = tuple(
+                default if value is None else
+                (str(value) if isinstance(default, str) else value)
+                for value, default in zip(values, self._defaults))
+            self._struct.pack_into(_ring, offset, time(), self.id, *values)
+
+    def decode(self, data):
+        values = self._struct.unpack_from(data)
+        fields = OrderedDict()
+        for (name, fmt), value in zip(self.fields, values[2:]):
+            if fmt.endswith('s'):
+                value = value.rstrip('\0')
+            fields[name] = value
+        return values[0], fields
+
+
+def tracepoint(name, *fields):
+    '''Declare (or retrieve) the trace site `name`. If the site was
+    already declared its field layout must match.
+    '''
+    site = _sites.get(name)
+    if site is not None:
+        if site.fields != fields:
+            raise utils.ConfigurationError(
+                "trace site '{}' already declared with fields {}"
+                .format(name, site.fields))
+        return site
+    # id 0 marks an empty ring slot
+    site = _sites[name] = Tracepoint(name, len(_sites) + 1, fields)
+    return site
+
+
+def sites():
+    '''Return the list of declared trace sites
+    '''
+    return list(_sites.values())
+
+
+def _match(patterns):
+    for site in _sites.values():
+        if any(fnmatch.fnmatchcase(site.name, pat) for pat in patterns):
+            yield site
+
+
+def enable(*patterns):
+    '''Enable all sites matching the glob `patterns` (default all sites).
+    Allocates the ring buffer on first use.
+    '''
+    if _ring is None:
+        reset()
+    enabled = []
+    for site in _match(patterns or ('*',)):
+        site.enabled = True
+        enabled.append(site.name)
+    return enabled
+
+
+def disable(*patterns):
+    '''Disable all sites matching the glob `patterns` (default all sites)
+    '''
+    for site in _match(patterns or ('*',)):
+        site.enabled = False
+
+
+def reset(capacity=None):
+    '''Clear (and optionally resize) the ring buffer to `capacity` records
+    '''
+    global _ring, _capacity, _slots
+    if capacity is not None:
+        _capacity = int(capacity)
+    _slots = itertools.count()
+    _ring = bytearray(_capacity * RECORD_SIZE)
+
+
+def _decode(data, table):
+    '''Yield (time, site name, fields) records from raw ring `data` ordered
+    by time. `table` maps site ids to `Tracepoint`s.
+    '''
+    entries = []
+    for offset in xrange(0, len(data), RECORD_SIZE):
+        ts, ident = struct.unpack_from(_HEAD, data, offset)
+        if ident:
+            entries.append((ts, offset, ident))
+    entries.sort()
+    view = buffer(data)
+    for ts, offset, ident in entries:
+        site = table[ident]
+        _, fields = site.decode(view[offset:offset + RECORD_SIZE])
+        yield ts, site.name, fields
+
+
+def records():
+    '''Yield all records currently held in the ring buffer
+    '''
+    if _ring is None:
+        return iter(())
+    return _decode(bytes(_ring), dict((s.id, s) for s in _sites.values()))
+
+
+def dump(path):
+    '''Write the site table and ring buffer contents to `path`
+    '''
+    data = bytes(_ring or '')
+    header = json.dumps({
+        'record_size': RECORD_SIZE,
+        'sites': [(s.id, s.name, s.fields) for s in _sites.values()],
+    })
+    with open(path, 'wb') as f:
+        f.write(header + '\n')
+        f.write(data)
+    return path
+
+
+def load(path):
+    '''Decode a ring buffer written by `dump` yielding
+    (time, site name, fields) records
+    '''
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        data = f.read()
+    if header['record_size'] != RECORD_SIZE:
+        raise utils.ConfigurationError(
+            "dump record size {} does not match {}"
+            .format(header['record_size'], RECORD_SIZE))
+    table = dict(
+        (ident, Tracepoint(
+            str(name), ident,
+            [(str(fname), str(fmt)) for fname, fmt in fields]))
+        for ident, name, fields in header['sites'])
+    return _decode(data, table)
+
+
+def format_record(ts, name, fields):
+    return '{:.6f} {} {}'.format(ts, name, ' '.join(
+        '{}={}'.format(key, value) for key, value in fields.items()))
+
+
+if __name__ == '__main__':
+    for record in load(sys.argv[1]):
+        print(format_record(*record))
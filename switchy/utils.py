@@ -14,6 +14,8 @@ import logging
 import uuid as mod_uuid
 import importlib
 import pkgutil
+from bisect import bisect
+from collections import OrderedDict
 
 
 class ESLError(Exception):
@@ -91,7 +93,7 @@ def log_to_stderr(level=None):
 def dirinfo(inst):
     """Return common info useful for dir output
     """
-    return sorted(set(dir(type(inst)) + inst.__dict__.keys()))
+    return sorted(set(dir(type(inst)) + getattr(inst, '__dict__', {}).keys()))
 
 
 def xheaderify(header_name):
@@ -215,6 +217,22 @@ def get_event_time(event, epoch=0.0):
     return float(value) / 1e6 - epoch
 
 
+class NullLock(object):
+    """A lock look-alike which never blocks
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+
 class Timer(object):
     """Simple timer that reports an elapsed duration since the last reset.
     """
@@ -239,6 +257,101 @@ class Timer(object):
         return self._last
 
 
+class LagHistogram(object):
+    """Rolling histogram of lag samples (in seconds) recorded over the last
+    `period` seconds.
+
+    Samples are binned into fixed `bounds` on insertion and counted in a
+    ring of `slots` time slots which together span the period; a slot's
+    counts are discarded when it is reused. Memory use is therefore fixed
+    and recording is constant time no matter the sample rate. Samples are
+    expected to be recorded by a single thread (a listener's event loop)
+    and are not locked; reads from other threads may be off by the samples
+    recorded while they sum the slots.
+    """
+    BOUNDS = (.001, .002, .005, .01, .02, .05, .1, .2, .5, 1, 2, 5, 10)
+
+    def __init__(self, period=10, bounds=BOUNDS, slots=10):
+        self.period = period
+        self.bounds = tuple(bounds)
+        self._nslots = slots
+        self._width = float(period) / slots  # seconds per slot
+        self.clear()
+
+    def __repr__(self):
+        return "<{}: samples={} p50={} p99={} last={:.6f}>".format(
+            type(self).__name__, len(self), self.percentile(0.5),
+            self.percentile(0.99), self.last)
+
+    def __len__(self):
+        return sum(self._window())
+
+    def clear(self):
+        nbins = len(self.bounds) + 1
+        self._ids = [None] * self._nslots  # time slot held by each entry
+        self._slots = [[0] * nbins for _ in range(self._nslots)]
+        self._head = 0  # latest time slot recorded
+        self.last = 0.  # most recent sample
+        self.peak = 0.  # largest sample since last clear
+
+    def add(self, lag, now=None):
+        '''Record a lag sample taken at time `now`
+        '''
+        now = now or time.time()
+        if lag < 0:  # clock skew between hosts
+            lag = 0.
+        slot = int(now / self._width)
+        index = slot % self._nslots
+        held = self._ids[index]
+        if held != slot:
+            if held > slot:  # older than the window
+                return
+            # replace rather than zero such that readers see whole slots
+            self._slots[index] = [0] * (len(self.bounds) + 1)
+            self._ids[index] = slot
+            if slot > self._head:
+                self._head = slot
+        self._slots[index][bisect(self.bounds, lag)] += 1
+        self.last = lag
+        if lag > self.peak:
+            self.peak = lag
+
+    def _window(self):
+        '''Return the per bin sample counts summed over the slots in the
+        current window
+        '''
+        oldest = max(int(time.time() / self._width), self._head) - \
+            self._nslots
+        totals = [0] * (len(self.bounds) + 1)
+        for slot, counts in zip(self._ids, self._slots):
+            if slot > oldest:
+                for index, count in enumerate(counts):
+                    totals[index] += count
+        return totals
+
+    def percentile(self, q):
+        '''Return the upper bound of the bin holding the `q` (0 - 1)
+        quantile of samples in the window (`inf` if it lies beyond the
+        largest bound and 0 if there are no samples)
+        '''
+        counts = self._window()
+        rank = q * sum(counts)
+        if not rank:
+            return 0.
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                break
+        return self.bounds[index] if index < len(self.bounds) else float(
+            'inf')
+
+    def histogram(self):
+        '''Return an ordered map of bin upper bounds to sample counts
+        '''
+        return OrderedDict(zip(self.bounds + (float('inf'),), self._window()))
+
+
 # based on
 # http://stackoverflow.com/questions/3365740/how-to-import-all-submodules
 def iter_import_submods(packages, recursive=False, imp_excs=()):
@@ -14,6 +14,7 @@ import time
 import math
 from switchy.apps import dtmf, players
 from switchy import get_originator
+from switchy.apps.call_gen import Pacer
 
 
 @pytest.yield_fixture
@@ -139,3 +140,38 @@ def test_convo_sim(get_orig):
 
     # ensure number of calls recorded matches the rec period
     assert float(len(recs)) == math.floor((stop - start)/ playrec.rec_period)
+
+
+def test_pacer():
+    """Verify the `Pacer` holds its rate against a simulated clock
+    regardless of time spent between sends and bounds any catch up
+    """
+    now = [100.]
+
+    def sleep(secs):
+        now[0] += secs
+
+    rate = 1024  # binary fractions keep the simulated timeline exact
+    tick = 1 / rate
+    pacer = Pacer(rate, spin=0, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3 * rate):
+        assert pacer.wait() == 0
+        sleep(tick / 4)  # per send processing latency is absorbed
+    # no drift: the last send went out exactly on its slot
+    assert now[0] == 103 - tick + tick / 4
+    assert [s.achieved for s in pacer.stats] == [rate, rate]
+    assert all(s.jitter_max == 0 for s in pacer.stats)
+
+    # a short stall is caught up by sending back to back
+    sleep(16 * tick)
+    late = [pacer.wait() for _ in range(32)]
+    assert late[0] == 15 * tick + tick / 4
+    assert all(late[:16]) and not any(late[16:])
+    assert now[0] == 103 + 31 * tick
+
+    # a long one exceeds the bucket depth and the backlog is dropped
+    sleep(1)
+    late = [pacer.wait() for _ in range(2 * rate)]
+    depth = int(pacer.catchup * rate)
+    assert sum(1 for secs in late if secs) == depth - 1
+    assert now[0] == 104 + 31 * tick + (2 * rate - depth) * tick
@@ -0,0 +1,90 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Micro-benchmarks which can be run without a FreeSWITCH slave by way of the
+stand-in server in `tests.fakeesl`.
+
+Run any of them as a module from the source dir, for example::
+
+    python -m tests.bench.bench_protocol
+'''
+import os
+import time
+import resource
+import argparse
+import multiprocessing as mp
+from contextlib import contextmanager
+
+
+def get_parser(description):
+    '''Argument parser with options common to all benchmarks
+    '''
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--fshost', default=None,
+                        help='run against a real FreeSWITCH slave instead '
+                             'of the stand-in server')
+    parser.add_argument('--fsport', default='8021')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='one way network delay (in seconds) added by '
+                             'the stand-in server')
+    return parser
+
+
+@contextmanager
+def server(args):
+    '''Deliver the (host, port, fake) to benchmark against where `fake` is
+    the stand-in server instance or `None` when using a real slave
+    '''
+    if args.fshost:
+        yield args.fshost, args.fsport, None
+    else:
+        from tests.fakeesl import FakeESLServer
+        fake = FakeESLServer(latency=args.latency).start()
+        try:
+            yield fake.host, fake.port, fake
+        finally:
+            fake.stop()
+
+
+def timed(func, *args, **kwargs):
+    '''Return the wall time taken to call `func`
+    '''
+    start = time.time()
+    func(*args, **kwargs)
+    return time.time() - start
+
+
+def report(title, rows, unit):
+    '''Print a results table of (name, value) rows
+    '''
+    print(title)
+    for name, value in rows:
+        print('    {:<40} {:>12.1f} {}'.format(name, value, unit))
+
+
+def cpu_time():
+    '''User plus system CPU seconds consumed by this process
+    '''
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def rss():
+    '''Current resident set size of this process in bytes
+    '''
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def isolated(func, *args):
+    '''Call `func(*args)` in a fresh child process and return its result.
+    Useful for memory measurements which would otherwise be skewed by
+    allocations made (and kept in free lists) by earlier runs.
+    '''
+    queue = mp.Queue()
+    proc = mp.Process(target=lambda: queue.put(func(*args)))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
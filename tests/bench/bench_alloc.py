@@ -0,0 +1,121 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Garbage collector pauses and dispatch rate for a stream of overlapping
+create -> answer -> park -> hangup calls with and without model instance
+recycling (`EventListener(recycle=...)`), plus the size of each (slotted)
+model instance.
+
+Collections are timed by running each mode in a child process with
+`gc.DEBUG_STATS` set and parsing the per collection stats the interpreter
+writes to stderr.
+'''
+import os
+import re
+import gc
+import sys
+import tempfile
+from switchy import EventListener, utils
+from switchy.models import Session, Call, Job
+from switchy.protocol import Event, LazyEvent
+from tests.bench import get_parser, timed, isolated, report
+from tests.bench.bench_dispatch import SEQUENCE
+
+ELAPSED = re.compile(r'^gc: done.* ([\d.]+)s elapsed', re.M)
+
+
+def build_stream(count, window):
+    '''Events for `count` calls with up to `window` calls active at once
+    '''
+    calls = [utils.uuid() for _ in xrange(count)]
+
+    def event(name, uuid):
+        return LazyEvent(Event((
+            ('Event-Name', name),
+            ('Unique-ID', uuid),
+            ('Event-Date-Timestamp', '1444441234567890'),
+            ('variable_call_uuid', uuid),
+            ('Hangup-Cause', 'NORMAL_CLEARING'),
+        )).serialize())
+
+    events = []
+    for i, uuid in enumerate(calls):
+        events.extend(event(name, uuid) for name in SEQUENCE[:-1])
+        if i >= window:
+            events.append(event(SEQUENCE[-1], calls[i - window]))
+    events.extend(event(SEQUENCE[-1], uuid) for uuid in calls[-window:])
+    return events
+
+
+def footprint(obj):
+    '''Return the bytes held by `obj` itself plus any attribute dict (but
+    not the attribute values)
+    '''
+    size = sys.getsizeof(obj)
+    values = set(id(getattr(obj, name, None)) for name in
+                 getattr(type(obj), '__slots__', ()))
+    return size + sum(sys.getsizeof(ref) for ref in gc.get_referents(obj)
+                      if type(ref) is dict and id(ref) not in values)
+
+
+def run(recycle, count, window):
+    '''Dispatch the stream and return (events/s, collections, total pause,
+    max pause)
+    '''
+    listener = EventListener(backend='python', recycle=recycle)
+    events = build_stream(count, window)
+    handle = listener._handle_event
+
+    def dispatch():
+        for event in events:
+            handle(event)
+
+    gc.collect()
+    with tempfile.TemporaryFile() as log:
+        sys.stderr.flush()
+        saved = os.dup(2)
+        os.dup2(log.fileno(), 2)
+        gc.set_debug(gc.DEBUG_STATS)
+        try:
+            elapsed = timed(dispatch)
+        finally:
+            gc.set_debug(0)
+            sys.stderr.flush()
+            os.dup2(saved, 2)
+            os.close(saved)
+        log.seek(0)
+        pauses = [float(value) for value in ELAPSED.findall(log.read())]
+    assert listener.count_sessions() == 0
+    return (len(events) / elapsed, len(pauses), sum(pauses) * 1e3,
+            max(pauses or [0]) * 1e3)
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=50000,
+                        help='number of calls')
+    parser.add_argument('-w', '--window', type=int, default=2000,
+                        help='number of concurrently active calls')
+    args = parser.parse_args()
+    results = [
+        ('recycle={}'.format(size), isolated(run, size, args.count,
+                                             args.window))
+        for size in (0, args.window)
+    ]
+    report('dispatch', [(n, r[0]) for n, r in results], 'events/s')
+    report('gc', [(n, r[1]) for n, r in results], 'collections')
+    report('total gc pause', [(n, r[2]) for n, r in results], 'ms')
+    report('max gc pause', [(n, r[3]) for n, r in results], 'ms')
+    event = Event((('Unique-ID', 'doggy'), ('Job-UUID', 'kitty'),
+                   ('Event-Date-Timestamp', '1444441234567890')))
+    sess = Session(event)
+    report('instance size', [
+        ('Session', footprint(sess)),
+        ('Call', footprint(Call('doggy', sess))),
+        ('Job', footprint(Job(event))),
+    ], 'bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Throughput of many concurrent `sync_caller` style call flows (originate,
+wait for the originate job, then issue a follow up command): one thread
+per concurrent flow using the blocking `Client` versus a single `asyncio`
+(`trollius` on python 2) loop using an `AsyncClient`.
+
+Use --latency to emulate the network round trip to a remote slave.
+'''
+import threading
+from switchy import EventListener, EventLoop, Client, futures
+from switchy.aio import AsyncClient
+from tests.bench import get_parser, server, timed, report
+
+asyncio = futures.asyncio
+From = getattr(asyncio, 'From', lambda future: future)
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=2000,
+                        help='total number of call flows')
+    parser.add_argument('-c', '--concurrency', type=int, default=200,
+                        help='number of call flows in progress at once')
+    args = parser.parse_args()
+    if asyncio is None:
+        parser.error("'asyncio' or 'trollius' must be installed")
+    per_flow = args.count // args.concurrency
+    dest_url = 'doggy@127.0.0.1:5080'
+    with server(args) as (host, port, fake):
+        if fake:
+            fake.commands['originate'] = lambda arg: '+OK originated\n'
+            fake.commands['uuid_exists'] = lambda arg: 'true'
+        # a shared `EventLoop` is woken as soon as a job is registered
+        listener = EventListener(host, port, backend='python',
+                                 loop=EventLoop())
+        client = Client(host, port, listener=listener)
+        listener.connect()
+        client.connect()
+        listener.start()
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        aclient = AsyncClient(client, loop)
+        try:
+            def flows():
+                for _ in xrange(per_flow):
+                    job = client.originate(dest_url)
+                    job.wait()
+                    client.cmd('uuid_exists {}'.format(job.sess_uuid))
+
+            def threaded():
+                threads = [threading.Thread(target=flows)
+                           for _ in xrange(args.concurrency)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            @asyncio.coroutine
+            def aflows():
+                for _ in xrange(per_flow):
+                    job = yield From(aclient.originate(dest_url))
+                    yield From(job.asyncio_future(loop))
+                    yield From(aclient.cmd(
+                        'uuid_exists {}'.format(job.sess_uuid)))
+
+            def looped():
+                loop.run_until_complete(asyncio.gather(*[
+                    aflows() for _ in xrange(args.concurrency)]))
+
+            flows_run = per_flow * args.concurrency
+            rows = [('threads', flows_run / timed(threaded)),
+                    ('asyncio', flows_run / timed(looped))]
+        finally:
+            aclient.close()
+            loop.close()
+            listener.disconnect()
+            client.disconnect()
+    report('{} concurrent call flows'.format(args.concurrency), rows,
+           'flows/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Time taken by `EventListener.reconcile` to load (and then reconcile
+against) a ``show channels as json`` listing of many bridged channels,
+including fetching and decoding the listing.
+'''
+import json
+from switchy import utils, EventListener
+from tests.bench import get_parser, server, timed, report
+
+
+def build_listing(count):
+    rows = []
+    for i in xrange(count // 2):
+        aleg = utils.uuid()
+        for uuid in (aleg, utils.uuid()):
+            rows.append({
+                'uuid': uuid, 'call_uuid': aleg, 'callstate': 'ACTIVE',
+                'direction': 'outbound' if uuid == aleg else 'inbound',
+                'created_epoch': '1444441234', 'name': 'sofia/doggy',
+                'state': 'CS_EXECUTE', 'cid_name': 'doggy',
+                'cid_num': '1000', 'ip_addr': '10.10.8.21',
+                'dest': '1001', 'context': 'default',
+                'read_codec': 'PCMU', 'write_codec': 'PCMU',
+                'hostname': 'vm-host', 'presence_id': '',
+            })
+    return json.dumps({'row_count': len(rows), 'rows': rows})
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=20000,
+                        help='number of channels')
+    args = parser.parse_args()
+    listing = build_listing(args.count)
+    with server(args) as (host, port, fake):
+        if fake:
+            fake.commands['show'] = lambda arg: listing
+        listener = EventListener(host, port, backend='python')
+        listener.connect()
+        try:
+            bootstrap = timed(listener.reconcile)
+            assert listener.count_sessions() >= args.count
+            again = timed(listener.reconcile)
+        finally:
+            listener.disconnect()
+    report('{} channels'.format(args.count), [
+        ('bootstrap', 1e3 * bootstrap),
+        ('reconcile', 1e3 * again),
+    ], 'ms')
+
+if __name__ == '__main__':
+    main()
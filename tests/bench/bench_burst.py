@@ -0,0 +1,51 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Time taken to launch an originate burst from a `Client`: one `originate`
+(bgapi round trip plus job registration) per call versus a single
+`originate_many` batch.
+
+Use --latency to emulate the network round trip to a remote slave.
+'''
+from switchy import EventListener, Client
+from tests.bench import get_parser, server, timed, report
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-b', '--burst', type=int, default=100,
+                        help='calls per burst')
+    parser.add_argument('-n', '--bursts', type=int, default=20)
+    args = parser.parse_args()
+    with server(args) as (host, port, fake):
+        if fake:
+            fake.commands['originate'] = lambda arg: '+OK originated\n'
+        listener = EventListener(host, port, backend='python')
+        client = Client(host, port, listener=listener)
+        listener.connect()
+        client.connect()
+        listener.start()
+        client.set_orig_cmd('doggy@{}:5080'.format(host), app_name='park')
+        try:
+            def serial():
+                for _ in xrange(args.bursts):
+                    for _ in xrange(args.burst):
+                        client.originate()
+
+            def batched():
+                for _ in xrange(args.bursts):
+                    client.originate_many(args.burst)
+
+            rows = [('originate', timed(serial)),
+                    ('originate_many', timed(batched))]
+        finally:
+            listener.disconnect()
+            client.disconnect()
+    report('{} call burst'.format(args.burst), [
+        (name, 1e3 * elapsed / args.bursts) for name, elapsed in rows
+    ], 'ms')
+
+
+if __name__ == '__main__':
+    main()
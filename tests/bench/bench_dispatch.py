@@ -0,0 +1,70 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Events per second through `EventListener._process_event` for the
+create -> answer -> park -> hangup sequence of calls tagged with the id
+of a loaded app which has callbacks for most of those events. Events are
+decoded up front so only dispatch (handlers plus callbacks) is timed.
+'''
+from switchy import EventListener, Client, utils
+from switchy.marks import event_callback, get_callbacks
+from switchy.protocol import Event, LazyEvent
+from tests.bench import get_parser, timed, report
+
+SEQUENCE = ('CHANNEL_CREATE', 'CHANNEL_ANSWER', 'CHANNEL_PARK',
+            'CHANNEL_HANGUP')
+
+
+class App(object):
+    @event_callback('CHANNEL_ANSWER')
+    def on_answer(self, sess):
+        sess.vars['answered'] = True
+
+    @event_callback('CHANNEL_PARK')
+    def on_park(self, sess):
+        pass
+
+    @event_callback('CHANNEL_HANGUP')
+    def on_hangup(self, sess, job):
+        pass
+
+
+def build_events(count, app_id):
+    events = []
+    for i in xrange(count):
+        uuid = utils.uuid()
+        for name in SEQUENCE:
+            events.append(LazyEvent(Event((
+                ('Event-Name', name),
+                ('Unique-ID', uuid),
+                ('Event-Date-Timestamp', '1444441234567890'),
+                ('variable_call_uuid', uuid),
+                ('variable_{}'.format(Client.id_var), app_id),
+                ('Hangup-Cause', 'NORMAL_CLEARING'),
+            )).serialize()))
+    return events
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=20000,
+                        help='number of calls (4 events each)')
+    args = parser.parse_args()
+    listener = EventListener(backend='python')
+    for evname, cbtype, callback in get_callbacks(App()):
+        listener.add_callback(evname, 'bench', callback)
+    events = build_events(args.count, 'bench')
+    process = listener._process_event
+
+    def run():
+        for event in events:
+            process(event, event.getHeader('Event-Name'))
+
+    elapsed = timed(run)
+    assert listener.count_sessions() == 0
+    report('dispatch', [('events', len(events) / elapsed)], 'events/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Per-event CPU time and resident memory for the event types delivered by
+each connection backend, doing the header lookups the `EventListener`
+performs on every event and retaining all events (as `Session.events`
+does).
+
+The 'parse' cases decode frames in memory using `switchy.protocol` (the
+eagerly parsed `Event` versus the `LazyEvent` delivered by the python
+backend) where the frame content itself is allocated up front and not
+counted. The 'recv' cases receive events over a socket with each
+installed backend (`ESL.ESLevent` for 'swig') from the stand-in server.
+'''
+import threading
+from switchy import protocol, connection, utils
+from switchy.connection import Connection
+from tests.fakeesl import FakeESLServer, frame
+from tests.bench import get_parser, cpu_time, rss, isolated, report
+
+# headers looked up by the listener for (almost) every event
+LOOKUPS = ('Event-Name', 'Unique-ID', 'Event-Date-Timestamp',
+           'variable_call_uuid', 'variable_switchy_app')
+
+
+def channel_headers(count=150):
+    '''Headers resembling a CHANNEL_CREATE with `count` headers in total
+    '''
+    headers = [
+        ('Event-Name', 'CHANNEL_CREATE'),
+        ('Unique-ID', utils.uuid()),
+        ('Caller-Caller-ID-Name', 'Mr Switchy'),
+        ('variable_sip_from_uri', 'sip:switchy@127.0.0.1:5080'),
+        ('variable_call_uuid', utils.uuid()),
+        ('variable_switchy_app', 'default'),
+    ]
+    headers.extend(('variable_dummy_{}'.format(i), 'value with spaces %d' % i)
+                   for i in range(count - len(headers)))
+    return headers
+
+
+def access(events):
+    for event in events:
+        for name in LOOKUPS:
+            event.getHeader(name)
+
+
+def parse(kind, count):
+    '''Decode `count` frames into events of `kind`, look up headers and
+    return the CPU time and memory used per event
+    '''
+    content = protocol.Event(channel_headers()).serialize()
+    frames = [content[:] for _ in xrange(count)]
+    build = {'Event': protocol.parse_event,
+             'LazyEvent': protocol.LazyEvent}[kind]
+    before, start = rss(), cpu_time()
+    events = map(build, frames)
+    access(events)
+    cpu = cpu_time() - start
+    return 1e6 * cpu / count, (rss() - before) / 1024. / count
+
+
+def recv(backend, count):
+    '''Receive `count` events with `backend`, look up headers and return
+    the CPU time and memory used per event
+    '''
+    fake = FakeESLServer().start()
+    con = Connection(fake.host, fake.port, backend=backend)
+    con.connect()
+    con.subscribe(('CHANNEL_CREATE',))
+    headers = dict(channel_headers())
+    headers.pop('Event-Name')
+    # wait for the first event to arrive to exclude connection setup
+    fake.emit('CHANNEL_CREATE', **headers)
+    con.recvEvent()
+    # render the frame once to keep server side allocations out of the count
+    data = frame((('Content-Type', 'text/event-plain'),),
+                 fake.build_event('CHANNEL_CREATE', **headers).serialize())
+    client, = fake.clients
+
+    def send():
+        for _ in xrange(count):
+            client.send(data)
+
+    sender = threading.Thread(target=send)
+    before, start = rss(), cpu_time()
+    sender.start()
+    events = [con.recvEvent() for _ in xrange(count)]
+    access(events)
+    cpu = cpu_time() - start
+    mem = rss() - before
+    sender.join()
+    con.disconnect()
+    fake.stop()
+    return 1e6 * cpu / count, mem / 1024. / count
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=20000)
+    args = parser.parse_args()
+    cpu, mem = [], []
+    for kind in ('Event', 'LazyEvent'):
+        usecs, kbs = isolated(parse, kind, args.count)
+        cpu.append(('parse {}'.format(kind), usecs))
+        mem.append(('parse {}'.format(kind), kbs))
+    for name, backend in sorted(connection.backends.items()):
+        if backend is None:
+            print("skipping '{}' backend (not installed)".format(name))
+            continue
+        usecs, kbs = isolated(recv, name, args.count)
+        cpu.append(('recv {}'.format(name), usecs))
+        mem.append(('recv {}'.format(name), kbs))
+    report('cpu per event', cpu, 'us')
+    report('memory per event', mem, 'KiB')
+
+
+if __name__ == '__main__':
+    main()
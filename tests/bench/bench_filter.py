@@ -0,0 +1,82 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Rx event volume for an `EventListener` on a shared slave where only
+some of the calls are originated by switchy, with and without
+server side app filtering (`EventListener(app_filter=True)`).
+
+Events are counted as delivered by the stand-in server to the listener's
+rx connection.
+'''
+import time
+from switchy import EventListener, Client
+from switchy.marks import event_callback
+from tests.fakeesl import FakeESLServer
+from tests.bench import get_parser, report
+
+EVENTS = ('CHANNEL_CREATE', 'CHANNEL_ANSWER', 'CHANNEL_HANGUP')
+
+
+class Tracker(object):
+    @event_callback('CHANNEL_ANSWER')
+    def on_answer(self, sess):
+        pass
+
+
+def run(calls, ours, app_filter):
+    '''Emit the events for `calls` calls of which every `ours`-th is
+    tagged with our app id. Return (delivered events, seconds until the
+    listener has processed them all).
+    '''
+    fake = FakeESLServer().start()
+    el = EventListener(fake.host, fake.port, backend='python',
+                       app_filter=app_filter)
+    client = Client(fake.host, fake.port, listener=el)
+    el.connect()
+    client.connect()
+    client.load_app(Tracker, on_value='bench')
+    el.start()
+    rx, = [handler for handler in fake.clients
+           if 'CHANNEL_CREATE' in handler.events]
+    var = 'variable_{}'.format(Client.id_var)
+    start = time.time()
+    for i in xrange(calls):
+        headers = {'Unique-ID': str(i), 'variable_call_uuid': str(i)}
+        if i % ours == 0:
+            headers[var] = 'bench'
+        for name in EVENTS:
+            fake.emit(name, **headers)
+    # a final tagged call marks the end of the run
+    fake.emit('CHANNEL_CREATE', **{'Unique-ID': 'last', var: 'bench'})
+    while 'last' not in el.sessions:
+        time.sleep(0.001)
+    elapsed = time.time() - start
+    delivered = rx.rx_count - 1
+    el.disconnect()
+    client.disconnect()
+    fake.stop()
+    return delivered, elapsed
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--calls', type=int, default=5000)
+    parser.add_argument('--ours', type=int, default=10,
+                        help='every OURS-th call is originated by switchy')
+    args = parser.parse_args()
+    rows = []
+    counts = {}
+    for app_filter in (False, True):
+        name = 'filtered' if app_filter else 'unfiltered'
+        delivered, elapsed = run(args.calls, args.ours, app_filter)
+        counts[name] = delivered
+        rows.append(('{} events delivered'.format(name), delivered))
+        rows.append(('{} processing time (ms)'.format(name), 1e3 * elapsed))
+    rows.append(('rx volume drop %', 100. * (
+        1 - counts['filtered'] / float(counts['unfiltered']))))
+    report('{} calls, 1 in {} ours'.format(args.calls, args.ours), rows, '')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Aggregate event processing rate for a pool of listeners serviced by a
+thread each versus a single shared `EventLoop` (`get_pool(multiplex=True)`).
+
+Every listener connects to the same stand-in server (run in a separate
+process) which broadcasts each event to all of them.
+'''
+import time
+import multiprocessing as mp
+from switchy.observe import get_pool
+from tests.fakeesl import FakeESLServer
+from tests.bench import get_parser, cpu_time, report
+
+
+def serve(pipe):
+    fake = FakeESLServer().start()
+    pipe.send(fake.port)
+    for count, tag in iter(pipe.recv, None):
+        for i in xrange(count):
+            headers = {'Unique-ID': '{}-{}'.format(tag, i),
+                       'variable_call_uuid': '{}-{}'.format(tag, i)}
+            fake.emit('CHANNEL_CREATE', **headers)
+            fake.emit('CHANNEL_HANGUP', **headers)
+        # marks the end of the run
+        fake.emit('CHANNEL_CREATE', **{'Unique-ID': tag})
+        pipe.send(True)
+    fake.stop()
+
+
+def run(pipe, port, slaves, count, multiplex):
+    '''Return (events per second, cpu microseconds per event)
+    '''
+    pool = get_pool([('127.0.0.1', port)] * slaves, multiplex=multiplex,
+                    backend='python')
+    pool.evals('listener.connect()')
+    pool.evals('listener.start()')
+    tag = 'multiplexed' if multiplex else 'threaded'
+    start, cpu = time.time(), cpu_time()
+    pipe.send((count, tag))
+    while not all(tag in l.sessions for l in pool.listeners):
+        time.sleep(0.001)
+    elapsed, cpu = time.time() - start, cpu_time() - cpu
+    pipe.recv()
+    pool.evals('listener.disconnect()')
+    loop = pool.listeners[0]._loop
+    if loop:
+        loop.stop()
+    events = slaves * (2 * count + 1)
+    return events / elapsed, 1e6 * cpu / events
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-s', '--slaves', type=int, default=30)
+    parser.add_argument('-n', '--count', type=int, default=1000,
+                        help='calls (2 events each) per listener')
+    args = parser.parse_args()
+    pipe, child = mp.Pipe()
+    server = mp.Process(target=serve, args=(child,))
+    server.start()
+    port = pipe.recv()
+    rates, cpus = [], []
+    for multiplex in (False, True):
+        name = 'multiplexed' if multiplex else 'threaded'
+        rate, usecs = run(pipe, port, args.slaves, args.count, multiplex)
+        rates.append((name, rate))
+        cpus.append((name, usecs))
+    pipe.send(None)
+    server.join()
+    report('aggregate rate ({} listeners)'.format(args.slaves), rates,
+           'events/s')
+    report('listener process cpu per event', cpus, 'us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Session header lookup rate as sessions accumulate events. Each session is
+fed a CHANNEL_CREATE followed by PLAYBACK/DTMF style events, looking up a
+few channel variables (as apps do from their callbacks) after every event.
+The 'scan' case replays the same lookups by walking the event history
+from newest to oldest (the lookup strategy prior to the header index).
+'''
+from switchy import utils
+from switchy.models import Session
+from switchy.protocol import Event, LazyEvent
+from tests.bench import get_parser, timed, report
+from tests.bench.bench_events import channel_headers
+
+LOOKUPS = ('variable_call_uuid', 'variable_switchy_app',
+           'variable_playback_file', 'Unique-ID')
+
+
+def build_events(count):
+    uuid = utils.uuid()
+    create = Event(channel_headers())
+    create.addHeader('Event-Date-Timestamp', '1444441234567890')
+    events = [LazyEvent(create.serialize())]
+    for i in xrange(count - 1):
+        events.append(LazyEvent(Event((
+            ('Event-Name', 'DTMF' if i % 2 else 'PLAYBACK_START'),
+            ('Unique-ID', uuid),
+            ('DTMF-Digit', str(i % 10)),
+            ('variable_playback_file', 'tone_stream://%d' % i),
+        )).serialize()))
+    return events
+
+
+def scan(events, key):
+    for ev in events:
+        value = ev.getHeader(key)
+        if value:
+            return value
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-s', '--sessions', type=int, default=100)
+    args = parser.parse_args()
+    for count in (10, 100, 500):
+        streams = [build_events(count) for _ in xrange(args.sessions)]
+
+        def indexed():
+            for events in streams:
+                sess = Session(events[0])
+                for event in events[1:]:
+                    sess.update(event)
+                    for key in LOOKUPS:
+                        sess[key]
+
+        def scanned():
+            for events in streams:
+                sess = Session(events[0])
+                for event in events[1:]:
+                    sess.update(event)
+                    for key in LOOKUPS:
+                        scan(sess.events, key)
+
+        lookups = args.sessions * (count - 1) * len(LOOKUPS)
+        report('{} events per session'.format(count), [
+            ('index', lookups / timed(indexed)),
+            ('scan', lookups / timed(scanned)),
+        ], 'lookups/s')
+
+
+if __name__ == '__main__':
+    main()
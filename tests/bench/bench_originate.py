@@ -0,0 +1,64 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Originate command render rate for a `Client.set_orig_cmd` style command
+with per-call replacement fields from a `rep_fields_func` (as used by the
+ivr dialer example). The 'format' case re-parses the command with
+`str.format` for every call (the strategy prior to compiled templates).
+'''
+from itertools import cycle
+from switchy import utils
+from switchy.commands import build_originate_cmd, OriginateTemplate
+from tests.bench import get_parser, timed, report
+
+
+def build_cmd():
+    return build_originate_cmd(
+        dest_url='{dest_url}',
+        profile='{dest_profile}',
+        endpoint='{dest_endpoint}',
+        app_name='park',
+        xheaders={'X-switchy_app_id': '{app_id}',
+                  'variable_call_uuid': '{uuid_str}'},
+        switchy_app='{app_id}',
+    )
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=1000000,
+                        help='number of commands to render')
+    args = parser.parse_args()
+    cmd = build_cmd()
+    tmpl = OriginateTemplate(cmd)
+    uuids = [utils.uuid() for _ in xrange(1000)]
+    dids = cycle(str(4000 + i) for i in xrange(100))
+
+    def rep_fields_func():
+        return {
+            'dest_url': 'a/{}'.format(next(dids)),
+            'dest_profile': 'g1',
+            'dest_endpoint': 'freetdm'
+        }
+
+    count = args.count
+
+    def formatted():
+        for i in xrange(count):
+            cmd.format(uuid_str=uuids[i % 1000], app_id='default',
+                       **rep_fields_func())
+
+    def rendered():
+        for i in xrange(count):
+            tmpl.render(rep_fields_func(), uuids[i % 1000], 'default')
+
+    overhead = timed(lambda: [rep_fields_func() for i in xrange(count)])
+    report('{} originate commands (excluding rep_fields_func)'.format(count), [
+        ('format', count / (timed(formatted) - overhead)),
+        ('template', count / (timed(rendered) - overhead)),
+    ], 'cmds/s')
+
+
+if __name__ == '__main__':
+    main()
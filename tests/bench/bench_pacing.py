@@ -0,0 +1,73 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Achieved versus requested send rate for the `Originator`'s legacy
+``time.sleep(0.9 / rate)`` spacing and the `Pacer` timeline (sleeping only
+and with a 0.5ms spin), with each send emulated by `--work` microseconds of
+busy CPU time.
+'''
+from __future__ import division
+import time
+from switchy.apps.call_gen import Pacer
+from tests.bench import get_parser, report
+
+
+def busy(secs):
+    end = time.time() + secs
+    while time.time() < end:
+        pass
+
+
+def legacy(rate, count, work):
+    ibp = 1 / rate * 0.90
+    stamps = []
+    for _ in xrange(count):
+        stamps.append(time.time())
+        busy(work)
+        time.sleep(ibp)
+    return stamps, [0]
+
+
+def paced(rate, count, work, spin=0):
+    pacer = Pacer(rate, spin=spin)
+    stamps, late = [], []
+    for _ in xrange(count):
+        late.append(pacer.wait())
+        stamps.append(time.time())
+        busy(work)
+    return stamps, late
+
+
+def spun(rate, count, work):
+    return paced(rate, count, work, spin=0.0005)
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-r', '--rates', type=int, nargs='+',
+                        default=[100, 250, 1000, 2500, 5000])
+    parser.add_argument('-s', '--seconds', type=float, default=2)
+    parser.add_argument('-w', '--work', type=float, default=100,
+                        help='per send processing time in microseconds')
+    args = parser.parse_args()
+    for rate in args.rates:
+        count = int(rate * args.seconds)
+        rows = []
+        for name, func in [('sleep(0.9 / rate)', legacy),
+                           ('Pacer', paced),
+                           ('Pacer(spin=0.0005)', spun)]:
+            stamps, late = func(rate, count, args.work / 1e6)
+            achieved = (count - 1) / (stamps[-1] - stamps[0])
+            rows.append(('{} cps'.format(name), achieved))
+            if func is not legacy:
+                late.sort()
+                rows.append(('{} p99 jitter (us)'.format(name),
+                             1e6 * late[int(0.99 * len(late))]))
+                rows.append(('{} max jitter (us)'.format(name),
+                             1e6 * late[-1]))
+        report('{} cps requested'.format(rate), rows, '')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Command throughput and latency of a single connection shared by many
+threads: serialized (lock held over each round trip, the classic
+`Connection` behaviour) versus pipelined (many commands in flight).
+
+Use --latency to emulate the network round trip to a remote slave.
+'''
+import time
+import threading
+from switchy.protocol import ESLConnection
+from tests.bench import get_parser, server, report
+
+
+def run_callers(call, threads, count):
+    '''Issue `count` commands split across `threads` callers.
+    Return (throughput, mean latency, max latency).
+    '''
+    latencies = []
+    per_thread = count // threads
+
+    def caller():
+        lats = []
+        for _ in xrange(per_thread):
+            start = time.time()
+            call('status')
+            lats.append(time.time() - start)
+        latencies.extend(lats)
+
+    workers = [threading.Thread(target=caller) for _ in range(threads)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - start
+    return (len(latencies) / elapsed,
+            1e3 * sum(latencies) / len(latencies),
+            1e3 * max(latencies))
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=4000)
+    parser.add_argument('-t', '--threads', type=int, default=16)
+    args = parser.parse_args()
+    with server(args) as (host, port, fake):
+        con = ESLConnection(host, port, 'ClueCon')
+        lock = threading.Lock()
+
+        def serialized(cmd):
+            with lock:
+                return con.api(cmd)
+
+        rates, lats = [], []
+        for name, call in (('serialized', serialized),
+                           ('pipelined', con.api)):
+            rate, mean, worst = run_callers(call, args.threads, args.count)
+            rates.append((name, rate))
+            lats.extend([('{} mean'.format(name), mean),
+                         ('{} max'.format(name), worst)])
+
+        # fire and forget burst: every command written before any reply
+        start = time.time()
+        replies = [con.api_async('status') for _ in xrange(args.count)]
+        for reply in replies:
+            reply.result()
+        rates.append(('pipelined burst', args.count / (time.time() - start)))
+        report('throughput ({} threads)'.format(args.threads), rates,
+               'cmds/s')
+        report('latency', lats, 'ms')
+        con.disconnect()
+
+
+if __name__ == '__main__':
+    main()
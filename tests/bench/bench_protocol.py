@@ -0,0 +1,52 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Throughput of the available connection backends for api round trips
+and event reception.
+'''
+from switchy import connection
+from switchy.connection import Connection
+from tests.bench import get_parser, server, timed, report
+
+
+def api_rate(con, count):
+    def run():
+        for _ in xrange(count):
+            con.api('status')
+    return count / timed(run)
+
+
+def event_rate(con, fake, count):
+    con.subscribe(('CHANNEL_CREATE',))
+
+    def run():
+        for _ in xrange(count):
+            fake.emit('CHANNEL_CREATE', **{'Unique-ID': 'doggy'})
+        for _ in xrange(count):
+            con.recvEvent()
+    return count / timed(run)
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=5000)
+    args = parser.parse_args()
+    rows = []
+    with server(args) as (host, port, fake):
+        for name, backend in sorted(connection.backends.items()):
+            if backend is None:
+                print("skipping '{}' backend (not installed)".format(name))
+                continue
+            with Connection(host, port, backend=name) as con:
+                rows.append(('{} api'.format(name),
+                             api_rate(con, args.count)))
+            if fake:
+                with Connection(host, port, backend=name) as con:
+                    rows.append(('{} events'.format(name),
+                                 event_rate(con, fake, args.count)))
+    report('backend throughput', rows, 'ops/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Soak of many concurrent sessions which each receive a stream of
+DTMF/PLAYBACK style events (carrying channel variables as FreeSWITCH
+events do) comparing the resident memory and CPU time used under each
+event retention policy. A few headers are looked up after every event.
+'''
+from switchy import utils
+from switchy.models import Session
+from switchy.protocol import Event, LazyEvent
+from tests.bench import get_parser, cpu_time, rss, isolated, report
+from tests.bench.bench_events import channel_headers
+
+POLICIES = ('all', (2, 8), 'snapshot')
+LOOKUPS = ('variable_call_uuid', 'DTMF-Digit')
+
+
+def soak(policy, sessions, count):
+    '''Feed `count` events to each of `sessions` sessions and return the
+    MiB and CPU seconds used
+    '''
+    create = Event(channel_headers(60))
+    create.addHeader('Event-Date-Timestamp', '1444441234567890')
+    template = Event(channel_headers(60))
+    template.delHeader('Event-Name')
+    template.addHeader('Event-Name', 'DTMF')
+    template.addHeader('DTMF-Digit', 'DIGIT')
+    template = template.serialize()
+    before, start = rss(), cpu_time()
+    active = [Session(LazyEvent(create.serialize()), uuid=utils.uuid(),
+                      retain=policy) for _ in xrange(sessions)]
+    for i in xrange(count - 1):
+        for sess in active:
+            # a distinct frame per event as received off the wire
+            sess.update(LazyEvent(template.replace('DIGIT', str(i % 10))))
+            for key in LOOKUPS:
+                sess.get(key)
+    return (rss() - before) / 2.**20, cpu_time() - start
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-s', '--sessions', type=int, default=10000)
+    parser.add_argument('-e', '--events', type=int, default=20,
+                        help='events per session')
+    args = parser.parse_args()
+    mem, cpu = [], []
+    for policy in POLICIES:
+        mib, secs = isolated(soak, policy, args.sessions, args.events)
+        mem.append((str(policy), mib))
+        cpu.append((str(policy), secs))
+    title = '{} sessions x {} events'.format(args.sessions, args.events)
+    report('{} memory'.format(title), mem, 'MiB')
+    report('{} cpu'.format(title), cpu, 's')
+
+
+if __name__ == '__main__':
+    main()
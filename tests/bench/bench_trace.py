@@ -0,0 +1,68 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Per hit cost of a hot path trace site compared with the
+`log.debug("...".format(...))` calls it replaces (with DEBUG disabled), as
+well as the rate at which the listener dispatches call events with all
+trace sites disabled versus enabled.
+'''
+import logging
+from switchy import EventListener, tracepoints, utils
+from tests.bench import get_parser, timed, report
+from tests.bench.bench_dispatch import build_events
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('-n', '--count', type=int, default=10**6,
+                        help='number of trace site hits')
+    args = parser.parse_args()
+    uuid = utils.uuid()
+    log = utils.get_logger('bench')
+    log.setLevel(logging.INFO)
+    tp = tracepoints.tracepoint(
+        'bench.hangup', ('uuid', '36s'), ('cause', '17s'))
+
+    def logged():
+        for _ in xrange(args.count):
+            log.debug("hungup session '{}' with cause '{}'".format(
+                uuid, 'NORMAL_CLEARING'))
+
+    def traced():
+        for _ in xrange(args.count):
+            if tp.enabled:
+                tp(uuid, 'NORMAL_CLEARING')
+
+    def empty():
+        for _ in xrange(args.count):
+            pass
+
+    base = timed(empty)
+    rows = [('log.debug (disabled)', timed(logged))]
+    rows.append(('trace site (disabled)', timed(traced)))
+    tracepoints.enable('bench.*')
+    rows.append(('trace site (enabled)', timed(traced)))
+    tracepoints.disable()
+    report('cost per hit', [
+        (name, (elapsed - base) / args.count * 1e9) for name, elapsed in rows
+    ], 'ns')
+
+    listener = EventListener(backend='python')
+    events = build_events(args.count // 40, 'default')
+    process = listener._process_event
+
+    def dispatch():
+        for event in events:
+            process(event, event.getHeader('Event-Name'))
+
+    dispatch()  # warm up
+    rows = [('tracing disabled', len(events) / timed(dispatch))]
+    tracepoints.enable()
+    rows.append(('tracing enabled', len(events) / timed(dispatch)))
+    tracepoints.disable()
+    report('dispatch', rows, 'events/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -111,3 +111,13 @@ def client(fshost):
     yield cl
     cl.disconnect()
     assert not cl.connected()
+
+
+@pytest.yield_fixture
+def fakeesl():
+    '''Deliver a local stand-in ESL server
+    '''
+    from fakeesl import FakeESLServer
+    server = FakeESLServer().start()
+    yield server
+    server.stop()
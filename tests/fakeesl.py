@@ -0,0 +1,267 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+A local stand-in ESL server which speaks just enough of the
+mod_event_socket inbound protocol to exercise switchy without FreeSWITCH.
+'''
+import time
+import socket
+import threading
+import SocketServer
+import Queue
+from collections import OrderedDict
+from switchy import utils
+from switchy.protocol import Event
+
+
+DISCONNECT_MSG = ('Disconnected, goodbye.\n'
+                  'See you at ClueCon! http://www.cluecon.com/\n')
+
+
+def frame(headers, content=''):
+    '''Render an ESL frame from a sequence of header pairs and content
+    '''
+    head = ''.join('{}: {}\n'.format(*pair) for pair in headers)
+    if content:
+        head += 'Content-Length: {}\n'.format(len(content))
+    return head + '\n' + content
+
+
+class ClientHandler(SocketServer.BaseRequestHandler):
+    '''Service a single inbound esl connection
+    '''
+    def setup(self):
+        self.events = set()
+        self.filters = []
+        self.rx_count = 0  # events delivered to this client
+        self._wlock = threading.Lock()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.latency = self.server.fake.latency
+        if self.latency:
+            # deliver writes after a fixed (one way) network delay
+            self._outq = Queue.Queue()
+            writer = threading.Thread(target=self._delayed_writer)
+            writer.daemon = True
+            writer.start()
+
+    def _delayed_writer(self):
+        while True:
+            due, data = self._outq.get()
+            if data is None:
+                return
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self._write(data)
+
+    def send(self, data):
+        if self.latency:
+            self._outq.put((time.time() + self.latency, data))
+            return True
+        return self._write(data)
+
+    def _write(self, data):
+        with self._wlock:
+            try:
+                self.request.sendall(data)
+            except socket.error:
+                return False
+        return True
+
+    def reply(self, text, *headers):
+        self.send(frame(
+            (('Content-Type', 'command/reply'), ('Reply-Text', text)) +
+            headers))
+
+    def wants(self, event):
+        '''Check subscription and filter state for this event
+        '''
+        name = event.getHeader('Event-Name')
+        if name == 'CUSTOM':
+            name = event.getHeader('Event-Subclass')
+        if 'ALL' not in self.events and name not in self.events:
+            return False
+        if self.filters:
+            return any(event.getHeader(h) == v for h, v in self.filters)
+        return True
+
+    def deliver(self, event):
+        if self.wants(event):
+            self.rx_count += 1
+            return self.send(frame(
+                (('Content-Type', 'text/event-plain'),), event.serialize()))
+        return False
+
+    def handle(self):
+        server = self.server.fake
+        self.send(frame((('Content-Type', 'auth/request'),)))
+        buf = ''
+        authed = False
+        while True:
+            try:
+                data = self.request.recv(2**16)
+            except socket.error:
+                break
+            if not data:
+                break
+            buf += data
+            while '\n\n' in buf:
+                block, buf = buf.split('\n\n', 1)
+                lines = block.split('\n')
+                cmd, headers = lines[0], dict(
+                    line.split(': ', 1) for line in lines[1:] if ': ' in line)
+                if not authed:
+                    if cmd == 'auth {}'.format(server.password):
+                        authed = True
+                        server.clients.append(self)
+                        self.reply('+OK accepted')
+                    else:
+                        self.reply('-ERR invalid')
+                        self.disconnect()
+                        return
+                    continue
+                if not self.command(server, cmd, headers):
+                    return
+        self.close(server)
+
+    def command(self, server, cmd, headers):
+        name, _, args = cmd.partition(' ')
+        if name == 'api':
+            body = server.api(args)
+            self.send(frame((('Content-Type', 'api/response'),), body))
+        elif name == 'bgapi':
+            job_uuid = headers.get('Job-UUID') or utils.uuid()
+            if server.job_lead:
+                # deliver the job's event ahead of the command reply
+                server.bgapi(args, job_uuid)
+                time.sleep(server.job_lead)
+                self.reply('+OK Job-UUID: {}'.format(job_uuid),
+                           ('Job-UUID', job_uuid))
+            else:
+                self.reply('+OK Job-UUID: {}'.format(job_uuid),
+                           ('Job-UUID', job_uuid))
+                server.bgapi(args, job_uuid)
+        elif name == 'event':
+            fmt, _, names = args.partition(' ')
+            self.events.update(n for n in names.split() if n != 'CUSTOM')
+            self.reply('+OK event listener enabled {}'.format(fmt))
+        elif name == 'filter':
+            parts = args.split(' ', 2)
+            if parts[0] == 'delete':
+                pair = tuple(parts[1:3])
+                if pair in self.filters:
+                    self.filters.remove(pair)
+                self.reply('+OK filter deleted. [{}]=[{}]'.format(*pair))
+            else:
+                self.filters.append((parts[0], parts[1]))
+                self.reply('+OK filter added. [{}]=[{}]'.format(*parts))
+        elif name in ('exit', 'quit'):
+            self.reply('+OK bye')
+            self.disconnect()
+            return False
+        else:
+            self.reply('-ERR command not found')
+        return True
+
+    def disconnect(self):
+        self.send(frame(
+            (('Content-Type', 'text/disconnect-notice'),), DISCONNECT_MSG))
+        self.close(self.server.fake)
+
+    def close(self, server):
+        with server.lock:
+            if self in server.clients:
+                server.clients.remove(self)
+        if self.latency:
+            self._outq.put((0, None))
+        try:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+
+
+class TCPServer(SocketServer.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeESLServer(object):
+    '''A threaded ESL server which replies to api/bgapi commands through
+    pluggable command handlers and broadcasts events to all subscribed
+    clients while honouring their filters.
+    '''
+    def __init__(self, host='127.0.0.1', port=0, password='ClueCon',
+                 latency=0):
+        self.password = password
+        self.latency = latency
+        # seconds by which BACKGROUND_JOB events precede their bgapi reply
+        self.job_lead = 0
+        self.clients = []
+        self.lock = threading.RLock()
+        self.core_uuid = utils.uuid()
+        # map of api command names to callables returning a body string
+        self.commands = OrderedDict([
+            ('status', lambda args: 'UP 0 years, 0 days\n'),
+            ('echo', lambda args: args),
+        ])
+        self._server = TCPServer((host, port), ClientHandler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='fake-esl')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.disconnect_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def disconnect_all(self):
+        for client in list(self.clients):
+            client.disconnect()
+
+    def api(self, cmdline):
+        name, _, args = cmdline.partition(' ')
+        handler = self.commands.get(name)
+        if handler is None:
+            return '-ERR {} Command not found!\n'.format(name)
+        return handler(args)
+
+    def bgapi(self, cmdline, job_uuid):
+        body = self.api(cmdline)
+        self.emit('BACKGROUND_JOB', body=body, **{
+            'Job-UUID': job_uuid,
+            'Job-Command': cmdline.partition(' ')[0],
+            'Job-Command-Arg': cmdline.partition(' ')[2],
+        })
+
+    def build_event(self, name, body=None, **headers):
+        event = Event((
+            ('Event-Name', name),
+            ('Core-UUID', self.core_uuid),
+            ('Event-Date-Timestamp', int(time.time() * 1e6)),
+        ), body)
+        for key, value in headers.iteritems():
+            event.addHeader(key, value)
+        return event
+
+    def emit(self, name, body=None, **headers):
+        '''Broadcast an event to all clients which want it
+        '''
+        event = self.build_event(name, body=body, **headers)
+        with self.lock:
+            clients = list(self.clients)
+        return sum(client.deliver(event) for client in clients)
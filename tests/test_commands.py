@@ -0,0 +1,47 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Tests for command builders
+'''
+import pytest
+from switchy.utils import ConfigurationError
+from switchy.commands import build_originate_cmd, OriginateTemplate
+
+
+def test_originate_template():
+    '''A compiled template renders exactly what `str.format` would and
+    rejects unsupported fields up front
+    '''
+    cmd = build_originate_cmd(
+        '{dest_url}', xheaders={'X-switchy_app_id': '{app_id}'},
+        switchy_app='{app_id}')
+    tmpl = OriginateTemplate(cmd)
+    assert str(tmpl) == cmd
+    assert tmpl.fields == {'uuid_str', 'app_id', 'dest_url'}
+    fields = {'dest_url': 'doggy@10.10.8.21:5080', 'unused': 'kitty'}
+    assert tmpl.render(fields, 'uuid', 'app') == cmd.format(
+        uuid_str='uuid', app_id='app', **fields)
+    # non-string values are coerced
+    assert 'switchy_app=10' in tmpl.render(fields, 'uuid', 10)
+    # missing fields fail like str.format
+    with pytest.raises(KeyError):
+        tmpl.render({}, 'uuid', 'app')
+    # the positional values must all be provided
+    with pytest.raises(TypeError):
+        tmpl.render(fields, 'uuid')
+    tmpl.check(fields)
+    with pytest.raises(ConfigurationError):
+        tmpl.check({})
+
+    # positional args are optional
+    tmpl = OriginateTemplate('{{escaped}} {name}', args=())
+    assert tmpl.render({'name': 'doggy'}) == '{escaped} doggy'
+    assert OriginateTemplate('originate', args=()).render({}) == 'originate'
+    tmpl = OriginateTemplate('{uuid_str}:{app_id}:{uuid_str}')
+    assert tmpl.render({}, 'uuid', 'app') == 'uuid:app:uuid'
+
+    for bad in ('{0}', '{}', '{name!r}', '{name:>10}', '{name.attr}',
+                '{name[0]}', '{name'):
+        with pytest.raises(ConfigurationError):
+            OriginateTemplate(bad)
@@ -33,3 +33,57 @@ def test_setup(pool):
     assert all(pool.evals('listener.is_alive()'))
     pool.evals('listener.disconnect()')
     assert not all(pool.evals('listener.is_alive()'))
+
+
+def test_pool_counters():
+    '''Pool wide counts are kept up to date incrementally by the listeners
+    '''
+    from collections import namedtuple, Counter
+    from switchy import EventListener
+    from switchy.distribute import SlavePool
+    from switchy.protocol import Event
+    Pair = namedtuple("Pair", "client listener")
+    listeners = [EventListener(backend='python') for _ in range(2)]
+    pool = SlavePool([Pair(None, el) for el in listeners])
+
+    def emit(el, name, uuid, cause='NORMAL_CLEARING'):
+        el._handle_event(Event((
+            ('Event-Name', name),
+            ('Unique-ID', uuid),
+            ('Event-Date-Timestamp', '1444441234567890'),
+            ('variable_call_uuid', 'call-' + uuid[0]),
+            ('Hangup-Cause', cause),
+        )))
+
+    for el, prefix in zip(listeners, 'ab'):
+        for suffix in '12':  # two sessions in a single call
+            emit(el, 'CHANNEL_CREATE', prefix + suffix)
+    assert pool.count_sessions() == 4
+    assert pool.fast_count() == pool.count_calls() == 2
+    assert pool.sessions_per_app() == sum(
+        pool.sessions_per_app_per_slave, Counter())
+
+    emit(listeners[0], 'CHANNEL_ANSWER', 'a1')
+    emit(listeners[0], 'CHANNEL_HANGUP', 'a1')
+    emit(listeners[1], 'CHANNEL_HANGUP', 'b1', cause='USER_BUSY')
+    assert pool.count_sessions() == 2
+    assert pool.count_calls() == 2
+    assert pool.count_failed() == 1
+    assert pool.hangup_causes() == {'NORMAL_CLEARING': 1, 'USER_BUSY': 1}
+
+    emit(listeners[1], 'CHANNEL_HANGUP', 'b2', cause='USER_BUSY')
+    assert pool.count_sessions() == 1
+    assert pool.count_calls() == 1
+    assert pool.count_failed() == 2
+
+    listeners[1].reset()
+    assert pool.count_failed() == 0
+    assert pool.hangup_causes()['USER_BUSY'] == 0
+    assert pool.count_sessions() == sum(pool.evals('len(listener.sessions)'))
+    # copies without emptied entries which callers may freely modify
+    assert 'USER_BUSY' not in pool.hangup_causes()
+    causes = pool.hangup_causes()
+    causes['NORMAL_CLEARING'] += 10
+    assert pool.hangup_causes()['NORMAL_CLEARING'] == 1
+    assert pool.sessions_per_app() == sum(
+        pool.sessions_per_app_per_slave, Counter())
@@ -0,0 +1,306 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Tests for models
+'''
+import pytest
+from switchy.models import Events, Session, FreeList
+from switchy.protocol import Event, LazyEvent
+
+
+def test_events_index():
+    '''Header lookups return the latest non-empty value and stay up to date
+    as events are added
+    '''
+    create = Event((('Event-Name', 'CHANNEL_CREATE'),
+                    ('Unique-ID', 'doggy'),
+                    ('Event-Date-Timestamp', '1444441234567890'),
+                    ('variable_state', 'create'),
+                    ('variable_spam', 'eggs')))
+    events = Events(create)
+    assert events['variable_state'] == 'create'
+    assert events.get('variable_bird') is None
+    assert events.get('variable_bird', 'default') == 'default'
+    with pytest.raises(KeyError):
+        events['variable_bird']
+
+    events.update(LazyEvent(Event((
+        ('Event-Name', 'CHANNEL_ANSWER'),
+        ('variable_state', 'answer'),
+        ('variable_bird', 'sparrow'),
+        ('variable_spam', ''))).serialize()))
+    assert events['variable_state'] == 'answer'
+    # previously missing headers are picked up
+    assert events['variable_bird'] == 'sparrow'
+    # empty values never override
+    assert events['variable_spam'] == 'eggs'
+    assert events['Event-Name'] == 'CHANNEL_ANSWER'
+    # integer keys index into the history
+    assert events[-1] is create
+    assert len(events) == 2
+
+    sess = Session(create)
+    sess.update(Event((('variable_state', 'park'),)))
+    assert sess.variable_state == 'park'
+    assert sess['Unique-ID'] == 'doggy'
+
+
+@pytest.mark.parametrize('retain, kept', [
+    ('all', range(10)),
+    ((2, 3), [0, 1, 7, 8, 9]),
+    ('snapshot', []),
+])
+def test_events_retention(retain, kept):
+    '''Bounded policies drop events but lookups are unaffected
+    '''
+    events = Events(retain=retain)
+    for i in range(10):
+        headers = [('Event-Name', 'DTMF'), ('seq', str(i))]
+        if i == 5:
+            headers.append(('variable_dropped', 'dropped'))
+        if i < 6:
+            headers.append(('variable_early', str(i)))
+        events.update(Event(headers))
+        # index keeps up as events are dropped
+        assert events['seq'] == str(i)
+
+    assert [int(ev.getHeader('seq')) for ev in events] == kept[::-1]
+    assert len(events) == len(kept)
+    assert events.received == 10
+    # first lookups fall back to the snapshot of dropped events
+    assert events['variable_dropped'] == 'dropped'
+    assert events['variable_early'] == '5'
+    if kept:
+        assert events[0].getHeader('seq') == '9'
+        assert events[-1].getHeader('seq') == '0'
+
+
+def test_retention_policy():
+    from switchy import EventListener
+    from switchy.utils import ConfigurationError
+    with pytest.raises(ConfigurationError):
+        Events(retain='doggy')
+    with pytest.raises(ConfigurationError):
+        EventListener(event_retention=(1, -1))
+
+    el = EventListener(event_retention=(1, 1))
+    el.set_event_retention('snapshot', 'app')
+    for uuid, app in (('a', 'default'), ('b', 'app')):
+        el._handle_initial_event(Event((
+            ('Event-Name', 'CHANNEL_CREATE'),
+            ('Unique-ID', uuid),
+            ('Event-Date-Timestamp', '1444441234567890'),
+            ('variable_switchy_app', app))))
+    assert len(el.sessions['a'].events) == 1
+    assert len(el.sessions['b'].events) == 0
+    assert el.sessions['b'].uuid == 'b'
+    assert el.sessions['b'].time == 1444441234.56789
+
+
+def test_slotted_models():
+    '''Models use a compact slotted layout while sessions still accept
+    app defined attributes
+    '''
+    from switchy.models import Call, Job
+    sess = Session(Event((('Unique-ID', 'doggy'),)))
+    call = Call('doggy', sess)
+    job = Job(Event((('Job-UUID', 'kitty'),)))
+    assert not hasattr(call, '__dict__') and not hasattr(job, '__dict__')
+    sess.bert_sync_lost_cnt = 1
+    assert sess.bert_sync_lost_cnt == 1
+
+
+def test_free_list():
+    '''Released instances are handed back out up to the list's size
+    '''
+    free = FreeList(size=1)
+    assert free.get() is None
+    sess = Session(Event((('Unique-ID', 'doggy'),)))
+    assert free.put(sess)
+    assert not free.put(Session(Event((('Unique-ID', 'kitty'),))))
+    assert free.get() is sess
+    assert free.get() is None
+    assert (free.reused, free.released, free.rejected) == (1, 1, 1)
+
+
+def test_listener_recycle():
+    '''Sessions and calls are released for reuse once the event which
+    ended their call has been processed
+    '''
+    from switchy import EventListener, utils
+    from tests.bench.bench_dispatch import build_events
+    with pytest.raises(utils.ConfigurationError):
+        EventListener(backend='python', recycle=10, callback_workers=2)
+    el = EventListener(backend='python', recycle=10)
+    hungup = []
+
+    def on_hangup(sess, job):
+        # still intact while the hangup is processed
+        assert sess.call is not None
+        hungup.append((sess, sess.uuid))
+
+    el.add_callback('CHANNEL_HANGUP', 'default', on_hangup)
+    for event in build_events(3, 'default'):
+        el._handle_event(event)
+    assert el.count_sessions() == 0
+    assert len(hungup) == 3
+    free = el.free_lists
+    # the single free instance is reused for each new call
+    assert free['Call'].released == 3
+    assert free['Call'].reused == 2
+    assert free['Session'].released == 3
+    assert free['Session'].reused == 2
+    assert len(set(id(sess) for sess, _ in hungup)) == 1
+    sess = free['Session'].get()
+    assert sess is hungup[0][0]
+    assert sess.call is None
+    assert sess.uuid == hungup[-1][1] == event.getHeader('Unique-ID')
+    assert sess.times['answer']
+
+
+def test_listener_failure_records(tmpdir):
+    '''Failed sessions are kept as compact records in a bounded ring per
+    cause and their events optionally dumped to disk
+    '''
+    from switchy import EventListener
+    from switchy.models import FailureRecord
+    dump = tmpdir.join('failures.log')
+    el = EventListener(backend='python', failure_ring=2,
+                       failure_headers=('Caller-Destination-Number',),
+                       failure_dump=str(dump))
+    for i in range(3):
+        uuid = 'doggy{}'.format(i)
+        for name in ('CHANNEL_CREATE', 'CHANNEL_HANGUP'):
+            el._handle_event(Event((
+                ('Event-Name', name),
+                ('Unique-ID', uuid),
+                ('Event-Date-Timestamp', '1444441234567890'),
+                ('variable_call_uuid', uuid),
+                ('Caller-Destination-Number', '100{}'.format(i)),
+                ('Hangup-Cause', 'USER_BUSY'),
+            )))
+    assert el.count_sessions() == 0
+    assert el.count_failed() == 3
+    records = el.failed_sessions['USER_BUSY']
+    # only the most recent records are kept
+    assert [rec.uuid for rec in records] == ['doggy1', 'doggy2']
+    rec = records[-1]
+    assert isinstance(rec, FailureRecord)
+    assert rec.cause == 'USER_BUSY'
+    assert not rec.answered
+    assert rec.times['create'] and rec.times['hangup']
+    assert rec['Caller-Destination-Number'] == '1002'
+    assert rec.get('variable_call_uuid') is None
+    assert dump.read().count("# failed session") == 3
+    el.reset()
+    assert el.count_failed() == 0
+    assert not el.failed_sessions
+
+
+def test_job_future():
+    '''Job completion resolves its future and runs done callbacks
+    '''
+    from switchy import futures
+    from switchy.models import Job, JobError
+    jobs = [Job(Event((('Job-UUID', 'job{}'.format(i)),))) for i in range(3)]
+    done = []
+    jobs[0].add_done_callback(done.append)
+    assert not jobs[0].ready()
+    with pytest.raises(Job.TimeoutError):
+        jobs[0].get(timeout=0.01)
+
+    assert jobs[0]('doggy') == 'doggy'
+    assert done == [jobs[0]]
+    assert jobs[0].future.result() == 'doggy'
+    assert jobs[0].successful()
+
+    jobs[1].fail('kitty')
+    assert not jobs[1].successful()
+    assert isinstance(jobs[1].get(), JobError)
+    with pytest.raises(JobError):
+        jobs[1].future.result()
+
+    # bulk waits
+    finished, pending = futures.wait_all(jobs, timeout=0.01)
+    assert finished == jobs[:2]
+    assert pending == [jobs[2]]
+    it = futures.as_completed(jobs)
+    assert set([next(it), next(it)]) == set(jobs[:2])
+    jobs[2]('eggs')
+    assert next(it) is jobs[2]
+    assert futures.wait_all(jobs) == (jobs, [])
+
+
+def test_future_waiters():
+    '''Only threads waiting on a future are woken when it resolves
+    '''
+    import threading
+    from switchy import futures
+    waited, other = futures.Future(), futures.Future()
+    assert not waited.wait(0.01)
+    assert waited._waiter is not None
+    # resolving a future which no one waited on allocates nothing
+    other.set_result('kitty')
+    assert other._waiter is None and other.wait()
+    assert not waited._waiter.is_set()
+    threading.Timer(0.05, waited.set_result, ('doggy',)).start()
+    assert waited.result(timeout=1) == 'doggy'
+
+
+def test_session_vars_watch():
+    '''Futures watching session variables resolve once the variable is set
+    to a true value
+    '''
+    from switchy.models import Vars
+    sess = Session(Event((('Unique-ID', 'doggy'),)))
+    assert isinstance(sess.vars, Vars)
+    future = sess.vars.watch('answered')
+    sess.vars['answered'] = False
+    assert not future.done()
+    sess.vars['answered'] = 'yes'
+    assert future.result() == 'yes'
+    # already set values resolve immediately
+    assert sess.vars.watch('answered').done()
+
+    future = sess.vars.watch('parked')
+    sess.vars.update(parked=True)
+    assert future.result() is True
+    future = sess.vars.watch('bridged')
+    sess.vars.clear()
+    assert future.cancelled()
+    # abandoned watchers are discarded
+    future = sess.vars.watch('bridged')
+    sess.vars.unwatch('bridged', future)
+    sess.vars['bridged'] = True
+    assert not future.done()
+
+
+def test_waitfor_recycled():
+    '''Waiting on the variables of a recycled session returns False and
+    timed out waiters are not kept around
+    '''
+    import threading
+    import multiprocessing as mp
+    from switchy import EventListener
+    el = EventListener(backend='python')
+    sessions = [Session(Event((('Unique-ID', uuid),)))
+                for uuid in ('doggy', 'kitty')]
+    sess = sessions[0]
+    with pytest.raises(mp.TimeoutError):
+        el.waitfor(sess, 'parked', timeout=0.01)
+    with pytest.raises(mp.TimeoutError):
+        el.waitfor_all(sessions, 'parked', timeout=0.01)
+    with pytest.raises(mp.TimeoutError):
+        el.waitfor_any(sessions, 'parked', timeout=0.01)
+    assert not any(s.vars._waiters['parked'] for s in sessions)
+
+    threading.Timer(0.05, sess.vars.clear).start()
+    assert el.waitfor(sess, 'parked', timeout=1) is False
+    threading.Timer(0.05, sess.vars.clear).start()
+    sessions[1].vars['parked'] = True
+    assert el.waitfor_all(sessions, 'parked', timeout=1) is False
+    sessions[1].vars.clear()
+    for s in sessions:
+        threading.Timer(0.05, s.vars.clear).start()
+    assert el.waitfor_any(sessions, 'parked', timeout=1) is None
@@ -0,0 +1,930 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Tests for the pure python ESL protocol engine
+'''
+import time
+import pytest
+from switchy import protocol, models
+from switchy.connection import Connection, ConnectionPool, ConnectionError
+
+
+def test_parser_partial_frames():
+    '''Frames split arbitrarily across reads are reassembled in order
+    '''
+    event = protocol.Event(
+        (('Event-Name', 'CHANNEL_CREATE'), ('Caller-Name', 'Mr Switchy')),
+        body='some\n\nbody')
+    data = (
+        'Content-Type: api/response\nContent-Length: 3\n\n+OK'
+        'Content-Length: {}\nContent-Type: text/event-plain\n\n{}'
+        .format(len(event.serialize()), event.serialize())
+    )
+    parser = protocol.Parser()
+    frames = []
+    for char in data:
+        frames.extend(parser.feed(char))
+
+    assert len(frames) == 2
+    reply, ev = frames
+    assert reply.getHeader('Content-Type') == 'api/response'
+    assert reply.getBody() == '+OK'
+    assert ev.getType() == 'CHANNEL_CREATE'
+    # values are url decoded
+    assert ev.getHeader('Caller-Name') == 'Mr Switchy'
+    assert ev.getBody() == 'some\n\nbody'
+    assert ev.getHeader('doggy') is None
+
+
+def test_lazy_event():
+    '''Headers are located on first access and the event can be thawed
+    into an ordinary header map
+    '''
+    content = protocol.Event(
+        (('Event-Name', 'CHANNEL_PARK'), ('Unique-ID', 'doggy'),
+         ('variable_name', 'Mr Switchy')), body='dtmf: 1\n\n').serialize()
+    ev = protocol.LazyEvent(content)
+    assert ev._index is None
+    assert ev.getType() == 'CHANNEL_PARK'
+    assert ev.getHeader('variable_name') == 'Mr Switchy'
+    assert ev.getHeader('name') is None  # not a suffix match
+    assert ev.getHeader('dtmf') is None  # not from the body
+    assert ev.getHeader('Content-Length') is None
+    assert set(ev._index) == {'Event-Name', 'variable_name', 'name', 'dtmf'}
+    assert ev.getBody() == 'dtmf: 1\n\n'
+    assert ev.serialize() is content
+    assert ev.headers.keys() == ['Event-Name', 'Unique-ID', 'variable_name']
+
+    ev.addHeader('Unique-ID', 'kitty')
+    assert ev.getHeader('Unique-ID') == 'kitty'
+    assert ev.getHeader('variable_name') == 'Mr Switchy'
+    assert ev.getBody() == 'dtmf: 1\n\n'
+    assert protocol.LazyEvent(ev.serialize()).getHeader(
+        'Unique-ID') == 'kitty'
+
+
+def test_connect(fakeesl):
+    con = protocol.ESLConnection(fakeesl.host, fakeesl.port, 'ClueCon')
+    assert con.connected()
+    assert con.api('status').getBody().startswith('UP')
+    assert '-ERR' in con.api('doggy').getBody()
+    con.disconnect()
+    assert not con.connected()
+    assert con.api('status') is None
+
+    # bad password
+    con = protocol.ESLConnection(fakeesl.host, fakeesl.port, 'doggy')
+    assert not con.connected()
+
+
+def test_events(fakeesl):
+    con = protocol.ESLConnection(fakeesl.host, fakeesl.port, 'ClueCon')
+    reply = con.events('plain', 'CHANNEL_CREATE BACKGROUND_JOB')
+    assert '+OK' in reply.getHeader('Reply-Text')
+    reply = con.bgapi('status')
+    job_uuid = reply.getHeader('Job-UUID')
+    assert job_uuid
+    fakeesl.emit('CHANNEL_ANSWER')  # not subscribed
+    fakeesl.emit('CHANNEL_CREATE', **{'Unique-ID': 'doggy'})
+
+    ev = con.recvEvent()
+    assert ev.getType() == 'BACKGROUND_JOB'
+    assert ev.getHeader('Job-UUID') == job_uuid
+    assert ev.getBody().startswith('UP')
+    ev = con.recvEvent()
+    assert ev.getHeader('Unique-ID') == 'doggy'
+    assert con.recvEventTimed(10) is None
+
+    # filtering
+    con.filter('Unique-ID', 'kitty')
+    fakeesl.emit('CHANNEL_CREATE', **{'Unique-ID': 'doggy'})
+    fakeesl.emit('CHANNEL_CREATE', **{'Unique-ID': 'kitty'})
+    assert con.recvEvent().getHeader('Unique-ID') == 'kitty'
+
+    # server hangs up on us
+    fakeesl.disconnect_all()
+    assert con.recvEvent().getType() == 'SERVER_DISCONNECTED'
+    assert not con.connected()
+
+
+def test_connection_backend(fakeesl):
+    '''Verify the `Connection` wrapper drives the python backend
+    '''
+    con = Connection(fakeesl.host, fakeesl.port, backend='python')
+    assert con.backend == 'python'
+    with pytest.raises(AttributeError):
+        con.recvEvent
+    con.connect()
+    assert con.connected()
+    con.subscribe(('CHANNEL_PARK', 'mod_bert::lost_sync'))
+    assert con._sub == ('CHANNEL_PARK', 'mod_bert::lost_sync')
+    fakeesl.emit('CUSTOM', **{'Event-Subclass': 'mod_bert::lost_sync'})
+    assert con.recvEvent().getHeader('Event-Subclass') == 'mod_bert::lost_sync'
+    assert con.api('status').getBody()
+    # reconnecting a live connection costs a single liveness check
+    status = fakeesl.commands['status']
+    calls = []
+
+    def counted(args):
+        calls.append(args)
+        return status(args)
+
+    fakeesl.commands['status'] = counted
+    sock = con._con
+    con.connect()
+    assert con._con is sock
+    assert len(calls) == 1
+    fakeesl.commands['status'] = status
+    con.disconnect()
+    assert not con.connected()
+
+
+def test_listener_client(fakeesl):
+    '''An `EventListener` and `Client` can track background jobs over the
+    python backend
+    '''
+    from switchy import EventListener, Client
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python')
+    client = Client(fakeesl.host, fakeesl.port, listener=el)
+    assert client._con.backend == 'python'
+    el.connect()
+    client.connect()
+    el.start()
+    job = client.bgapi('echo +OK doggy')
+    assert job.get(timeout=1) == 'doggy'
+    # server side disconnect triggers reconnection
+    fakeesl.disconnect_all()
+    time.sleep(0.5)
+    assert el.connected()
+    el.disconnect()
+    client.disconnect()
+
+
+def test_originate_many(fakeesl):
+    '''A batch of originate commands is written at once and all returned
+    jobs are registered and resolved
+    '''
+    from switchy import EventListener, Client
+    cmds = []
+    fakeesl.commands['originate'] = lambda args: (
+        cmds.append(args) or '+OK {}\n'.format(len(cmds)))
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python')
+    client = Client(fakeesl.host, fakeesl.port, listener=el)
+    el.connect()
+    client.connect()
+    el.start()
+    client.set_orig_cmd('doggy@{field}')
+    try:
+        jobs = client.originate_many(
+            10, app_ids=iter(['a', 'b'] * 5),
+            rep_fields_func=lambda: {'field': 'kitty'})
+        assert len(jobs) == 10
+        assert len(set(job.uuid for job in jobs)) == 10
+        assert [job.cid for job in jobs] == ['a', 'b'] * 5
+        for job in jobs:
+            job.get(timeout=1)
+            assert job.successful()
+        assert len(cmds) == 10
+        for job, cmd in zip(jobs, cmds):
+            assert 'origination_uuid={}'.format(job.sess_uuid) in cmd
+            assert 'sofia/external/doggy@kitty' in cmd
+
+        # connection level batches resolve in command order
+        con = Connection(fakeesl.host, fakeesl.port, backend='python')
+        con.connect()
+        replies = con.bgapi_many(['echo {}'.format(i) for i in range(5)])
+        assert all(reply.result(1).getHeader('Job-UUID')
+                   for reply in replies)
+        assert con.sent == 5
+    finally:
+        el.disconnect()
+        client.disconnect()
+
+
+def test_job_reordering(fakeesl):
+    '''BACKGROUND_JOB events which arrive before their bgapi reply are
+    parked and matched once the job is registered, without ever blocking
+    the event loop
+    '''
+    import threading
+    from switchy import EventListener, Client
+    fakeesl.job_lead = 0.002
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python',
+                       park_ttl=5)
+    client = Client(fakeesl.host, fakeesl.port, listener=el, pool_size=4)
+    el.connect()
+    client.connect()
+    el.start()
+    jobs, errors = [], []
+
+    def issue(tag):
+        try:
+            for i in range(50):
+                jobs.append(
+                    (client.bgapi('echo +OK {}-{}'.format(tag, i)),
+                     '{}-{}'.format(tag, i)))
+            jobs.extend(zip(
+                client.bgapi_many(['echo +OK {}-b{}'.format(tag, i)
+                                   for i in range(50)]),
+                ['{}-b{}'.format(tag, i) for i in range(50)]))
+        except Exception as err:
+            errors.append(err)
+
+    try:
+        threads = [threading.Thread(target=issue, args=(t,))
+                   for t in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert len(jobs) == 800
+        for job, expect in jobs:
+            assert job.get(timeout=2) == expect
+        # every (parked or not) event was matched to its job
+        assert not el._parked
+        assert not el.events['BACKGROUND_JOB']
+
+        # parked events for unknown jobs expire (without another event
+        # arriving) and are then recorded as unconsumed
+        el.park_ttl = 0.05
+        fakeesl.emit('BACKGROUND_JOB', body='+OK kitty\n',
+                     **{'Job-UUID': 'doggy'})
+        time.sleep(0.05 + 2 * el.IDLE_INTERVAL)
+        assert not el._parked
+        assert [e.getHeader('Job-UUID') for e, _ in
+                el.events['BACKGROUND_JOB']] == ['doggy']
+    finally:
+        el.disconnect()
+        client.disconnect()
+
+
+def test_async_client(fakeesl):
+    '''Commands issued through an `AsyncClient` resolve on the asyncio
+    loop which reads their replies
+    '''
+    from switchy import futures, EventListener, Client
+    from switchy.aio import AsyncClient
+    from switchy.utils import CommandError
+    asyncio = futures.asyncio
+    if asyncio is None:
+        pytest.skip("'asyncio' or 'trollius' is not installed")
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python')
+    client = Client(fakeesl.host, fakeesl.port, listener=el, pool_size=2)
+    el.connect()
+    client.connect()
+    el.start()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    aclient = AsyncClient(client, loop)
+    run = loop.run_until_complete
+    try:
+        assert run(aclient.cmd('echo doggy')) == 'doggy'
+        with pytest.raises(CommandError):
+            run(aclient.api('doggy'))
+        assert run(aclient.api('doggy', exc=False))
+
+        jobs = run(asyncio.gather(*[
+            aclient.bgapi('echo +OK {}'.format(i)) for i in range(100)]))
+        assert len(set(job.uuid for job in jobs)) == 100
+        assert run(asyncio.gather(*[
+            job.asyncio_future(loop) for job in jobs])) == map(
+                str, range(100))
+        # the loop read every reply
+        assert len(aclient._readers) == 2
+
+        sess = models.Session(protocol.Event((('Unique-ID', 'doggy'),)))
+        with pytest.raises(futures.TimeoutError):
+            run(aclient.waitfor(sess, 'kitty', timeout=0.01))
+        loop.call_soon(sess.vars.__setitem__, 'kitty', 'meow')
+        assert run(aclient.waitfor(sess, 'kitty', timeout=1)) == 'meow'
+    finally:
+        aclient.close()
+        loop.close()
+        asyncio.set_event_loop(None)
+        el.disconnect()
+        client.disconnect()
+
+
+def test_call_soon_wakes(fakeesl):
+    '''Ops queued for an idle dedicated listener thread run right away
+    instead of after the next `IDLE_INTERVAL` timeout
+    '''
+    from switchy import EventListener
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python')
+    el.connect()
+    el.start()
+    try:
+        time.sleep(0.05)  # let the thread settle into waiting
+        for _ in range(10):
+            start = time.time()
+            assert el.call_soon(lambda: 'doggy').result(timeout=1) == 'doggy'
+            assert time.time() - start < el.IDLE_INTERVAL / 2
+    finally:
+        el.disconnect()
+
+
+def test_timed_reads_during_send():
+    '''Waiting on replies with a timeout never times out a concurrent
+    send which is blocked on a slow peer
+    '''
+    import socket
+    import threading
+    from tests.fakeesl import frame
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    peer = []
+
+    def accept():
+        sock, _ = server.accept()
+        sock.sendall(frame((('Content-Type', 'auth/request'),)))
+        sock.recv(1024)
+        sock.sendall(frame((('Content-Type', 'command/reply'),
+                            ('Reply-Text', '+OK accepted'))))
+        peer.append(sock)  # but never read again
+
+    acceptor = threading.Thread(target=accept)
+    acceptor.start()
+    con = protocol.ESLConnection(*server.getsockname(), password='ClueCon')
+    acceptor.join()
+    assert con.connected()
+    reply = con.send('api status')  # never answered
+    done = []
+    sender = threading.Thread(target=lambda: done.append(
+        con.send_many(['api echo ' + 'x' * 2**16] * 2**7)))
+    sender.daemon = True
+    sender.start()
+    try:
+        for _ in range(50):
+            # short polls for the reply
+            assert not reply.wait(0.001)
+            assert con._sock.gettimeout() is None
+        # the send is still blocked rather than failed
+        assert sender.is_alive() and not done
+        assert con.connected()
+    finally:
+        peer[0].close()
+        server.close()
+        sender.join(5)
+    con.disconnect()
+
+
+def test_pipelining(fakeesl):
+    '''Many commands may be in flight at once and replies are matched
+    to their originating request
+    '''
+    con = protocol.ESLConnection(fakeesl.host, fakeesl.port, 'ClueCon')
+    replies = [con.api_async('echo {}'.format(i)) for i in range(100)]
+    assert [r.result(1).getBody() for r in reversed(replies)] == [
+        str(i) for i in reversed(range(100))]
+    assert con.outstanding == 0
+
+    # concurrent callers sharing the connection without a lock
+    import threading
+    errors = []
+
+    def call(tag):
+        for i in range(50):
+            body = con.api('echo {}-{}'.format(tag, i)).getBody()
+            if body != '{}-{}'.format(tag, i):
+                errors.append(body)
+
+    threads = [threading.Thread(target=call, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+    # outstanding replies resolve to `None` when the connection is lost
+    fakeesl.latency = 0.2
+    slow = protocol.ESLConnection(fakeesl.host, fakeesl.port, 'ClueCon')
+    reply = slow.api_async('status')
+    slow.disconnect()
+    assert reply.result(1) is None
+
+
+def test_connection_api_async(fakeesl):
+    '''The `Connection` wrapper exposes pipelined futures for the python
+    backend
+    '''
+    con = Connection(fakeesl.host, fakeesl.port, backend='python')
+    with pytest.raises(ConnectionError):
+        con.api_async('status')
+    con.connect()
+    futs = [con.api_async('echo {}'.format(i)) for i in range(10)]
+    assert [f.result(1).getBody() for f in futs] == map(str, range(10))
+    assert con.bgapi_async('status').result(1).getHeader('Job-UUID')
+
+    # commands sent from many threads are all counted
+    import threading
+    sent = con.sent
+    threads = [threading.Thread(
+        target=lambda: [con.api_async('status') for _ in range(1000)])
+        for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert con.sent == sent + 4000
+
+
+def test_connection_pool(fakeesl):
+    '''Commands are spread over the least loaded pool member and dead
+    members are restored in place
+    '''
+    pool = ConnectionPool(fakeesl.host, fakeesl.port, size=3,
+                          backend='python')
+    with pytest.raises(ConnectionError):
+        pool.get()
+    pool.connect()
+    assert pool.connected()
+    # members with requests in flight are passed over
+    busy = pool.get()
+    fakeesl.latency = 0.05
+    busy.disconnect()
+    busy.connect()
+    slow = busy.api_async('status')
+    assert pool.get() is not busy
+    assert slow.result(1)
+    fakeesl.latency = 0
+
+    for i in range(30):
+        assert pool.api('echo {}'.format(i)).getBody() == str(i)
+    stats = pool.utilization()
+    assert len(stats) == 3
+    assert sum(s.share for s in stats) == pytest.approx(1)
+    assert all(s.sent >= 10 for s in stats)
+
+    # server side disconnect of all members
+    fakeesl.disconnect_all()
+    time.sleep(0.1)
+    member = pool.get()
+    assert member.connected()
+    assert pool.api('status').getBody().startswith('UP')
+    assert sum(s.replaced for s in pool.utilization()) >= 1
+
+    # non-blocking callers pass over dead members which are then restored
+    # in the background
+    dead = pool.get()
+    dead.disconnect()
+    assert pool.get(repair=False) is not dead
+    deadline = time.time() + 2
+    while not dead.connected() and time.time() < deadline:
+        time.sleep(0.01)
+    assert dead.connected()
+    # a member is still handed out when none is connected
+    for member in pool:
+        member.disconnect()
+    assert pool.get(repair=False) in list(pool)
+    while not pool.connected() and time.time() < deadline:
+        time.sleep(0.01)
+    assert pool.connected()
+    pool.disconnect()
+    assert not pool.connected()
+
+
+def test_listener_tx_pool(fakeesl):
+    '''Sessions are bound to a single member of the listener's tx pool
+    '''
+    from switchy import EventListener
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python',
+                       tx_pool_size=2)
+    assert len(el.tx_pool) == 2
+    el.connect()
+    el.start()
+    for i in range(4):
+        fakeesl.emit('CHANNEL_CREATE', **{'Unique-ID': str(i)})
+    time.sleep(0.2)
+    assert el.count_sessions() == 4
+    cons = [sess.con for sess in el.sessions.values()]
+    assert set(cons) <= set(el.tx_pool)
+    el.disconnect()
+
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_tx_replies_drained(fakeesl, shared):
+    '''Replies to session commands which no one waits on are read by the
+    listener's event loop, including on repaired pool members
+    '''
+    from switchy import EventListener, EventLoop
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python',
+                       tx_pool_size=2, loop=EventLoop() if shared else None)
+    el.connect()
+    el.start()
+    pool = el.tx_pool
+
+    def send(count):
+        futs = [pool.api_async('echo {}'.format(i)) for i in range(count)]
+        deadline = time.time() + 2
+        while pool.outstanding and time.time() < deadline:
+            time.sleep(0.01)
+        assert pool.outstanding == 0
+        assert all(f.done() for f in futs)
+        assert futs[-1].result().getBody() == str(count - 1)
+
+    send(500)
+    # the loop watches the socket of a member which is reconnected
+    pool._members[0].disconnect()
+    send(100)
+    assert sum(s.replaced for s in pool.utilization()) == 1
+    el.disconnect()
+    if shared:
+        el._loop.stop()
+
+
+def test_app_filter(fakeesl):
+    '''Only events for sessions tagged with a loaded app id (or the
+    client's id) are delivered when app filtering is enabled
+    '''
+    from switchy import EventListener, Client
+    from switchy.marks import event_callback
+
+    class App(object):
+        @event_callback('CHANNEL_CREATE')
+        def on_create(self, sess):
+            pass
+
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python',
+                       app_filter=True)
+    client = Client(fakeesl.host, fakeesl.port, listener=el)
+    el.connect()
+    client.connect()
+    assert set(el._rx_con._filters) == set(el.iter_filters())
+    el.start()
+    client.load_app(App, on_value='doggy')
+    var = 'variable_{}'.format(client.id_var)
+    xhvar = 'variable_{}'.format(client.id_xh)
+
+    def create(uuid, **headers):
+        headers['Unique-ID'] = uuid
+        fakeesl.emit('CHANNEL_CREATE', **headers)
+
+    create('1', **{var: 'doggy'})
+    create('2', **{xhvar: 'doggy'})
+    create('3', **{var: client._id})
+    create('4', **{var: 'kitty'})  # another switchy instance's app
+    create('5')  # not originated by switchy
+    # results for all jobs are delivered
+    assert client.bgapi('echo +OK doggy').get(timeout=1) == 'doggy'
+    time.sleep(0.1)
+    assert set(el.sessions) == {'1', '2', '3'}
+
+    client.unload_app('doggy')
+    create('6', **{var: 'doggy'})
+    create('7', **{var: client._id})
+    time.sleep(0.1)
+    assert set(el.sessions) == {'1', '2', '3', '7'}
+    el.disconnect()
+    client.disconnect()
+
+
+def test_event_loop(fakeesl):
+    '''A single `EventLoop` thread services all listeners in a pool
+    '''
+    import threading
+    from switchy.observe import get_pool
+    pool = get_pool([(fakeesl.host, fakeesl.port)] * 3, multiplex=True)
+    loop = pool.listeners[0]._loop
+    assert all(l._loop is loop for l in pool.listeners)
+    pool.evals('listener.connect()')
+    pool.evals('client.connect()')
+    pool.evals('listener.start()')
+    assert all(pool.evals('listener.is_alive()'))
+    assert len(loop) == 3
+    assert len([t for t in threading.enumerate()
+                if t.name == 'event_loop']) == 1
+
+    for i in range(10):
+        fakeesl.emit('CHANNEL_CREATE', **{'Unique-ID': str(i)})
+    client = pool.clients[0]
+    assert client.bgapi('echo +OK doggy').get(timeout=1) == 'doggy'
+    time.sleep(0.1)
+    assert pool.count_sessions() == 30
+
+    # listeners reconnect and are serviced again after a server disconnect
+    fakeesl.disconnect_all()
+    time.sleep(0.5)
+    assert all(pool.evals('listener.connected()'))
+    fakeesl.emit('CHANNEL_CREATE', **{'Unique-ID': 'doggy'})
+    time.sleep(0.1)
+    assert all('doggy' in l.sessions for l in pool.listeners)
+
+    pool.evals('listener.disconnect()')
+    assert not any(pool.evals('listener.is_alive()'))
+    assert len(loop) == 0
+    loop.stop()
+    assert not loop.is_alive()
+
+
+def test_callback_pool(fakeesl):
+    '''Callback chains run on per-call ordered workers such that a slow
+    callback does not stall other calls
+    '''
+    from switchy import EventListener
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python',
+                       callback_workers=2)
+    pool = el.callback_pool
+    slow, fast = 'slow', 'fast'
+    while hash(slow) % 2 == hash(fast) % 2:
+        fast += '-'
+    seen = {slow: [], fast: []}
+
+    def record(evname, sess, *args):
+        if sess.uuid == slow and not seen[slow]:
+            time.sleep(0.5)
+        seen[sess.uuid].append(evname)
+
+    evnames = ['CHANNEL_ANSWER', 'CHANNEL_PARK', 'CHANNEL_HANGUP']
+    for evname in evnames:
+        el.add_callback(evname, 'default', record, evname)
+    el.connect()
+    el.start()
+    assert pool.is_alive()
+    try:
+        for uuid in (slow, fast):
+            fakeesl.emit('CHANNEL_CREATE', **{
+                'Unique-ID': uuid, 'variable_call_uuid': uuid})
+        for evname in evnames:
+            for uuid in (slow, fast):
+                fakeesl.emit(evname, **{
+                    'Unique-ID': uuid, 'variable_call_uuid': uuid})
+        time.sleep(0.2)
+        # the fast call was fully processed while the slow one is blocked
+        assert seen[fast] == evnames
+        assert not seen[slow]
+        assert pool.depth == 2
+        stats = pool.stats()
+        shard = stats[hash(slow) % 2]
+        assert shard.depth == 2 and shard.lag > 0.1
+        assert stats[hash(fast) % 2].processed == 3
+        time.sleep(0.5)
+        assert seen[slow] == evnames
+        assert pool.depth == 0
+    finally:
+        el.disconnect()
+    assert not pool.is_alive()
+
+
+def test_callback_keys():
+    '''Callbacks for a call's session and job events share a worker
+    '''
+    from switchy import EventListener
+    el = EventListener(backend='python', callback_workers=2)
+    sess = models.Session(protocol.Event((('Unique-ID', 'doggy'),)))
+    sess.call = models.Call('kitty', sess)
+    el.sessions['doggy'] = sess
+    job = models.Job(protocol.Event((('Job-UUID', 'mousey'),)),
+                     sess_uuid='doggy')
+    answer = protocol.Event((('Unique-ID', 'doggy'),))
+    bj = protocol.Event((('Job-UUID', 'mousey'),))
+    key = el._callback_key
+    assert key(answer, 'CHANNEL_ANSWER', sess, (sess,)) == 'kitty'
+    assert key(bj, 'BACKGROUND_JOB', None, (None, job)) == 'kitty'
+    assert key(bj, 'BACKGROUND_JOB', sess, (sess, job)) == 'kitty'
+    # the session is no longer tracked
+    del el.sessions['doggy']
+    assert key(bj, 'BACKGROUND_JOB', None, (None, job)) == 'doggy'
+    # jobs not issued for a session
+    job.sess_uuid = None
+    assert key(bj, 'BACKGROUND_JOB', None, (None, job)) == 'mousey'
+
+
+def test_lag_histogram(fakeesl):
+    '''Event processing lag is tracked per listener in a rolling window
+    and reported per pool
+    '''
+    from switchy.utils import LagHistogram
+    from switchy.observe import get_pool
+    hist = LagHistogram(period=1, bounds=(.01, .1, 1))
+    assert hist.percentile(0.99) == 0
+    now = time.time()
+    for lag in (.005, .005, .05, .5, 5, -1):
+        hist.add(lag, now - 0.5)
+    assert hist.histogram().values() == [3, 1, 1, 1]
+    assert hist.percentile(0.5) == .01
+    assert hist.percentile(0.8) == 1
+    assert hist.percentile(1) == float('inf')
+    assert hist.peak == 5 and hist.last == 0
+    # samples older than the period are expired
+    hist.add(.05, now + 0.6)
+    assert len(hist) == 1
+    assert hist.percentile(0.99) == .1
+    # memory use is fixed no matter the sample rate
+    for _ in range(10000):
+        hist.add(.005, now + 0.6)
+    assert len(hist) == 10001
+    assert len(hist._slots) == 10
+
+    pool = get_pool([(fakeesl.host, fakeesl.port)] * 2, backend='python')
+    pool.evals('listener.connect()')
+    pool.evals('listener.start()')
+    try:
+        assert pool.lag() == 0
+        for i in range(10):
+            fakeesl.emit('CHANNEL_CREATE', **{'Unique-ID': str(i)})
+        time.sleep(0.1)
+        assert all(len(hist) == 10 for hist in pool.lag_per_slave)
+        assert 0 < pool.lag() < 1
+    finally:
+        pool.evals('listener.disconnect()')
+
+
+def test_waitfor(fakeesl):
+    '''Waiters on session variables are resolved by the setting callback
+    for single sessions and for collections of sessions
+    '''
+    import multiprocessing as mp
+    from switchy import EventListener
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python')
+
+    def park(sess):
+        sess.vars['parked'] = True
+
+    el.add_callback('CHANNEL_PARK', 'default', park)
+    el.connect()
+    el.start()
+    try:
+        uuids = ('doggy', 'kitty')
+        for uuid in uuids:
+            fakeesl.emit('CHANNEL_CREATE', **{
+                'Unique-ID': uuid, 'variable_call_uuid': uuid})
+        time.sleep(0.1)
+        sessions = [el.sessions[uuid] for uuid in uuids]
+        with pytest.raises(mp.TimeoutError):
+            el.waitfor_any(sessions, 'parked', timeout=0.1)
+
+        fakeesl.emit('CHANNEL_PARK', **{
+            'Unique-ID': 'kitty', 'variable_call_uuid': 'kitty'})
+        assert el.waitfor_any(sessions, 'parked', timeout=1) is sessions[1]
+        with pytest.raises(mp.TimeoutError):
+            el.waitfor_all(sessions, 'parked', timeout=0.1)
+
+        future = el.var_future(sessions[0], 'parked')
+        assert not future.done()
+        fakeesl.emit('CHANNEL_PARK', **{
+            'Unique-ID': 'doggy', 'variable_call_uuid': 'doggy'})
+        el.waitfor(sessions[0], 'parked', timeout=1)
+        assert future.result() is True
+        assert el.waitfor_all(sessions, 'parked', timeout=1)
+    finally:
+        el.disconnect()
+
+
+def test_reaper(fakeesl):
+    '''Sessions and jobs whose terminating events were lost are evicted
+    unless the slave still reports their channels
+    '''
+    import json
+    from switchy import EventListener
+    from switchy.protocol import Event
+    fakeesl.commands['show'] = lambda args: json.dumps(
+        {'row_count': 1, 'rows': [{'uuid': 'kitty'}]})
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python',
+                       session_ttl=5, job_ttl=5)
+
+    def emit(uuid, stamp):
+        el._handle_event(Event((
+            ('Event-Name', 'CHANNEL_CREATE'),
+            ('Unique-ID', uuid),
+            ('Event-Date-Timestamp', str(int(stamp * 1e6))),
+            ('variable_call_uuid', uuid),
+        )))
+
+    el.connect()  # but process events inline
+    try:
+        now = time.time()
+        for uuid in ('doggy', 'kitty'):
+            emit(uuid, now - 10)
+        emit('fresh', now)
+        lost = el.register_job(Event((('Job-UUID', 'lost'),)),
+                               sess_uuid='doggy')
+        lost.launch_time -= 10
+        assert el.count_sessions() == 3
+        reaped = el.reaper.reap()
+        assert reaped == {'sessions': 1, 'calls': 1, 'jobs': 1}
+        assert sorted(el.sessions) == ['fresh', 'kitty']
+        assert 'lost' not in el.bg_jobs
+        assert not lost.successful()
+        assert el.hangup_causes['SWITCHY_REAPED'] == 1
+        # an eviction is not a call failure
+        assert el.count_failed() == 0 and not el.failed_sessions
+        assert el.reaper.spared == 1
+        # nothing left to reap
+        assert not el.reaper.reap()
+
+        # events without a time stamp leave the slave's time alone
+        el._handle_event(Event((
+            ('Event-Name', 'CHANNEL_PARK'), ('Unique-ID', 'fresh'))))
+        assert el._fs_time == float(int(now * 1e6)) / 1e6
+        assert not el.reaper.reap()
+        # sessions with no known time are never reaped
+        row = models.Session(protocol.ChannelRow({'uuid': 'bird'}))
+        assert row.time is None
+        assert not el.reaper._expired(row)
+        # nor is anything before the slave's time is known
+        el._fs_time = 0.0
+        assert not el.reaper._expired(el.sessions['kitty'])
+    finally:
+        el.disconnect()
+
+
+def test_reconcile_on_reconnect(fakeesl):
+    '''Sessions whose channels are gone after a server disconnect are
+    evicted by the bootstrap reconcile run on reconnect
+    '''
+    import json
+    from switchy import EventListener
+    rows = [{'uuid': 'kitty', 'call_uuid': 'kitty', 'callstate': 'ACTIVE'}]
+    fakeesl.commands['show'] = lambda args: json.dumps(
+        {'row_count': len(rows), 'rows': rows})
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python',
+                       bootstrap=True)
+    el.connect()
+    el.start()
+    try:
+        # the listing has no creation times
+        assert el.sessions['kitty'].times['create']
+        fakeesl.emit('CHANNEL_CREATE', **{
+            'Unique-ID': 'doggy', 'variable_call_uuid': 'doggy'})
+        time.sleep(0.1)
+        assert sorted(el.sessions) == ['doggy', 'kitty']
+
+        # 'doggy' hangs up while we are disconnected
+        fakeesl.disconnect_all()
+        deadline = time.time() + 5
+        while 'doggy' in el.sessions and time.time() < deadline:
+            time.sleep(0.05)
+        assert sorted(el.sessions) == ['kitty']
+        assert el.connected()
+        assert el.hangup_causes['SWITCHY_RECONCILED'] == 1
+        assert el._fs_time
+    finally:
+        el.disconnect()
+
+
+def test_reconcile(fakeesl):
+    '''Channels active on the slave are loaded on connect and local state
+    is reconciled against them
+    '''
+    import json
+    from switchy import EventListener
+    from switchy.protocol import Event
+    created = str(int(time.time()) - 10)
+    rows = [
+        {'uuid': 'doggy', 'call_uuid': 'doggy', 'callstate': 'ACTIVE',
+         'direction': 'outbound', 'created_epoch': created},
+        {'uuid': 'kitty', 'call_uuid': 'doggy', 'callstate': 'ACTIVE',
+         'direction': 'inbound', 'created_epoch': created},
+        {'uuid': 'bird', 'call_uuid': '', 'callstate': 'RINGING',
+         'created_epoch': created},
+    ]
+    fakeesl.commands['show'] = lambda args: json.dumps(
+        {'row_count': len(rows), 'rows': rows})
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python',
+                       bootstrap=True)
+    el.connect()  # but process events inline
+    try:
+        assert sorted(el.sessions) == ['bird', 'doggy', 'kitty']
+        assert el.count_calls() == 2
+        call = el.calls['doggy']
+        assert call.first.uuid == 'doggy' and call.last.uuid == 'kitty'
+        doggy = el.sessions['doggy']
+        assert doggy.answered and doggy['Call-Direction'] == 'outbound'
+        assert doggy.times['create'] == float(created)
+        assert not el.sessions['bird'].answered
+        assert el.reconciled['added'] == 3
+        assert el.sessions_per_app['default'] == 3
+        assert all(sess.con in list(el.tx_pool)
+                   for sess in el.sessions.values())
+
+        # 'bird' hangs up while its event is lost and a new channel appears
+        # while the channels are being listed
+        fetch = el._fetch_channels
+
+        def fetch_channels():
+            listed = fetch()
+            el._handle_event(Event((
+                ('Event-Name', 'CHANNEL_CREATE'),
+                ('Unique-ID', 'fresh'),
+                ('Event-Date-Timestamp', str(int(time.time() * 1e6))),
+                ('variable_call_uuid', 'fresh'),
+            )))
+            return listed
+
+        el._fetch_channels = fetch_channels
+        rows[2] = dict(rows[2], uuid='eggs')
+        counts = el.reconcile()
+        del el._fetch_channels
+        assert counts == {'added': 1, 'evicted': 1}
+        # sessions created after the listing started are never evicted
+        assert sorted(el.sessions) == ['doggy', 'eggs', 'fresh', 'kitty']
+        assert el.hangup_causes['SWITCHY_RECONCILED'] == 1
+        assert el.count_failed() == 0
+        # 'fresh' is evicted once a later listing doesn't report it
+        assert el.reconcile() == {'evicted': 1}
+        assert not el.reconcile()
+    finally:
+        el.disconnect()
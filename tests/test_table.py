@@ -0,0 +1,61 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Tests for the columnar session table
+'''
+import pytest
+np = pytest.importorskip('numpy')
+from switchy.table import SessionTable
+
+
+def test_slots_reused_and_grown():
+    table = SessionTable(size=2)
+    assert table.add('a', 1.) == 0
+    assert table.add('b', 2.) == 1
+    # adding an existing uuid is a noop
+    assert table.add('a', 5.) == 0
+    table.remove('a')
+    assert 'a' not in table
+    assert len(table) == 1
+    # freed slots are reused before the array is grown
+    assert table.add('c', 3.) == 0
+    assert table.add('d', 4.) == 2
+    assert table.array.size == 3
+    assert len(table) == 3
+    assert sorted(table.uuids()) == ['b', 'c', 'd']
+
+
+def test_queries():
+    table = SessionTable()
+    table.add('a', 100., app='bert')
+    table.add('b', 105., app='bert', bridged=True)
+    table.add('c', 108., app='player')
+    table.answer('a', 102.)
+    table.answer('b', 106.)
+    assert table.set('c', 'originate', 109.)
+    assert not table.set('z', 'originate', 109.)
+
+    assert table.count() == 3
+    assert table.count(answered=True) == 2
+    assert table.count(answered=False) == 1
+    assert table.count(bridged=True) == 1
+    assert table.count(app='bert') == 2
+    assert table.count(app='unknown') == 0
+    # the boundary is inclusive: 'b' is exactly 5 seconds old
+    assert table.count(older_than=5, now=110.) == 2
+    assert table.count(older_than=5.5, now=110.) == 1
+    # unanswered sessions never match an answer age filter
+    assert table.count(older_than=0, since='answer', now=110.) == 2
+    assert table.uuids(answered=False) == ['c']
+
+    ages = table.ages(since='answer', now=110.)
+    assert sorted(ages.tolist()) == [4., 8.]
+    counts, edges = table.histogram(bins=2, now=110.)
+    assert counts.sum() == 3
+
+    table.remove('a')
+    assert table.count(answered=True) == 1
+    table.clear()
+    assert len(table) == 0
+    assert table.count() == 0
@@ -0,0 +1,105 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+Tests for structured tracepoints
+'''
+import time
+import pytest
+from switchy import tracepoints, utils
+
+
+@pytest.yield_fixture
+def ring():
+    tracepoints.reset(capacity=16)
+    yield
+    tracepoints.disable()
+    tracepoints.reset(capacity=2**16)
+
+
+def test_ring(ring, tmpdir):
+    '''Records are only written for enabled sites and the ring keeps the
+    most recent entries which survive a dump and load
+    '''
+    fields = ('uuid', '36s'), ('count', 'i')
+    tp = tracepoints.tracepoint('test.site', *fields)
+    assert tracepoints.tracepoint('test.site', *fields) is tp
+    with pytest.raises(utils.ConfigurationError):
+        tracepoints.tracepoint('test.site', ('uuid', '36s'))
+    with pytest.raises(utils.ConfigurationError):
+        tracepoints.tracepoint('test.toobig', ('data', '60s'))
+
+    assert not tp.enabled
+    assert tracepoints.enable('test.*') == ['test.site']
+    assert tp.enabled
+    assert [s.name for s in tracepoints.sites() if s.enabled] == ['test.site']
+    for i in range(20):
+        tp('uuid-{}'.format(i), i)
+    # values are coerced if need be
+    tp(None, 20)
+
+    records = list(tracepoints.records())
+    assert len(records) == 16
+    assert [fields['count'] for _, _, fields in records] == range(5, 21)
+    ts, name, fields = records[-2]
+    assert name == 'test.site'
+    assert fields['uuid'] == 'uuid-19'
+    assert records[-1][2]['uuid'] == ''
+    assert ts <= time.time()
+
+    path = tracepoints.dump(str(tmpdir.join('tracepoints.dump')))
+    assert list(tracepoints.load(path)) == records
+    assert tracepoints.format_record(*records[-2]).endswith(
+        'test.site uuid=uuid-19 count=19')
+
+    tracepoints.disable('test.*')
+    assert not tp.enabled
+
+
+def test_listener_sites(ring, fakeesl):
+    '''Listener and connection sites record session life cycles
+    '''
+    from switchy import EventListener
+    el = EventListener(fakeesl.host, fakeesl.port, backend='python')
+    el.connect()
+    el.start()
+    tracepoints.enable('listener.*', 'connection.*')
+    try:
+        el._tx_con.api('status')
+        fakeesl.emit('CHANNEL_CREATE', **{
+            'Unique-ID': 'doggy', 'variable_call_uuid': 'doggy'})
+        fakeesl.emit('CHANNEL_ANSWER', **{'Unique-ID': 'doggy'})
+        fakeesl.emit('CHANNEL_HANGUP', **{
+            'Unique-ID': 'doggy', 'variable_call_uuid': 'doggy',
+            'Hangup-Cause': 'NORMAL_CLEARING'})
+        time.sleep(0.2)
+    finally:
+        el.disconnect()
+    records = [
+        (name, dict(fields)) for _, name, fields in tracepoints.records()]
+    assert records == [
+        ('connection.api', {'cmd': 'status'}),
+        ('listener.create', {'uuid': 'doggy', 'bridged': False}),
+        ('listener.answer', {'uuid': 'doggy'}),
+        ('listener.hangup', {'uuid': 'doggy', 'cause': 'NORMAL_CLEARING',
+                             'ended': True}),
+    ]
+
+
+@pytest.mark.parametrize('threadsafe', [True, False])
+def test_connection_sites(ring, fakeesl, threadsafe):
+    '''Asynchronous commands are traced once whether or not the backend
+    pipelines them
+    '''
+    from switchy.connection import Connection
+    con = Connection(fakeesl.host, fakeesl.port, backend='python')
+    con.connect()
+    con._threadsafe = threadsafe
+    tracepoints.enable('connection.*')
+    try:
+        con.api_async('status').result(1)
+        con.bgapi_async('status').result(1)
+    finally:
+        con.disconnect()
+    assert [name for _, name, _ in tracepoints.records()] == [
+        'connection.api', 'connection.bgapi']